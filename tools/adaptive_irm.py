@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Time-stepped simulation of Morpho Blue's adaptive curve IRM (lesson 6).
+
+The borrow rate sits on a fixed-shape curve anchored at rate_at_target (see
+interest_rate_models.adaptive_curve_borrow_rate). Between interactions the
+anchor drifts exponentially at ADJUSTMENT_SPEED x err per year, where err is
+the normalized distance of utilization from the 90% target, and is clamped to
+[MIN_RATE_AT_TARGET, MAX_RATE_AT_TARGET]. Interest for each interval is
+charged at the curve rate of the trapezoidal average anchor
+(start + 2 x mid + end) / 4, as the on-chain contract does.
+
+Utilization paths are arrays with time on axis 0 and any trailing shape
+(markets, scenarios, ...), the same rows x columns layout backtest.py uses, so
+thousands of scenarios advance in one call. Utilization is exogenous, so the
+only sequential part is the clamp: the anchor path is one cumulative sum in
+log space and only columns that touch a bound are stepped through time.
+
+Usage:
+    python adaptive_irm.py                      # sweep 2,000 random scenarios
+    python adaptive_irm.py --scenarios 10000 --days 365
+    python adaptive_irm.py --rates-csv adaptive.csv --export 20   # backtest.py ingest input
+"""
+
+import csv
+import sys
+import time
+from typing import Dict, Sequence, Tuple
+
+import numpy as np
+
+from interest_rate_models import adaptive_curve_borrow_rate, adaptive_curve_error, supply_rate
+
+YEAR_SECONDS = 365 * 24 * 3600
+
+# AdaptiveCurveIrm constants (rates are per year here; on-chain they are per second)
+TARGET_UTILIZATION = 0.9
+CURVE_STEEPNESS = 4.0
+ADJUSTMENT_SPEED = 50.0
+INITIAL_RATE_AT_TARGET = 0.04
+MIN_RATE_AT_TARGET = 0.001
+MAX_RATE_AT_TARGET = 2.0
+
+
+def _elapsed_column(elapsed, steps: int, ndim: int) -> np.ndarray:
+    """Seconds per interval as a scalar or a (steps, 1, ...) column that broadcasts over the batch"""
+    elapsed = np.asarray(elapsed, dtype=float)
+    if elapsed.ndim == 0:
+        return elapsed
+    if elapsed.shape != (steps,):
+        raise ValueError(f"elapsed must be a scalar or have one entry per step ({steps}), got {elapsed.shape}")
+    return elapsed.reshape((steps,) + (1,) * (ndim - 1))
+
+
+class AdaptiveIRM:
+    """
+    Adaptive curve IRM state for a batch of markets.
+
+    rate_at_target is kept between calls, so a long series can be advanced
+    block by block (as backtest.py replays datasets) with identical results.
+    """
+
+    def __init__(self, shape: Tuple[int, ...] = (), rate_at_target=INITIAL_RATE_AT_TARGET,
+                 target_utilization: float = TARGET_UTILIZATION, curve_steepness: float = CURVE_STEEPNESS,
+                 adjustment_speed: float = ADJUSTMENT_SPEED, min_rate_at_target: float = MIN_RATE_AT_TARGET,
+                 max_rate_at_target: float = MAX_RATE_AT_TARGET):
+        self.target_utilization = target_utilization
+        self.curve_steepness = curve_steepness
+        self.adjustment_speed = adjustment_speed
+        self.min_rate_at_target = min_rate_at_target
+        self.max_rate_at_target = max_rate_at_target
+        self.rate_at_target = np.clip(np.broadcast_to(np.asarray(rate_at_target, dtype=float), shape),
+                                      min_rate_at_target, max_rate_at_target).copy()
+
+    def advance(self, utilization, elapsed) -> Dict[str, np.ndarray]:
+        """
+        Step through utilization (steps, *shape), each held for `elapsed` seconds.
+
+        Returns 'rate_at_target' (steps + 1, *shape) including the starting
+        anchor, and 'borrow_rate' (steps, *shape), the annual rate charged over
+        each interval.
+        """
+        u = np.asarray(utilization, dtype=float)
+        if u.shape[1:] != self.rate_at_target.shape:
+            raise ValueError(f"utilization must have shape (steps, {self.rate_at_target.shape}), got {u.shape}")
+        steps = u.shape[0]
+        err = adaptive_curve_error(u, self.target_utilization)
+        linear = err * (self.adjustment_speed / YEAR_SECONDS) * _elapsed_column(elapsed, steps, u.ndim)
+
+        # Work on (steps, columns) so clamped columns can be picked out
+        columns = self.rate_at_target.size
+        linear = np.broadcast_to(linear, u.shape).reshape(steps, columns)
+        start = self.rate_at_target.reshape(columns)
+        low, high = np.log(self.min_rate_at_target), np.log(self.max_rate_at_target)
+
+        log_path = np.empty((steps + 1, columns))
+        log_path[0] = np.log(start)
+        np.cumsum(linear, axis=0, out=log_path[1:])
+        log_path[1:] += log_path[0]
+        log_mid = log_path[:-1] + linear / 2
+        # The mid point lies between its endpoints, so checking the path is enough
+        clamped = np.flatnonzero((log_path.min(axis=0) < low) | (log_path.max(axis=0) > high))
+        path, mid = np.exp(log_path), np.exp(log_mid)
+
+        if clamped.size:
+            anchor = start[clamped]
+            end_growth, mid_growth = np.exp(linear[:, clamped]), np.exp(linear[:, clamped] / 2)
+            for step in range(steps):
+                mid[step, clamped] = np.clip(anchor * mid_growth[step], self.min_rate_at_target, self.max_rate_at_target)
+                anchor = np.clip(anchor * end_growth[step], self.min_rate_at_target, self.max_rate_at_target)
+                path[step + 1, clamped] = anchor
+
+        path = path.reshape((steps + 1,) + self.rate_at_target.shape)
+        average = (path[:-1] + path[1:] + 2.0 * mid.reshape(u.shape)) / 4.0
+        self.rate_at_target = path[-1].copy()
+        return {
+            'rate_at_target': path,
+            'borrow_rate': adaptive_curve_borrow_rate(u, average, self.target_utilization, self.curve_steepness),
+        }
+
+
+def borrower_cost(borrow_rate: np.ndarray, elapsed) -> np.ndarray:
+    """
+    Cumulative interest per unit of debt after each step, shape like borrow_rate.
+
+    Each interval compounds with the contract's three-term Taylor expansion
+    of e^(rate x elapsed).
+    """
+    borrow_rate = np.asarray(borrow_rate, dtype=float)
+    x = borrow_rate * _elapsed_column(elapsed, borrow_rate.shape[0], borrow_rate.ndim) / YEAR_SECONDS
+    return np.cumprod(1.0 + x + x * x / 2.0 + x * x * x / 6.0, axis=0) - 1.0
+
+
+def time_to_converge(rate_at_target: np.ndarray, times: np.ndarray, tolerance: float = 0.01) -> np.ndarray:
+    """
+    Settling time of each anchor path: the first time after which it stays
+    within `tolerance` (relative) of its final value. 0 if it never leaves.
+
+    times holds the elapsed seconds at each of the steps + 1 path points.
+    """
+    final = rate_at_target[-1]
+    outside = np.abs(rate_at_target - final) > tolerance * final
+    last_outside = outside.shape[0] - 1 - outside[::-1].argmax(axis=0)
+    settled = np.where(outside.any(axis=0), last_outside + 1, 0)
+    return np.asarray(times, dtype=float)[np.minimum(settled, outside.shape[0] - 1)]
+
+
+def simulate(utilization, elapsed, rate_at_target=INITIAL_RATE_AT_TARGET, fee: float = 0.0,
+             tolerance: float = 0.01, **curve) -> Dict[str, np.ndarray]:
+    """
+    Run a fresh AdaptiveIRM over utilization (steps, *shape) in one call.
+
+    Returns the anchor and borrow/supply rate paths, 'cumulative_cost' per
+    unit of debt after each step and 'time_to_converge' in seconds (shape).
+    curve takes the AdaptiveIRM parameters (target_utilization, ...).
+    """
+    u = np.asarray(utilization, dtype=float)
+    irm = AdaptiveIRM(u.shape[1:], rate_at_target, **curve)
+    result = irm.advance(u, elapsed)
+    steps = u.shape[0]
+    seconds = np.broadcast_to(np.asarray(elapsed, dtype=float), (steps,))
+    times = np.concatenate([[0.0], np.cumsum(seconds)])
+    result['supply_rate'] = supply_rate(result['borrow_rate'], u, fee)
+    result['cumulative_cost'] = borrower_cost(result['borrow_rate'], elapsed)
+    result['time_to_converge'] = time_to_converge(result['rate_at_target'], times, tolerance)
+    result['times'] = times
+    return result
+
+
+# ---------------------------------------------------------------------------
+# Utilization paths
+# ---------------------------------------------------------------------------
+
+def phase_path(phases: Sequence[Sequence[float]], elapsed: float) -> np.ndarray:
+    """Piecewise-constant utilization from (duration_seconds, utilization) phases"""
+    steps = [max(1, int(round(duration / elapsed))) for duration, _ in phases]
+    return np.repeat([float(level) for _, level in phases], steps)
+
+
+def random_scenarios(count: int, steps: int, rng, mean: float = TARGET_UTILIZATION,
+                     reversion: float = 0.02, volatility: float = 0.01, shock_probability: float = 0.002,
+                     shock_size: float = 0.15) -> np.ndarray:
+    """
+    Utilization paths (steps, count): mean-reverting noise around each
+    scenario's own level plus occasional deposit/withdrawal shocks.
+    """
+    levels = np.clip(rng.normal(mean, 0.08, count), 0.05, 0.99)
+    shocks = (rng.random((steps, count)) < shock_probability) * rng.normal(0.0, shock_size, (steps, count))
+    noise = rng.normal(0.0, volatility, (steps, count)) + shocks
+    paths = np.empty((steps, count))
+    current = levels.copy()
+    for step in range(steps):
+        current = np.clip(current + reversion * (levels - current) + noise[step], 0.0, 1.0)
+        paths[step] = current
+    return paths
+
+
+def write_rates_csv(path: str, start: int, elapsed: int, borrow_rate: np.ndarray, supply: np.ndarray,
+                    names: Sequence[str]):
+    """Write rate paths in backtest.py's rates format (timestamp, market, supply_apr, borrow_apr)"""
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['timestamp', 'market', 'supply_apr', 'borrow_apr'])
+        for step in range(borrow_rate.shape[0]):
+            timestamp = start + step * elapsed
+            for column, name in enumerate(names):
+                writer.writerow([timestamp, name, f"{supply[step, column]:.8f}", f"{borrow_rate[step, column]:.8f}"])
+
+
+def _percentiles(values: np.ndarray, scale: float = 1.0, fmt: str = '{:.2f}') -> str:
+    p10, p50, p90 = np.percentile(values, [10, 50, 90]) * scale
+    return f"p10 {fmt.format(p10)}  p50 {fmt.format(p50)}  p90 {fmt.format(p90)}"
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Simulate Morpho's adaptive curve IRM over many utilization scenarios")
+    parser.add_argument('--scenarios', type=int, default=2000, help='Random utilization scenarios (default: 2000)')
+    parser.add_argument('--days', type=float, default=90, help='Simulated period (default: 90)')
+    parser.add_argument('--interval', type=int, default=3600, help='Seconds between interactions (default: 3600)')
+    parser.add_argument('--fee', type=float, default=0.0, help='Market fee taken from supply interest (default: 0)')
+    parser.add_argument('--tolerance', type=float, default=0.01,
+                        help='Relative band for time-to-converge (default: 0.01)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed for the scenarios')
+    parser.add_argument('--rates-csv', help='Write the first --export scenarios as a backtest.py rates file')
+    parser.add_argument('--export', type=int, default=10, help='Scenarios written by --rates-csv (default: 10)')
+    parser.add_argument('--start', type=int, default=1704067200,
+                        help='First timestamp of --rates-csv rows, unix seconds (default: 2024-01-01)')
+    args = parser.parse_args()
+
+    steps = max(1, int(args.days * 86400 // args.interval))
+    rng = np.random.default_rng(args.seed)
+
+    print("=" * 60)
+    print(f"Adaptive Curve IRM: {args.scenarios:,} scenarios x {steps:,} steps ({args.days:g} days)")
+    print("=" * 60)
+
+    utilization = random_scenarios(args.scenarios, steps, rng)
+    started = time.perf_counter()
+    result = simulate(utilization, args.interval, fee=args.fee, tolerance=args.tolerance)
+    elapsed = time.perf_counter() - started
+    print(f"Simulated in {elapsed:.2f}s ({args.scenarios * steps / elapsed / 1e6:.1f}M market-steps/s)")
+    print()
+
+    period_days = steps * args.interval / 86400
+    print(f"Mean utilization:      {_percentiles(utilization.mean(axis=0), 100, '{:.1f}%')}")
+    print(f"Final rate at target:  {_percentiles(result['rate_at_target'][-1], 100, '{:.2f}%')}")
+    print(f"Mean borrow APR:       {_percentiles(result['borrow_rate'].mean(axis=0), 100, '{:.2f}%')}")
+    print(f"Borrower cost / $1:    {_percentiles(result['cumulative_cost'][-1], 1, '${:.4f}')} "
+          f"over {period_days:g} days")
+    print(f"Time to converge:      {_percentiles(result['time_to_converge'], 1 / 86400, '{:.1f}d')}")
+    at_bounds = np.isclose(result['rate_at_target'][-1], [[MIN_RATE_AT_TARGET], [MAX_RATE_AT_TARGET]]).any(axis=0)
+    print(f"Pinned at a bound:     {int(at_bounds.sum()):,} scenario(s)")
+
+    if args.rates_csv:
+        count = min(args.export, args.scenarios)
+        names = [f"adaptive-{index:03d}" for index in range(count)]
+        write_rates_csv(args.rates_csv, args.start, args.interval, result['borrow_rate'][:, :count],
+                        result['supply_rate'][:, :count], names)
+        print()
+        print(f"✅ Wrote {count} scenario(s) to {args.rates_csv} (ingest with backtest.py)")
+    print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
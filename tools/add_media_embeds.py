@@ -1,13 +1,21 @@
 #!/usr/bin/env python3
 """
 Add audio and video embed tags to the top of each lesson file.
+
+Videos packaged and uploaded by hls_package.py are embedded as their HLS
+master playlist; existing .mp4 embeds are switched over once a package exists,
+and embeds of an older package are moved to the current one after a re-encode.
 """
 
 import re
+import sys
 from pathlib import Path
 from typing import Optional, Tuple
 from urllib.parse import quote
 
+from hls_package import load_index, master_url
+from profiling import pop_profile_argument, profiled, span
+
 # Configuration
 SCRIPT_DIR = Path(__file__).parent
 GITBOOK_DIR = SCRIPT_DIR.parent
@@ -23,8 +31,8 @@ def extract_lesson_number(filename: str) -> Optional[int]:
         return int(match.group(1))
     return None
 
-def find_media_file(lesson_num: int, media_dir: Path, extension: str) -> Optional[str]:
-    """Find media file for a lesson number"""
+def find_media_file(lesson_num: int, media_dir: Path, extension: str, inventory=None) -> Optional[str]:
+    """Find media file for a lesson number (inventory: shared workspace.Inventory listing)"""
     # Try both "lesson1" and "lesson01" patterns
     patterns = [
         f"lesson{lesson_num} ",
@@ -33,7 +41,10 @@ def find_media_file(lesson_num: int, media_dir: Path, extension: str) -> Optiona
         f"lesson{lesson_num:02d}_",
     ]
     
-    files = list(media_dir.glob(f"*{extension}"))
+    if inventory is not None:
+        files = inventory.files(media_dir, f"*{extension}")
+    else:
+        files = list(media_dir.glob(f"*{extension}"))
     for file in files:
         filename = file.name
         for pattern in patterns:
@@ -42,13 +53,13 @@ def find_media_file(lesson_num: int, media_dir: Path, extension: str) -> Optiona
     
     return None
 
-def generate_gcs_url(lesson_num: int, filename: str, media_type: str) -> str:
+def generate_gcs_url(lesson_num: int, filename: str, media_type: str, bucket_name: str = BUCKET_NAME) -> str:
     """Generate GCS URL for a media file with proper URL encoding"""
     lesson_slug = f"lesson-{lesson_num:02d}"
     folder = "audio" if media_type == "audio" else "video"
     # URL-encode the filename to handle special characters (spaces, $, =, etc.)
     encoded_filename = quote(filename, safe='')
-    return f"https://storage.googleapis.com/{BUCKET_NAME}/{lesson_slug}/{folder}/{encoded_filename}"
+    return f"https://storage.googleapis.com/{bucket_name}/{lesson_slug}/{folder}/{encoded_filename}"
 
 def has_existing_embeds(content: str) -> bool:
     """Check if file already has embed tags at the top"""
@@ -60,7 +71,46 @@ def has_existing_embeds(content: str) -> bool:
         return True
     return False
 
-def add_embeds_to_lesson(lesson_file: Path) -> Tuple[bool, str]:
+def video_embed_url(lesson_num: int, filename: str, bucket_name: str = BUCKET_NAME,
+                    hls_index: Optional[dict] = None) -> str:
+    """HLS master playlist URL when the video has an uploaded package, else the .mp4 URL"""
+    hls_url = master_url(hls_index or {}, filename, f"lesson-{lesson_num:02d}", bucket_name)
+    return hls_url or generate_gcs_url(lesson_num, filename, "video", bucket_name)
+
+def switch_to_hls(lesson_file: Path, content: str, lesson_num: int, video_dir: Path, bucket_name: str,
+                  inventory=None, hls_index: Optional[dict] = None) -> Tuple[bool, str]:
+    """
+    Point an existing .mp4 embed at the HLS master playlist if one has been uploaded.
+
+    Embeds of an older package of the lesson (a /hls/<key>/ that no video in the
+    index uses any more) are moved to the current master playlist as well.
+    """
+    video_filename = find_media_file(lesson_num, video_dir, ".mp4", inventory)
+    if not video_filename:
+        return True, f"Embeds already exist in {lesson_file.name}"
+    mp4_url = generate_gcs_url(lesson_num, video_filename, "video", bucket_name)
+    hls_url = video_embed_url(lesson_num, video_filename, bucket_name, hls_index)
+    if hls_url == mp4_url:
+        return True, f"Embeds already exist in {lesson_file.name}"
+
+    current_keys = {entry.get('key') for entry in (hls_index or {}).values()}
+    stale_pattern = re.compile(
+        rf'url="https://storage\.googleapis\.com/{re.escape(bucket_name)}/lesson-{lesson_num:02d}'
+        rf'/hls/([^/"]+)/master\.m3u8"'
+    )
+    new_content = content.replace(f'url="{mp4_url}"', f'url="{hls_url}"')
+    new_content = stale_pattern.sub(
+        lambda match: match.group(0) if match.group(1) in current_keys else f'url="{hls_url}"', new_content
+    )
+    if new_content == content:
+        return True, f"Embeds already exist in {lesson_file.name}"
+    with span('write'), open(lesson_file, 'w', encoding='utf-8') as f:
+        f.write(new_content)
+    return True, f"Switched {lesson_file.name} video embed to HLS"
+
+def add_embeds_to_lesson(lesson_file: Path, audio_dir: Path = AUDIO_DIR, video_dir: Path = VIDEO_DIR,
+                         bucket_name: str = BUCKET_NAME, inventory=None,
+                         hls_index: Optional[dict] = None) -> Tuple[bool, str]:
     """
     Add audio and video embed tags to the top of a lesson file.
     Returns (success, message)
@@ -75,11 +125,12 @@ def add_embeds_to_lesson(lesson_file: Path) -> Tuple[bool, str]:
     
     # Check if embeds already exist
     if has_existing_embeds(content):
-        return True, f"Embeds already exist in {lesson_file.name}"
+        return switch_to_hls(lesson_file, content, lesson_num, video_dir, bucket_name, inventory, hls_index)
     
     # Find audio and video files
-    audio_filename = find_media_file(lesson_num, AUDIO_DIR, ".m4a")
-    video_filename = find_media_file(lesson_num, VIDEO_DIR, ".mp4")
+    with span('inventory scan'):
+        audio_filename = find_media_file(lesson_num, audio_dir, ".m4a", inventory)
+        video_filename = find_media_file(lesson_num, video_dir, ".mp4", inventory)
     
     if not audio_filename and not video_filename:
         return False, f"No media files found for lesson {lesson_num}"
@@ -87,11 +138,11 @@ def add_embeds_to_lesson(lesson_file: Path) -> Tuple[bool, str]:
     # Generate embed tags
     embeds = []
     if audio_filename:
-        audio_url = generate_gcs_url(lesson_num, audio_filename, "audio")
+        audio_url = generate_gcs_url(lesson_num, audio_filename, "audio", bucket_name)
         embeds.append(f'{{% embed url="{audio_url}" %}}')
     
     if video_filename:
-        video_url = generate_gcs_url(lesson_num, video_filename, "video")
+        video_url = video_embed_url(lesson_num, video_filename, bucket_name, hls_index)
         embeds.append(f'{{% embed url="{video_url}" %}}')
     
     if not embeds:
@@ -99,14 +150,15 @@ def add_embeds_to_lesson(lesson_file: Path) -> Tuple[bool, str]:
     
     # Add embeds at the top with blank lines between (matching investor mindset format)
     # Format: audio embed, blank line, video embed, blank line, content
-    if len(embeds) == 2:
-        embed_block = embeds[0] + '\n\n' + embeds[1] + '\n\n'
-    else:
-        embed_block = '\n\n'.join(embeds) + '\n\n'
-    new_content = embed_block + content
+    with span('rewrite'):
+        if len(embeds) == 2:
+            embed_block = embeds[0] + '\n\n' + embeds[1] + '\n\n'
+        else:
+            embed_block = '\n\n'.join(embeds) + '\n\n'
+        new_content = embed_block + content
     
     # Write back to file
-    with open(lesson_file, 'w', encoding='utf-8') as f:
+    with span('write'), open(lesson_file, 'w', encoding='utf-8') as f:
         f.write(new_content)
     
     media_list = []
@@ -117,17 +169,21 @@ def add_embeds_to_lesson(lesson_file: Path) -> Tuple[bool, str]:
     
     return True, f"Added embeds to {lesson_file.name} ({', '.join(media_list)})"
 
-def main():
-    """Process all lesson files"""
+def main(lessons_dir: Path = LESSONS_DIR, audio_dir: Path = AUDIO_DIR, video_dir: Path = VIDEO_DIR,
+         bucket_name: str = BUCKET_NAME, inventory=None, hls_index: Optional[dict] = None) -> int:
+    """Process all lesson files (hls_index: hls_package index, loaded from the default cache if omitted)"""
     print("=" * 60)
     print("Adding Media Embeds to Lesson Files")
     print("=" * 60)
     print()
     
-    lesson_files = sorted(LESSONS_DIR.glob("lesson-*.md"))
+    lesson_files = sorted(lessons_dir.glob("lesson-*.md"))
     if not lesson_files:
         print("No lesson files found!")
-        return
+        return 1
+    
+    if hls_index is None:
+        hls_index = load_index()
     
     success_count = 0
     skip_count = 0
@@ -135,7 +191,8 @@ def main():
     
     for lesson_file in lesson_files:
         print(f"Processing: {lesson_file.name}")
-        success, message = add_embeds_to_lesson(lesson_file)
+        success, message = add_embeds_to_lesson(lesson_file, audio_dir, video_dir, bucket_name, inventory,
+                                                hls_index)
         
         if success:
             if "already exist" in message:
@@ -157,7 +214,9 @@ def main():
     print(f"⏭️  Skipped (already exist): {skip_count}")
     print(f"❌ Failed: {fail_count}")
     print()
+    return 1 if fail_count else 0
 
 if __name__ == "__main__":
-    main()
+    with profiled(pop_profile_argument(sys.argv), 'add_media_embeds'):
+        sys.exit(main())
 
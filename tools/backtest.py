@@ -0,0 +1,564 @@
+#!/usr/bin/env python3
+"""
+Backtest the lending strategies from lessons 9-12 against historical rates and prices.
+
+`ingest` reads long-format CSV or Parquet histories once and stores them as
+memory-mapped columnar .npy arrays on a fixed time grid (default hourly) under
+.cache/backtest/<name>/. `run` replays strategies over those arrays in time
+blocks, so a dataset never has to fit in RAM, with every parameter set of a
+strategy advanced together as numpy columns and parameter chunks spread over a
+process pool.
+
+Rates file columns:  timestamp, market, supply_apr, borrow_apr
+Prices file columns: timestamp, asset, price
+Timestamps are unix seconds or ISO-8601. Within a period the last observation
+wins; gaps are forward-filled.
+
+Strategies file (JSON):
+    {"dataset": "mainnet",
+     "strategies": [
+       {"name": "static", "strategy": "static",
+        "grid": {"market": ["aave-usdc", "morpho-usdc"]}},
+       {"name": "wsteth loop", "strategy": "loop", "supply_market": "aave-wsteth",
+        "borrow_market": "aave-weth", "price_asset": "wsteth-eth",
+        "liquidation_threshold": 0.95, "grid": {"leverage": [2, 4, 6, 8]}},
+       {"name": "usdc rotation", "strategy": "rebalance",
+        "markets": ["aave-usdc", "compound-usdc", "morpho-usdc"],
+        "grid": {"spread_threshold": [0.005, 0.01], "switch_cost_bps": [5, 20]}}]}
+
+Grid values are expanded as a cartesian product; everything else is shared.
+"""
+
+import csv
+import itertools
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timezone
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+# Configuration
+SCRIPT_DIR = Path(__file__).parent
+GITBOOK_DIR = SCRIPT_DIR.parent
+DATASETS_DIR = GITBOOK_DIR / ".cache" / "backtest"
+
+YEAR_SECONDS = 365 * 24 * 3600
+DEFAULT_PERIOD = 3600
+# Rows replayed per block; bounds memory independent of dataset length
+BLOCK_ROWS = 8192
+# Values are stored as float32 to halve I/O; accrual math runs in float64
+STORAGE_DTYPE = np.float32
+
+
+# ---------------------------------------------------------------------------
+# Ingest
+# ---------------------------------------------------------------------------
+
+@lru_cache(maxsize=65536)
+def parse_timestamp(value: str) -> int:
+    """Unix seconds from an int/float string or an ISO-8601 timestamp (UTC if naive)"""
+    try:
+        return int(float(value))
+    except ValueError:
+        parsed = datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return int(parsed.timestamp())
+
+
+def iter_rows(path: Path, key_column: str, value_columns: List[str]) -> Iterator[Tuple[int, str, List[float]]]:
+    """Yield (timestamp, key, values) from a CSV or Parquet file without loading it whole"""
+    if path.suffix.lower() == '.parquet':
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError(f"Reading {path.name} needs pyarrow: pip install pyarrow")
+        for batch in pq.ParquetFile(path).iter_batches(columns=['timestamp', key_column] + value_columns):
+            columns = batch.to_pydict()
+            for row, (stamp, key) in enumerate(zip(columns['timestamp'], columns[key_column])):
+                if isinstance(stamp, datetime):
+                    stamp = int(stamp.replace(tzinfo=stamp.tzinfo or timezone.utc).timestamp())
+                else:
+                    stamp = parse_timestamp(str(stamp))
+                yield stamp, str(key), [float(columns[name][row]) for name in value_columns]
+        return
+
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        missing = {'timestamp', key_column, *value_columns} - set(header)
+        if missing:
+            raise ValueError(f"{path.name} is missing column(s): {', '.join(sorted(missing))}")
+        stamp_at, key_at = header.index('timestamp'), header.index(key_column)
+        value_at = [header.index(name) for name in value_columns]
+        for row in reader:
+            yield parse_timestamp(row[stamp_at]), row[key_at], [float(row[index]) for index in value_at]
+
+
+def _scan(paths: List[Path], key_column: str, value_columns: List[str]) -> Tuple[int, int, List[str]]:
+    first, last, keys = None, None, set()
+    for path in paths:
+        for stamp, key, _ in iter_rows(path, key_column, value_columns):
+            first = stamp if first is None or stamp < first else first
+            last = stamp if last is None or stamp > last else last
+            keys.add(key)
+    return first, last, sorted(keys)
+
+
+def _fill(paths: List[Path], key_column: str, value_columns: List[str], arrays: List[np.ndarray],
+          keys: List[str], start: int, period: int):
+    column_of = {key: index for index, key in enumerate(keys)}
+    rows = arrays[0].shape[0]
+    for path in paths:
+        for stamp, key, values in iter_rows(path, key_column, value_columns):
+            row = (stamp - start) // period
+            if 0 <= row < rows:
+                for array, value in zip(arrays, values):
+                    array[row, column_of[key]] = value
+
+
+def forward_fill(array: np.ndarray, leading: str = 'zero'):
+    """
+    Forward-fill NaNs in place, one time block at a time.
+
+    Leading NaNs (before a series' first observation) become 0 ('zero', for rates
+    of a market that did not exist yet) or the first observed value ('first', for prices).
+    """
+    rows, cols = array.shape
+    carry = np.full(cols, np.nan, dtype=array.dtype)
+    for start in range(0, rows, BLOCK_ROWS):
+        block = np.array(array[start:start + BLOCK_ROWS])
+        block = np.vstack([carry[None, :], block])
+        valid = ~np.isnan(block)
+        index = np.where(valid, np.arange(block.shape[0])[:, None], 0)
+        np.maximum.accumulate(index, axis=0, out=index)
+        block = block[index, np.arange(cols)]
+        array[start:start + BLOCK_ROWS] = block[1:]
+        carry = block[-1]
+
+    if leading == 'zero':
+        fallback = np.zeros(cols, dtype=array.dtype)
+    else:
+        fallback = np.full(cols, np.nan, dtype=array.dtype)
+        for start in range(0, rows, BLOCK_ROWS):
+            block = np.asarray(array[start:start + BLOCK_ROWS])
+            unset = np.isnan(fallback)
+            if not unset.any():
+                break
+            has_value = ~np.isnan(block)
+            first = has_value.argmax(axis=0)
+            found = unset & has_value.any(axis=0)
+            fallback[found] = block[first[found], np.flatnonzero(found)]
+    for start in range(0, rows, BLOCK_ROWS):
+        block = np.array(array[start:start + BLOCK_ROWS])
+        if not np.isnan(block).any():
+            break
+        array[start:start + BLOCK_ROWS] = np.where(np.isnan(block), fallback, block)
+
+
+def source_fingerprint(paths: List[Path]) -> List[Dict]:
+    return [{'path': str(path.resolve()), 'size': path.stat().st_size, 'mtime': path.stat().st_mtime}
+            for path in paths]
+
+
+def ingest(rates_paths: List[Path], prices_paths: List[Path], dataset_dir: Path,
+           period: int = DEFAULT_PERIOD, force: bool = False) -> Dict:
+    """Convert rate/price histories into memory-mapped arrays; no-op when sources are unchanged"""
+    meta_path = dataset_dir / 'meta.json'
+    fingerprint = {'rates': source_fingerprint(rates_paths), 'prices': source_fingerprint(prices_paths),
+                   'period': period}
+    if meta_path.exists() and not force:
+        with open(meta_path, 'r') as f:
+            meta = json.load(f)
+        if meta.get('sources') == fingerprint:
+            meta['skipped'] = True
+            return meta
+
+    first, last, markets = _scan(rates_paths, 'market', ['supply_apr', 'borrow_apr'])
+    if first is None:
+        raise ValueError("No rate rows found")
+    price_first, price_last, assets = _scan(prices_paths, 'asset', ['price']) if prices_paths else (None, None, [])
+    if price_first is not None:
+        first, last = min(first, price_first), max(last, price_last)
+
+    start = first - first % period
+    rows = (last - start) // period + 1
+
+    dataset_dir.mkdir(parents=True, exist_ok=True)
+    open_memmap = np.lib.format.open_memmap
+    supply = open_memmap(dataset_dir / 'supply_apr.npy', mode='w+', dtype=STORAGE_DTYPE, shape=(rows, len(markets)))
+    borrow = open_memmap(dataset_dir / 'borrow_apr.npy', mode='w+', dtype=STORAGE_DTYPE, shape=(rows, len(markets)))
+    prices = open_memmap(dataset_dir / 'prices.npy', mode='w+', dtype=STORAGE_DTYPE, shape=(rows, len(assets)))
+    for array in (supply, borrow, prices):
+        for block_start in range(0, rows, BLOCK_ROWS):
+            array[block_start:block_start + BLOCK_ROWS] = np.nan
+
+    _fill(rates_paths, 'market', ['supply_apr', 'borrow_apr'], [supply, borrow], markets, start, period)
+    if assets:
+        _fill(prices_paths, 'asset', ['price'], [prices], assets, start, period)
+
+    forward_fill(supply, leading='zero')
+    forward_fill(borrow, leading='zero')
+    if assets:
+        forward_fill(prices, leading='first')
+    for array in (supply, borrow, prices):
+        array.flush()
+
+    meta = {'start': start, 'period': period, 'rows': rows, 'markets': markets, 'assets': assets,
+            'sources': fingerprint}
+    with open(meta_path, 'w') as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+class Dataset:
+    """Read-only memory-mapped view of an ingested dataset"""
+
+    def __init__(self, dataset_dir: Path):
+        self.dir = Path(dataset_dir)
+        meta_path = self.dir / 'meta.json'
+        if not meta_path.exists():
+            raise FileNotFoundError(f"No dataset at {self.dir} (run ingest first)")
+        with open(meta_path, 'r') as f:
+            self.meta = json.load(f)
+        self.start, self.period, self.rows = self.meta['start'], self.meta['period'], self.meta['rows']
+        self.markets, self.assets = self.meta['markets'], self.meta['assets']
+        self.supply = np.load(self.dir / 'supply_apr.npy', mmap_mode='r')
+        self.borrow = np.load(self.dir / 'borrow_apr.npy', mmap_mode='r')
+        self.prices = np.load(self.dir / 'prices.npy', mmap_mode='r')
+
+    def market_index(self, name: str) -> int:
+        try:
+            return self.markets.index(name)
+        except ValueError:
+            raise KeyError(f"Unknown market '{name}' (known: {', '.join(self.markets)})")
+
+    def asset_index(self, name: str) -> int:
+        try:
+            return self.assets.index(name)
+        except ValueError:
+            raise KeyError(f"Unknown price asset '{name}' (known: {', '.join(self.assets)})")
+
+    def row_for(self, timestamp: Optional[int], default: int) -> int:
+        if timestamp is None:
+            return default
+        return min(max((timestamp - self.start) // self.period, 0), self.rows)
+
+    def timestamp_of(self, row: int) -> str:
+        stamp = self.start + row * self.period
+        return datetime.fromtimestamp(stamp, tz=timezone.utc).strftime('%Y-%m-%dT%H:%MZ')
+
+
+# ---------------------------------------------------------------------------
+# Strategies: each advances all parameter sets of one strategy entry at once
+# ---------------------------------------------------------------------------
+
+class Strategy:
+    """Base class; equity starts at 1.0 for every parameter set"""
+
+    def __init__(self, dataset: Dataset, params: List[Dict]):
+        self.dataset = dataset
+        self.params = params
+        self.dt = dataset.period / YEAR_SECONDS
+        count = len(params)
+        self.equity = np.ones(count)
+        self.peak = np.ones(count)
+        self.max_drawdown = np.zeros(count)
+
+    def _track(self, path: np.ndarray):
+        """Update drawdown stats from an equity path of shape (rows, params)"""
+        peaks = np.maximum(np.maximum.accumulate(path, axis=0), self.peak)
+        drawdown = 1.0 - np.divide(path, peaks, out=np.zeros_like(path), where=peaks > 0)
+        self.max_drawdown = np.maximum(self.max_drawdown, drawdown.max(axis=0))
+        self.peak = peaks[-1]
+        self.equity = path[-1]
+
+    def run_block(self, row: int, supply: np.ndarray, borrow: np.ndarray, prices: np.ndarray):
+        raise NotImplementedError
+
+    def extra(self, index: int) -> Dict:
+        return {}
+
+
+class StaticSupply(Strategy):
+    """Supply to one market and hold"""
+
+    def __init__(self, dataset: Dataset, params: List[Dict]):
+        super().__init__(dataset, params)
+        self.market = np.array([dataset.market_index(p['market']) for p in params])
+
+    def run_block(self, row, supply, borrow, prices):
+        growth = 1.0 + supply[:, self.market] * self.dt
+        self._track(self.equity * np.cumprod(growth, axis=0))
+
+
+class Loop(Strategy):
+    """
+    Leveraged loop: supply collateral at `leverage` x equity, borrow the rest.
+
+    Collateral accrues the supply rate and moves with price_asset (collateral
+    priced in the debt asset); debt accrues the borrow rate. The first period
+    with health factor below 1 closes the position in full, paying the
+    liquidation bonus on the debt, and equity stays flat afterwards.
+    """
+
+    def __init__(self, dataset: Dataset, params: List[Dict], start_row: int):
+        super().__init__(dataset, params)
+        self.supply_market = np.array([dataset.market_index(p['supply_market']) for p in params])
+        self.borrow_market = np.array([dataset.market_index(p['borrow_market']) for p in params])
+        self.price_asset = np.array([dataset.asset_index(p['price_asset']) if p.get('price_asset') else -1
+                                     for p in params])
+        leverage = np.array([float(p['leverage']) for p in params])
+        self.threshold = np.array([float(p['liquidation_threshold']) for p in params])
+        self.bonus = np.array([float(p.get('liquidation_bonus', 0.05)) for p in params])
+
+        start_price = self._prices(np.asarray(dataset.prices[start_row:start_row + 1]))[0]
+        self.units = leverage / start_price
+        self.debt = leverage - 1.0
+        self.liquidated_row = np.full(len(params), -1)
+
+    def _prices(self, prices: np.ndarray) -> np.ndarray:
+        if prices.shape[1] == 0:
+            return np.ones((prices.shape[0], len(self.params)))
+        return np.where(self.price_asset >= 0, prices[:, np.maximum(self.price_asset, 0)], 1.0)
+
+    def run_block(self, row, supply, borrow, prices):
+        units = self.units * np.cumprod(1.0 + supply[:, self.supply_market] * self.dt, axis=0)
+        debt = self.debt * np.cumprod(1.0 + borrow[:, self.borrow_market] * self.dt, axis=0)
+        collateral = units * self._prices(prices)
+        equity = collateral - debt
+
+        alive = self.liquidated_row < 0
+        breach = (collateral * self.threshold < debt) & alive
+        hit = breach.any(axis=0)
+        first = breach.argmax(axis=0)
+        columns = np.flatnonzero(hit)
+        if columns.size:
+            at = first[columns]
+            closed = np.maximum(collateral[at, columns] - debt[at, columns] * (1.0 + self.bonus[columns]), 0.0)
+            after = np.arange(equity.shape[0])[:, None] >= at
+            equity[:, columns] = np.where(after, closed, equity[:, columns])
+            self.liquidated_row[columns] = row + at
+
+        # Liquidated positions stay at their closing equity
+        equity[:, ~alive] = self.equity[~alive]
+        self._track(equity)
+        self.units = units[-1]
+        self.debt = debt[-1]
+
+    def extra(self, index):
+        row = int(self.liquidated_row[index])
+        return {'liquidated_at': self.dataset.timestamp_of(row) if row >= 0 else None}
+
+
+class Rebalance(Strategy):
+    """
+    Rotate between markets by supply-rate spread.
+
+    Switches to the best-paying market when it beats the current one by more
+    than spread_threshold (APR), paying switch_cost_bps on each move.
+    """
+
+    def __init__(self, dataset: Dataset, params: List[Dict]):
+        super().__init__(dataset, params)
+        names = params[0]['markets']
+        self.markets = np.array([dataset.market_index(name) for name in names])
+        self.threshold = np.array([float(p['spread_threshold']) for p in params])
+        self.keep_after_switch = 1.0 - np.array([float(p.get('switch_cost_bps', 0.0)) for p in params]) / 10_000
+        self.current = None
+        self.switches = np.zeros(len(params), dtype=int)
+
+    def run_block(self, row, supply, borrow, prices):
+        rates = np.asarray(supply[:, self.markets], dtype=float)
+        best = rates.argmax(axis=1)
+        best_rate = rates[np.arange(rates.shape[0]), best]
+        if self.current is None:
+            self.current = np.full(len(self.params), best[0])
+
+        # Path dependent (current market), so step through time with all params as one vector
+        path = np.empty((rates.shape[0], len(self.params)))
+        equity, current = self.equity, self.current
+        for step in range(rates.shape[0]):
+            switch = best_rate[step] - rates[step, current] > self.threshold
+            if switch.any():
+                current = np.where(switch, best[step], current)
+                equity = np.where(switch, equity * self.keep_after_switch, equity)
+                self.switches += switch
+            equity = equity * (1.0 + rates[step, current] * self.dt)
+            path[step] = equity
+        self.current = current
+        self._track(path)
+
+    def extra(self, index):
+        return {'switches': int(self.switches[index]),
+                'final_market': self.params[index]['markets'][int(self.current[index])]}
+
+
+def run_chunk(dataset_dir: str, entry: Dict, params: List[Dict],
+              start_row: Optional[int] = None, end_row: Optional[int] = None) -> List[Dict]:
+    """Replay one strategy entry for a chunk of parameter sets (worker process entry point)"""
+    dataset = Dataset(Path(dataset_dir))
+    start_row = 0 if start_row is None else start_row
+    end_row = dataset.rows if end_row is None else end_row
+    kind = entry['strategy']
+    if kind == 'static':
+        strategy = StaticSupply(dataset, params)
+    elif kind == 'loop':
+        strategy = Loop(dataset, params, start_row)
+    elif kind == 'rebalance':
+        strategy = Rebalance(dataset, params)
+    else:
+        raise ValueError(f"Unknown strategy '{kind}'")
+
+    for row in range(start_row, end_row, BLOCK_ROWS):
+        stop = min(row + BLOCK_ROWS, end_row)
+        strategy.run_block(
+            row,
+            np.asarray(dataset.supply[row:stop], dtype=float),
+            np.asarray(dataset.borrow[row:stop], dtype=float),
+            np.asarray(dataset.prices[row:stop], dtype=float),
+        )
+
+    years = max(end_row - start_row, 1) * dataset.period / YEAR_SECONDS
+    results = []
+    for index, param in enumerate(params):
+        final = float(strategy.equity[index])
+        results.append({
+            'name': entry.get('name', kind),
+            'strategy': kind,
+            'params': {key: value for key, value in param.items() if key in entry.get('grid', {})},
+            'final_equity': final,
+            'apr': (final ** (1.0 / years) - 1.0) if final > 0 else -1.0,
+            'max_drawdown': float(strategy.max_drawdown[index]),
+            **strategy.extra(index),
+        })
+    return results
+
+
+def expand_grid(entry: Dict) -> List[Dict]:
+    """Cartesian product of entry['grid'] merged over the entry's shared parameters"""
+    shared = {key: value for key, value in entry.items() if key not in ('grid', 'name', 'strategy')}
+    grid = entry.get('grid', {})
+    names = list(grid)
+    return [{**shared, **dict(zip(names, values))} for values in itertools.product(*(grid[name] for name in names))]
+
+
+def run_backtests(dataset_dir: Path, entries: List[Dict], workers: Optional[int] = None,
+                  start: Optional[int] = None, end: Optional[int] = None) -> List[Dict]:
+    """Split every entry's parameter grid into chunks and replay them in a process pool"""
+    dataset = Dataset(dataset_dir)
+    start_row = dataset.row_for(start, 0)
+    end_row = dataset.row_for(end, dataset.rows)
+    workers = workers or os.cpu_count() or 1
+
+    jobs = []
+    for entry in entries:
+        params = expand_grid(entry)
+        chunk_size = max(1, math.ceil(len(params) / workers))
+        for offset in range(0, len(params), chunk_size):
+            jobs.append((entry, params[offset:offset + chunk_size]))
+
+    results = []
+    if len(jobs) == 1 or workers == 1:
+        for entry, params in jobs:
+            results.extend(run_chunk(str(dataset_dir), entry, params, start_row, end_row))
+        return results
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run_chunk, str(dataset_dir), entry, params, start_row, end_row)
+                   for entry, params in jobs]
+        for future in as_completed(futures):
+            results.extend(future.result())
+    return results
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Backtest lending strategies over historical rate/price data')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    ingest_parser = subparsers.add_parser('ingest', help='Convert CSV/Parquet histories into a columnar dataset')
+    ingest_parser.add_argument('--name', required=True, help=f'Dataset name (stored under {DATASETS_DIR})')
+    ingest_parser.add_argument('--rates', nargs='+', required=True, help='Rate history file(s)')
+    ingest_parser.add_argument('--prices', nargs='*', default=[], help='Price history file(s)')
+    ingest_parser.add_argument('--period', type=int, default=DEFAULT_PERIOD,
+                               help=f'Grid period in seconds (default: {DEFAULT_PERIOD})')
+    ingest_parser.add_argument('--force', action='store_true', help='Re-ingest even if sources are unchanged')
+
+    run_parser = subparsers.add_parser('run', help='Replay strategies from a strategies JSON file')
+    run_parser.add_argument('strategies', help='Strategies JSON file')
+    run_parser.add_argument('--dataset', help='Dataset name (default: "dataset" in the strategies file)')
+    run_parser.add_argument('--start', help='Start timestamp (ISO-8601 or unix seconds)')
+    run_parser.add_argument('--end', help='End timestamp (ISO-8601 or unix seconds)')
+    run_parser.add_argument('--workers', type=int, help='Worker processes (default: CPU count)')
+    run_parser.add_argument('--top', type=int, default=20, help='Rows to print (default: 20)')
+    run_parser.add_argument('--json', action='store_true', help='Print all results as JSON')
+    args = parser.parse_args()
+
+    if args.command == 'ingest':
+        print("=" * 60)
+        print(f"Ingesting Dataset: {args.name}")
+        print("=" * 60)
+        started = time.perf_counter()
+        try:
+            meta = ingest([Path(p) for p in args.rates], [Path(p) for p in args.prices],
+                          DATASETS_DIR / args.name, args.period, args.force)
+        except (OSError, ValueError, RuntimeError) as e:
+            print(f"❌ {e}")
+            return 1
+        if meta.get('skipped'):
+            print("⏭️  Sources unchanged, dataset is up to date")
+        else:
+            print(f"✅ {meta['rows']:,} periods x {len(meta['markets'])} market(s), {len(meta['assets'])} price series "
+                  f"in {time.perf_counter() - started:.1f}s")
+        return 0
+
+    with open(args.strategies, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    dataset_name = args.dataset or config.get('dataset')
+    if not dataset_name:
+        parser.error('No dataset given (--dataset or "dataset" in the strategies file)')
+
+    started = time.perf_counter()
+    try:
+        results = run_backtests(
+            DATASETS_DIR / dataset_name, config['strategies'], args.workers,
+            parse_timestamp(args.start) if args.start else None,
+            parse_timestamp(args.end) if args.end else None,
+        )
+    except (FileNotFoundError, KeyError, ValueError) as e:
+        print(f"❌ {e}")
+        return 1
+    elapsed = time.perf_counter() - started
+    results.sort(key=lambda result: -result['apr'])
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0
+
+    print("=" * 60)
+    print(f"Backtest: {dataset_name} ({len(results)} run(s) in {elapsed:.2f}s)")
+    print("=" * 60)
+    for result in results[:args.top]:
+        params = ', '.join(f"{key}={value}" for key, value in result['params'].items())
+        note = ''
+        if result.get('liquidated_at'):
+            note = f"  ❌ liquidated {result['liquidated_at']}"
+        elif 'switches' in result:
+            note = f"  {result['switches']} switch(es)"
+        print(f"  {result['name']:<20} {params:<44} APR {result['apr']:8.2%}  "
+              f"maxDD {result['max_drawdown']:6.2%}{note}")
+    print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Global upload bandwidth cap (--bandwidth / --bandwidth-schedule).
+
+One token bucket is shared by every upload stream in the process, so the cap
+holds no matter how many uploads (or workspace books) run at once. File objects
+are wrapped so each read draws tokens before the bytes reach the HTTP layer.
+The rate is either fixed or follows a time-of-day schedule, and a reporter
+thread prints live throughput while uploads run.
+
+Rates: 2MB/s, 500KB/s, 40Mbit, 40Mbps, 1.5MiB/s, unlimited (decimal units
+unless *iB; "bps" is bits per second, "Bps" bytes per second).
+Schedule: "08:00-18:00=2MB/s,18:00-08:00=unlimited" (local time; uncovered
+times are unlimited; ranges may wrap midnight).
+"""
+
+import re
+import threading
+import time
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+# Resumable chunk size for throttled uploads (must be a multiple of 256 KiB);
+# small chunks keep each read, and each wait, short
+THROTTLED_CHUNK_SIZE = 1024 * 1024
+REPORT_INTERVAL = 5.0
+
+_UNITS = {
+    'b': 1, 'kb': 1000, 'mb': 1000 ** 2, 'gb': 1000 ** 3,
+    'kib': 1024, 'mib': 1024 ** 2, 'gib': 1024 ** 3,
+    'bit': 1 / 8, 'kbit': 1000 / 8, 'mbit': 1000 ** 2 / 8, 'gbit': 1000 ** 3 / 8,
+}
+_RATE_PATTERN = re.compile(r'^\s*([\d.]+)\s*([a-z]*)\s*(?:/s)?\s*$', re.IGNORECASE)
+
+
+def parse_rate(text: str) -> Optional[float]:
+    """Bytes per second from '2MB/s', '40Mbit', ...; None for 'unlimited' or 0"""
+    if text.strip().lower() in ('unlimited', 'none', 'off', ''):
+        return None
+    match = _RATE_PATTERN.match(text)
+    if not match:
+        raise ValueError(f"Invalid rate: {text!r} (expected e.g. 2MB/s, 500KB/s, 40Mbit)")
+    unit = match.group(2).lower() or 'b'
+    if unit.endswith('ps') and len(unit) >= 3:
+        # Network notation: the case of the b decides, 40Mbps is bits and 5MBps bytes
+        unit = unit[:-3] + ('bit' if match.group(2)[-3] == 'b' else 'b')
+    if unit not in _UNITS:
+        raise ValueError(f"Unknown rate unit in {text!r}")
+    rate = float(match.group(1)) * _UNITS[unit]
+    return rate if rate > 0 else None
+
+
+def format_rate(rate: Optional[float]) -> str:
+    if rate is None:
+        return 'unlimited'
+    for unit, size in (('GB/s', 1000 ** 3), ('MB/s', 1000 ** 2), ('KB/s', 1000)):
+        if rate >= size:
+            return f"{rate / size:.1f} {unit}"
+    return f"{rate:.0f} B/s"
+
+
+def _minutes(text: str) -> int:
+    """Minute of the day for 'HH:MM' (00:00-24:00)"""
+    hours, minutes = (int(part) for part in text.strip().split(':'))
+    if not (0 <= hours < 24 and 0 <= minutes < 60) and (hours, minutes) != (24, 0):
+        raise ValueError(f"time out of range: {text.strip()}")
+    return hours * 60 + minutes
+
+
+class Schedule:
+    """Rate by local time of day; a fixed rate is a schedule with no windows"""
+
+    def __init__(self, default: Optional[float] = None, windows: Optional[List[Tuple[int, int, Optional[float]]]] = None):
+        self.default = default
+        self.windows = windows or []
+
+    @classmethod
+    def fixed(cls, rate: Optional[float]) -> 'Schedule':
+        return cls(default=rate)
+
+    @classmethod
+    def parse(cls, text: str) -> 'Schedule':
+        windows = []
+        for part in filter(None, (item.strip() for item in text.split(','))):
+            try:
+                span, rate = part.split('=')
+                start, end = span.split('-')
+                windows.append((_minutes(start), _minutes(end), parse_rate(rate)))
+            except ValueError as e:
+                raise ValueError(f"Invalid schedule entry {part!r}: expected HH:MM-HH:MM=RATE ({e})")
+        return cls(windows=windows)
+
+    def rate_at(self, moment: Optional[datetime] = None) -> Optional[float]:
+        moment = moment or datetime.now()
+        minute = moment.hour * 60 + moment.minute
+        for start, end, rate in self.windows:
+            inside = start <= minute < end if start <= end else (minute >= start or minute < end)
+            if inside:
+                return rate
+        return self.default
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket whose rate is read from a schedule.
+
+    consume() may drive the balance negative and then sleeps off the debt
+    outside the lock; later callers see the debt and queue behind it, so the
+    combined rate of all streams stays at the cap.
+    """
+
+    def __init__(self, schedule: Schedule, burst_seconds: float = 0.25):
+        self.schedule = schedule
+        self.burst_seconds = burst_seconds
+        self.tokens = 0.0
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def consume(self, count: int):
+        rate = self.schedule.rate_at()
+        if rate is None:
+            return
+        with self.lock:
+            now = time.monotonic()
+            burst = max(rate * self.burst_seconds, THROTTLED_CHUNK_SIZE)
+            self.tokens = min(burst, self.tokens + (now - self.updated) * rate)
+            self.updated = now
+            self.tokens -= count
+            wait = -self.tokens / rate if self.tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+
+
+class ThroughputMeter:
+    """Counts bytes sent and prints the live rate from a background thread"""
+
+    def __init__(self, schedule: Schedule, interval: float = REPORT_INTERVAL):
+        self.schedule = schedule
+        self.interval = interval
+        self.total = 0
+        self.started = None
+        self.lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def add(self, count: int):
+        with self.lock:
+            self.total += count
+
+    def start(self):
+        self.started = time.monotonic()
+        self._thread = threading.Thread(target=self._report_loop, daemon=True)
+        self._thread.start()
+
+    def _report_loop(self):
+        last_total, last_time = 0, self.started
+        while not self._stop_event.wait(self.interval):
+            now = time.monotonic()
+            with self.lock:
+                total = self.total
+            if total != last_total:
+                print(f"  ⇡ {format_rate((total - last_total) / (now - last_time))} now, "
+                      f"{format_rate(total / (now - self.started))} avg, {total / 1000 ** 2:,.1f} MB sent "
+                      f"(cap {format_rate(self.schedule.rate_at())})", flush=True)
+            last_total, last_time = total, now
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join()
+        elapsed = time.monotonic() - self.started if self.started else 0.0
+        if self.total and elapsed > 0:
+            print(f"  ⇡ Sent {self.total / 1000 ** 2:,.1f} MB in {elapsed:.1f}s "
+                  f"({format_rate(self.total / elapsed)} avg)")
+
+
+class ThrottledReader:
+    """File wrapper that draws tokens for every chunk read"""
+
+    def __init__(self, fileobj, limiter: 'BandwidthLimiter'):
+        self.fileobj = fileobj
+        self.limiter = limiter
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.fileobj.read(size)
+        if data:
+            self.limiter.bucket.consume(len(data))
+            self.limiter.meter.add(len(data))
+        return data
+
+    def __getattr__(self, name):
+        # seek/tell/etc. go straight to the file (resumable uploads rewind on retry)
+        return getattr(self.fileobj, name)
+
+
+class BandwidthLimiter:
+    """Process-wide cap: one bucket and one meter shared by every upload stream"""
+
+    def __init__(self, schedule: Schedule):
+        self.schedule = schedule
+        self.bucket = TokenBucket(schedule)
+        self.meter = ThroughputMeter(schedule)
+
+    def wrap(self, fileobj) -> ThrottledReader:
+        return ThrottledReader(fileobj, self)
+
+    def describe(self) -> str:
+        if not self.schedule.windows:
+            return format_rate(self.schedule.default)
+        windows = ', '.join(f"{start // 60:02d}:{start % 60:02d}-{end // 60:02d}:{end % 60:02d} {format_rate(rate)}"
+                            for start, end, rate in self.schedule.windows)
+        return f"{windows} (now {format_rate(self.schedule.rate_at())})"
+
+    def __enter__(self):
+        print(f"Bandwidth cap: {self.describe()}")
+        self.meter.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.meter.stop()
+        return False
+
+
+def limiter_from_options(rate: Optional[str] = None, schedule: Optional[str] = None) -> Optional[BandwidthLimiter]:
+    """Limiter for --bandwidth RATE or --bandwidth-schedule SPEC (None when neither is set)"""
+    if schedule:
+        return BandwidthLimiter(Schedule.parse(schedule))
+    if rate:
+        return BandwidthLimiter(Schedule.fixed(parse_rate(rate)))
+    return None
+
+
+def add_bandwidth_arguments(parser):
+    """Register --bandwidth and --bandwidth-schedule on an argparse parser"""
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--bandwidth', metavar='RATE', help='Cap total upload rate, e.g. 2MB/s or 40Mbit')
+    group.add_argument('--bandwidth-schedule', metavar='SPEC',
+                       help='Time-of-day caps, e.g. "08:00-18:00=2MB/s,18:00-08:00=unlimited"')
+
+
+def pop_bandwidth_arguments(argv: List[str]) -> Optional[BandwidthLimiter]:
+    """
+    Remove --bandwidth[=]RATE / --bandwidth-schedule[=]SPEC from a raw argv list (for scripts without argparse).
+
+    Raises ValueError for a flag without a value or an invalid rate/schedule.
+    """
+    values = {}
+    for flag in ('--bandwidth', '--bandwidth-schedule'):
+        for index, arg in enumerate(argv):
+            if arg == flag:
+                if index + 1 >= len(argv) or argv[index + 1].startswith('--'):
+                    raise ValueError(f"{flag} expects a value")
+                values[flag] = argv[index + 1]
+                del argv[index:index + 2]
+                break
+            if arg.startswith(flag + '='):
+                values[flag] = arg.split('=', 1)[1]
+                if not values[flag]:
+                    raise ValueError(f"{flag} expects a value")
+                del argv[index]
+                break
+    return limiter_from_options(values.get('--bandwidth'), values.get('--bandwidth-schedule'))
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Check relative links, SUMMARY.md entries and in-page anchors across the book.
+Every markdown file is parsed once into a table of headings and links; results
+are cached by content hash so re-checking after a one-file edit only re-parses
+that file. Anchors follow GitBook's heading slug rules.
+"""
+
+import hashlib
+import json
+import re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import unquote
+
+# Configuration
+SCRIPT_DIR = Path(__file__).parent
+GITBOOK_DIR = SCRIPT_DIR.parent
+CONTENT_DIR = GITBOOK_DIR / "content"
+CACHE_DIR = GITBOOK_DIR / ".cache"
+CACHE_PATH = CACHE_DIR / "link_check.json"
+
+# Bump when parsing rules change so cached entries are discarded
+PARSER_VERSION = "1"
+
+HEADING_PATTERN = re.compile(r'^(#{1,6})\s+(.+?)\s*#*\s*$')
+LINK_PATTERN = re.compile(r'!?\[(?:[^\[\]]|\[[^\]]*\])*\]\(\s*<?([^)\s>]+)>?(?:\s+"[^"]*")?\s*\)')
+FENCE_PATTERN = re.compile(r'^\s*(```|~~~)')
+EXTERNAL_PREFIXES = ('http://', 'https://', 'mailto:', 'tel:', 'data:', '//')
+
+
+def gitbook_slug(text: str) -> str:
+    """
+    Anchor slug GitBook generates for a heading.
+
+    Markdown emphasis, links and emoji are dropped, the text is lowercased,
+    punctuation is removed and whitespace becomes hyphens.
+    """
+    text = re.sub(r'!?\[([^\]]*)\]\([^)]*\)', r'\1', text)
+    text = re.sub(r'[`*_~]', '', text)
+    text = text.strip().lower()
+    text = re.sub(r'[^\w\s-]', '', text)
+    text = re.sub(r'\s+', '-', text)
+    text = re.sub(r'-{2,}', '-', text)
+    return text.strip('-')
+
+
+def parse_markdown(text: str) -> Dict:
+    """Extract heading anchors and link targets (with line numbers), skipping code fences"""
+    anchors: List[str] = []
+    seen: Dict[str, int] = {}
+    links: List[Tuple[int, str]] = []
+    in_fence = False
+
+    for line_number, line in enumerate(text.split('\n'), start=1):
+        if FENCE_PATTERN.match(line):
+            in_fence = not in_fence
+            continue
+        if in_fence:
+            continue
+
+        heading = HEADING_PATTERN.match(line)
+        if heading:
+            slug = gitbook_slug(heading.group(2))
+            # Duplicate headings get -1, -2, ... suffixes
+            if slug in seen:
+                seen[slug] += 1
+                slug = f"{slug}-{seen[slug]}"
+            else:
+                seen[slug] = 0
+            anchors.append(slug)
+
+        for match in LINK_PATTERN.finditer(line):
+            links.append((line_number, match.group(1)))
+
+    return {'anchors': anchors, 'links': links}
+
+
+def _parse_file(path: str) -> Tuple[str, Dict]:
+    """Worker entry point: hash and parse one file"""
+    data = Path(path).read_bytes()
+    parsed = parse_markdown(data.decode('utf-8'))
+    parsed['hash'] = hashlib.sha256(data).hexdigest()
+    return path, parsed
+
+
+class LinkChecker:
+    """Builds the file/anchor table for a content tree and validates every link"""
+
+    def __init__(self, content_dir: Optional[Path] = None, cache_path: Optional[Path] = None, use_cache: bool = True):
+        self.content_dir = Path(content_dir) if content_dir else CONTENT_DIR
+        self.cache_path = Path(cache_path) if cache_path else CACHE_PATH
+        self.use_cache = use_cache
+        self.table: Dict[str, Dict] = {}
+
+    def _load_cache(self) -> Dict[str, Dict]:
+        if not self.use_cache or not self.cache_path.exists():
+            return {}
+        try:
+            with open(self.cache_path, 'r') as f:
+                cache = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+        if cache.get('version') != PARSER_VERSION:
+            return {}
+        return cache.get('files', {})
+
+    def _save_cache(self):
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.cache_path, 'w') as f:
+            json.dump({'version': PARSER_VERSION, 'files': self.table}, f)
+
+    def build_table(self, workers: Optional[int] = None) -> int:
+        """
+        Parse every markdown file whose content hash changed since the last run.
+
+        Returns the number of files that had to be re-parsed.
+        """
+        cache = self._load_cache()
+        md_files = sorted(self.content_dir.rglob('*.md'))
+        stale = []
+
+        for md_file in md_files:
+            key = md_file.relative_to(self.content_dir).as_posix()
+            cached = cache.get(key)
+            if cached:
+                digest = hashlib.sha256(md_file.read_bytes()).hexdigest()
+                if digest == cached.get('hash'):
+                    self.table[key] = cached
+                    continue
+            stale.append(str(md_file))
+
+        if len(stale) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                parsed_files = list(executor.map(_parse_file, stale))
+        else:
+            parsed_files = [_parse_file(path) for path in stale]
+
+        for path, parsed in parsed_files:
+            key = Path(path).relative_to(self.content_dir).as_posix()
+            self.table[key] = parsed
+
+        self._save_cache()
+        return len(stale)
+
+    def resolve(self, source: str, target: str) -> Tuple[Optional[str], str]:
+        """Resolve a link target relative to its source file into (content-relative path, anchor)"""
+        path_part, _, anchor = target.partition('#')
+        path_part = unquote(path_part.split('?', 1)[0])
+        if not path_part:
+            return source, anchor
+
+        base = (self.content_dir / source).parent
+        resolved = (base / path_part).resolve()
+        try:
+            return resolved.relative_to(self.content_dir.resolve()).as_posix(), anchor
+        except ValueError:
+            return None, anchor
+
+    def check(self) -> List[Dict]:
+        """Validate every relative link and anchor against the table"""
+        problems = []
+        for source, entry in sorted(self.table.items()):
+            for line_number, target in entry['links']:
+                if target.startswith(EXTERNAL_PREFIXES):
+                    continue
+
+                resolved, anchor = self.resolve(source, target)
+                problem = None
+                if resolved is None:
+                    problem = 'points outside the content root'
+                elif resolved not in self.table:
+                    if not (self.content_dir / resolved).exists():
+                        problem = 'file not found'
+                    elif anchor:
+                        problem = 'anchor on a non-markdown file'
+                elif anchor and anchor.lower() not in self.table[resolved]['anchors']:
+                    problem = f"anchor '#{anchor}' not found in {resolved}"
+
+                if problem:
+                    problems.append({'file': source, 'line': line_number, 'target': target, 'problem': problem})
+
+        problems.extend(self.check_summary())
+        return problems
+
+    def check_summary(self) -> List[Dict]:
+        """Report markdown pages that SUMMARY.md does not list"""
+        summary = self.table.get('SUMMARY.md')
+        if summary is None:
+            return [{'file': 'SUMMARY.md', 'line': 0, 'target': '', 'problem': 'SUMMARY.md not found'}]
+
+        listed = set()
+        for _, target in summary['links']:
+            resolved, _ = self.resolve('SUMMARY.md', target)
+            if resolved:
+                listed.add(resolved)
+
+        return [
+            {'file': 'SUMMARY.md', 'line': 0, 'target': page, 'problem': 'page not listed in SUMMARY.md'}
+            for page in sorted(self.table)
+            if page not in listed and page not in ('SUMMARY.md', 'README.md')
+        ]
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Check relative links and anchors in the GitBook content')
+    parser.add_argument('--content', help=f'Content root (default: {CONTENT_DIR})')
+    parser.add_argument('--workers', type=int, help='Worker processes for parsing (default: CPU count)')
+    parser.add_argument('--no-cache', action='store_true', help='Ignore the parse cache')
+    parser.add_argument('--json', action='store_true', help='Print problems as JSON')
+    args = parser.parse_args()
+
+    checker = LinkChecker(content_dir=args.content, use_cache=not args.no_cache)
+    reparsed = checker.build_table(workers=args.workers)
+    problems = checker.check()
+
+    if args.json:
+        print(json.dumps(problems, indent=2))
+        return 1 if problems else 0
+
+    print("=" * 60)
+    print("Checking Links and Anchors")
+    print("=" * 60)
+    print(f"Files: {len(checker.table)} ({reparsed} re-parsed)")
+    print()
+
+    for problem in problems:
+        location = f"{problem['file']}:{problem['line']}" if problem['line'] else problem['file']
+        target = f" → {problem['target']}" if problem['target'] else ''
+        print(f"  ❌ {location}{target}: {problem['problem']}")
+
+    print()
+    print("=" * 60)
+    if problems:
+        print(f"❌ {len(problems)} broken link(s) found")
+    else:
+        print("✅ All links and anchors resolve")
+    print()
+
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Pre-compress text assets (SVG, captions, JSON, CSV, ...) before upload.
+
+GCS serves objects byte-for-byte, so a compressed object is stored with
+Content-Encoding set and browsers decode it transparently. gzip is the default
+because GCS transcodes gzip objects back to identity for clients that do not
+send Accept-Encoding: gzip; brotli objects are never transcoded, so brotli is
+opt-in (every browser GitBook supports accepts br over HTTPS, but curl and
+some crawlers do not).
+
+Already-compressed formats (PNG, JPEG, MP4, M4A, ...) are never touched, and
+the compressed copy is only kept when it saves at least MIN_SAVINGS.
+"""
+
+import gzip
+import os
+import sys
+import tempfile
+from pathlib import Path
+from typing import Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # optional: pip install brotli
+    brotli = None
+
+COMPRESSIBLE_MIME_TYPES = {
+    'image/svg+xml',
+    'application/json',
+    'application/ld+json',
+    'application/javascript',
+    'application/xml',
+    'application/x-subrip',
+    'application/wasm',
+    'application/vnd.apple.mpegurl',
+}
+# Anything that is text/* compresses well (html, css, csv, vtt, markdown, plain)
+COMPRESSIBLE_PREFIXES = ('text/',)
+
+# Keep the compressed copy only if it is at least this much smaller
+MIN_SAVINGS = 0.10
+# Below this the saving is lost in HTTP overhead
+MIN_SIZE = 1024
+
+
+def is_compressible(mime_type: str) -> bool:
+    return mime_type in COMPRESSIBLE_MIME_TYPES or mime_type.startswith(COMPRESSIBLE_PREFIXES)
+
+
+def compress_bytes(data: bytes, encoding: str = 'gzip') -> bytes:
+    """Compress at the highest level; uploads happen once, downloads many times"""
+    if encoding == 'br':
+        if brotli is None:
+            raise RuntimeError("brotli encoding requested but the brotli package is not installed")
+        return brotli.compress(data, quality=11)
+    # mtime=0 keeps the output (and its MD5) stable across runs
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def compress_for_upload(file_path, mime_type: str, encoding: str = 'gzip') -> Tuple[str, Optional[str], Optional[str]]:
+    """
+    Return (path_to_upload, temp_path_to_cleanup, content_encoding) for a file.
+
+    Non-compressible types, tiny files and files that do not shrink by
+    MIN_SAVINGS are uploaded as-is with no Content-Encoding.
+    """
+    if encoding == 'br' and brotli is None:
+        print("  ⚠️  brotli is not installed, falling back to gzip")
+        encoding = 'gzip'
+    if not is_compressible(mime_type):
+        return str(file_path), None, None
+
+    original = Path(file_path).read_bytes()
+    if len(original) < MIN_SIZE:
+        return str(file_path), None, None
+    compressed = compress_bytes(original, encoding)
+    if len(compressed) > len(original) * (1.0 - MIN_SAVINGS):
+        print(f"  ⏭️  Not compressing {Path(file_path).name} "
+              f"({len(compressed) / len(original):.0%} of original with {encoding})")
+        return str(file_path), None, None
+
+    fd, temp_path = tempfile.mkstemp(suffix=Path(file_path).suffix, prefix='compressed_')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(compressed)
+    print(f"  🗜️  {encoding} {Path(file_path).name}: {len(original):,} → {len(compressed):,} bytes "
+          f"(-{1.0 - len(compressed) / len(original):.0%})")
+    return temp_path, temp_path, encoding
+
+
+def pop_compression_argument(argv) -> Optional[str]:
+    """
+    Remove --no-compress / --brotli from a raw argv list (for scripts without argparse).
+
+    Returns the encoding to use, or None when compression is disabled.
+    """
+    encoding = 'gzip'
+    if '--brotli' in argv:
+        argv.remove('--brotli')
+        encoding = 'br'
+    if '--no-compress' in argv:
+        argv.remove('--no-compress')
+        encoding = None
+    return encoding
+
+
+if __name__ == "__main__":
+    import mimetypes
+
+    encoding = pop_compression_argument(sys.argv) or 'gzip'
+    if encoding == 'br' and brotli is None:
+        print("❌ brotli is not installed (pip install brotli)")
+        sys.exit(1)
+    if len(sys.argv) < 2:
+        print("Usage: python compression.py [--brotli] <file> [file ...]")
+        print("\nReports how much each file would shrink; nothing is written.")
+        sys.exit(1)
+
+    total_before = total_after = 0
+    for name in sys.argv[1:]:
+        mime_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        size = os.path.getsize(name)
+        if not is_compressible(mime_type):
+            print(f"⏭️  {name}: {mime_type} is not compressible")
+            continue
+        compressed = len(compress_bytes(Path(name).read_bytes(), encoding))
+        total_before += size
+        total_after += compressed
+        print(f"✅ {name}: {size:,} → {compressed:,} bytes ({compressed / max(size, 1):.0%})")
+    if total_before:
+        print(f"\nTotal: {total_before:,} → {total_after:,} bytes (-{1.0 - total_after / total_before:.0%})")
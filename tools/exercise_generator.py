@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""
+Generate per-learner variants of the calculation exercises (Exercises 2 and 3).
+
+Each template draws its parameters for the whole cohort at once from per-learner
+seeds and computes every answer in one vectorized batch, so a learner always gets
+the same numbers for the same cohort seed no matter who else is in the cohort.
+Writes one markdown problem set per learner plus a columnar answer-key JSON.
+
+Usage:
+    python exercise_generator.py --cohort 10000 --seed 2024
+    python exercise_generator.py --learners learners.txt --templates health_factor,accrued_interest
+"""
+
+import hashlib
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import numpy as np
+
+from interest_rate_models import kinked_borrow_rate, supply_rate
+
+# Configuration
+SCRIPT_DIR = Path(__file__).parent
+GITBOOK_DIR = SCRIPT_DIR.parent
+OUTPUT_DIR = GITBOOK_DIR / "_generated" / "exercises"
+ANSWER_KEY_FILENAME = "answer_key.json"
+
+_MASK64 = np.uint64(0xFFFFFFFFFFFFFFFF)
+
+
+def learner_keys(learners: List[str], cohort_seed: int, template_id: str) -> np.ndarray:
+    """Stable 64-bit key per learner and template"""
+    prefix = f"{cohort_seed}:{template_id}:".encode('utf-8')
+    return np.array([int.from_bytes(hashlib.blake2b(prefix + learner.encode('utf-8'), digest_size=8).digest(), 'little')
+                     for learner in learners], dtype=np.uint64)
+
+
+def _splitmix64(values: np.ndarray) -> np.ndarray:
+    with np.errstate(over='ignore'):
+        z = values + np.uint64(0x9E3779B97F4A7C15)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return (z ^ (z >> np.uint64(31))) & _MASK64
+
+
+class Draws:
+    """Counter-based random draws: draw i for learner k depends only on (key k, i)"""
+
+    def __init__(self, keys: np.ndarray):
+        self.keys = keys
+        self.counter = 0
+
+    def unit(self) -> np.ndarray:
+        self.counter += 1
+        with np.errstate(over='ignore'):
+            bits = _splitmix64(self.keys + np.uint64(self.counter) * np.uint64(0xD1B54A32D192ED03))
+        return (bits >> np.uint64(11)).astype(np.float64) / float(1 << 53)
+
+    def uniform(self, low: float, high: float, step: float) -> np.ndarray:
+        """Uniform on [low, high] rounded to step, so numbers stay hand-calculable"""
+        return np.round((low + self.unit() * (high - low)) / step) * step
+
+    def choice(self, values: List) -> np.ndarray:
+        values = np.asarray(values)
+        return values[np.minimum((self.unit() * len(values)).astype(int), len(values) - 1)]
+
+
+# ---------------------------------------------------------------------------
+# Templates: draw(draws) -> params, solve(params) -> answers; all arrays
+# ---------------------------------------------------------------------------
+
+def _draw_health_factor(draws: Draws) -> Dict[str, np.ndarray]:
+    price = draws.uniform(1500, 4000, 50)
+    amount = draws.uniform(2, 20, 0.5)
+    threshold = draws.choice([0.80, 0.825, 0.85, 0.86])
+    debt = np.round(amount * price * threshold / draws.uniform(1.2, 2.2, 0.05) / 100) * 100
+    return {'amount': amount, 'price': price, 'threshold': threshold, 'debt': debt,
+            'new_price': np.round(price * (1 - draws.uniform(0.10, 0.35, 0.05)) / 50) * 50}
+
+
+def _solve_health_factor(p: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    collateral = p['amount'] * p['price']
+    return {
+        'collateral_value': collateral,
+        'health_factor': collateral * p['threshold'] / p['debt'],
+        'new_health_factor': p['amount'] * p['new_price'] * p['threshold'] / p['debt'],
+        'liquidation_price': p['debt'] / (p['amount'] * p['threshold']),
+    }
+
+
+def _draw_liquidation_price(draws: Draws) -> Dict[str, np.ndarray]:
+    price = draws.uniform(20, 200, 1)
+    amount = draws.uniform(100, 2000, 50)
+    threshold = draws.choice([0.65, 0.70, 0.75, 0.78])
+    debt = np.round(amount * price * threshold * draws.uniform(0.45, 0.8, 0.05) / 100) * 100
+    return {'amount': amount, 'price': price, 'threshold': threshold, 'debt': debt,
+            'danger_health': draws.choice([1.2, 1.3, 1.5])}
+
+
+def _solve_liquidation_price(p: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    liquidation_price = p['debt'] / (p['amount'] * p['threshold'])
+    return {
+        'liquidation_price': liquidation_price,
+        'drop_to_liquidation': 1.0 - liquidation_price / p['price'],
+        'drop_to_danger': 1.0 - liquidation_price * p['danger_health'] / p['price'],
+    }
+
+
+def _draw_accrued_interest(draws: Draws) -> Dict[str, np.ndarray]:
+    return {'principal': draws.uniform(5_000, 100_000, 500), 'apr': draws.uniform(0.02, 0.15, 0.005),
+            'days': draws.choice([30, 90, 180, 365])}
+
+
+def _solve_accrued_interest(p: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    years = p['days'] / 365.0
+    return {
+        'simple_interest': p['principal'] * p['apr'] * years,
+        # Lending pools compound every second; continuous compounding is indistinguishable
+        'compound_interest': p['principal'] * np.expm1(p['apr'] * years),
+        'apy': np.expm1(p['apr']),
+    }
+
+
+def _draw_utilization_rates(draws: Draws) -> Dict[str, np.ndarray]:
+    supplied = draws.uniform(1_000_000, 50_000_000, 100_000)
+    return {'supplied': supplied, 'borrowed': np.round(supplied * draws.uniform(0.4, 0.98, 0.01) / 10_000) * 10_000,
+            'slope1': draws.choice([0.04, 0.05, 0.07]), 'slope2': draws.choice([0.6, 0.75, 1.0, 3.0]),
+            'kink': draws.choice([0.8, 0.9, 0.92]), 'reserve_factor': draws.choice([0.1, 0.15, 0.2])}
+
+
+def _solve_utilization_rates(p: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    utilization = p['borrowed'] / p['supplied']
+    borrow = kinked_borrow_rate(utilization, 0.0, p['slope1'], p['slope2'], p['kink'])
+    return {
+        'utilization': utilization,
+        'borrow_rate': borrow,
+        'supply_rate': supply_rate(borrow, utilization, p['reserve_factor']),
+    }
+
+
+def _draw_ltv_buffer(draws: Draws) -> Dict[str, np.ndarray]:
+    max_ltv = draws.choice([0.70, 0.75, 0.80])
+    collateral = draws.uniform(10_000, 100_000, 1_000)
+    return {'collateral': collateral, 'max_ltv': max_ltv, 'threshold': max_ltv + draws.choice([0.03, 0.05]),
+            'borrowed': np.round(collateral * max_ltv * draws.uniform(0.5, 0.95, 0.05) / 100) * 100}
+
+
+def _solve_ltv_buffer(p: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    ltv = p['borrowed'] / p['collateral']
+    return {'max_borrow': p['collateral'] * p['max_ltv'], 'current_ltv': ltv, 'safety_buffer': p['threshold'] - ltv}
+
+
+def _money(value) -> str:
+    return f"${value:,.2f}"
+
+
+def _pct(value) -> str:
+    return f"{value * 100:.2f}%"
+
+
+def _num(value) -> str:
+    return f"{value:,.3f}"
+
+
+class Template:
+    def __init__(self, template_id: str, title: str, draw: Callable, solve: Callable, prompt: str,
+                 answers: List[tuple]):
+        self.id = template_id
+        self.title = title
+        self.draw = draw
+        self.solve = solve
+        self.prompt = prompt
+        # (answer field, label, formatter, relative tolerance for grading)
+        self.answers = answers
+
+
+TEMPLATES = [
+    Template(
+        'health_factor', 'Health Factor Calculation', _draw_health_factor, _solve_health_factor,
+        "**Scenario**: You deposit {amount:g} ETH @ ${price:,.0f}/ETH and borrow ${debt:,.0f} USDC\n"
+        "- Liquidation Threshold: {threshold:.1%}\n"
+        "- Later, ETH drops to ${new_price:,.0f}\n",
+        [('collateral_value', 'Collateral value', _money, 0.001),
+         ('health_factor', 'Health Factor', _num, 0.005),
+         ('new_health_factor', 'Health Factor after the drop', _num, 0.005),
+         ('liquidation_price', 'ETH price at which liquidation triggers (HF = 1.0)', _money, 0.005)],
+    ),
+    Template(
+        'liquidation_price', 'Liquidation Price and Buffer', _draw_liquidation_price, _solve_liquidation_price,
+        "**Your Position**:\n"
+        "- Collateral: {amount:,.0f} tokens @ ${price:,.0f}\n"
+        "- Borrowed: ${debt:,.0f} USDC\n"
+        "- Liquidation Threshold: {threshold:.0%}\n"
+        "- Danger zone: HF < {danger_health:g}\n",
+        [('liquidation_price', 'Liquidation price', _money, 0.005),
+         ('drop_to_liquidation', 'Price drop until liquidation', _pct, 0.01),
+         ('drop_to_danger', 'Price drop until the danger zone', _pct, 0.01)],
+    ),
+    Template(
+        'accrued_interest', 'Accrued Interest', _draw_accrued_interest, _solve_accrued_interest,
+        "**Scenario**: You borrow ${principal:,.0f} at {apr:.1%} APR for {days:.0f} days\n",
+        [('simple_interest', 'Interest with simple accrual', _money, 0.005),
+         ('compound_interest', 'Interest with per-second compounding', _money, 0.005),
+         ('apy', 'Equivalent APY', _pct, 0.01)],
+    ),
+    Template(
+        'utilization_rates', 'Utilization and Interest Rates', _draw_utilization_rates, _solve_utilization_rates,
+        "**Pool Statistics**:\n"
+        "- Total Supplied: ${supplied:,.0f}\n"
+        "- Total Borrowed: ${borrowed:,.0f}\n"
+        "- Rate model: 0% base, {slope1:.0%} slope below a {kink:.0%} kink, {slope2:.0%} slope above it\n"
+        "- Reserve factor: {reserve_factor:.0%}\n",
+        [('utilization', 'Utilization', _pct, 0.005),
+         ('borrow_rate', 'Borrow APR', _pct, 0.01),
+         ('supply_rate', 'Supply APR', _pct, 0.01)],
+    ),
+    Template(
+        'ltv_buffer', 'Maximum Borrowing Capacity', _draw_ltv_buffer, _solve_ltv_buffer,
+        "**Scenario**:\n"
+        "- Collateral value: ${collateral:,.0f}\n"
+        "- Maximum LTV: {max_ltv:.0%}\n"
+        "- Liquidation Threshold: {threshold:.0%}\n"
+        "- You borrow ${borrowed:,.0f}\n",
+        [('max_borrow', 'Maximum borrow', _money, 0.001),
+         ('current_ltv', 'Current LTV', _pct, 0.005),
+         ('safety_buffer', 'Safety buffer to the liquidation threshold', _pct, 0.01)],
+    ),
+]
+TEMPLATES_BY_ID = {template.id: template for template in TEMPLATES}
+
+
+def generate(learners: List[str], cohort_seed: int, templates: List[Template]) -> Dict[str, Dict]:
+    """Draw parameters and solve every template for the whole cohort (one batch per template)"""
+    batches = {}
+    for template in templates:
+        params = template.draw(Draws(learner_keys(learners, cohort_seed, template.id)))
+        params = {name: np.broadcast_to(values, (len(learners),)) for name, values in params.items()}
+        batches[template.id] = {'params': params, 'answers': template.solve(params)}
+    return batches
+
+
+def render_markdown(learner: str, index: int, templates: List[Template], batches: Dict[str, Dict]) -> str:
+    lines = [
+        f"# Calculation Practice: {learner}",
+        "",
+        "📚 Based on Exercise 2 (Calculation Practice and Risk Metrics) and Exercise 3 (Risk Assessment)",
+        "",
+    ]
+    exercise = 0
+    for template in templates:
+        params = {name: values[index].item() for name, values in batches[template.id]['params'].items()}
+        lines.append(f"## {template.title}")
+        lines.append("")
+        lines.append(template.prompt.format(**params))
+        for _, label, _, _ in template.answers:
+            exercise += 1
+            lines.append(f"**Exercise {exercise}**: {label}")
+            lines.append("- Your answer: _____")
+            lines.append("")
+    return "\n".join(lines)
+
+
+def build_answer_key(learners: List[str], cohort_seed: int, templates: List[Template],
+                     batches: Dict[str, Dict]) -> Dict:
+    """Columnar key: one list per answer field, indexed like 'learners'"""
+    return {
+        'cohort_seed': cohort_seed,
+        'learners': learners,
+        'templates': [
+            {
+                'id': template.id,
+                'fields': [
+                    {'name': name, 'label': label, 'tolerance': tolerance,
+                     'values': np.round(batches[template.id]['answers'][name], 6).tolist()}
+                    for name, label, _, tolerance in template.answers
+                ],
+            }
+            for template in templates
+        ],
+    }
+
+
+def write_cohort(output_dir: Path, learners: List[str], cohort_seed: int, templates: List[Template],
+                 batches: Dict[str, Dict]) -> Path:
+    output_dir.mkdir(parents=True, exist_ok=True)
+    for index, learner in enumerate(learners):
+        with open(output_dir / f"{learner}.md", 'w', encoding='utf-8') as f:
+            f.write(render_markdown(learner, index, templates, batches))
+    key_path = output_dir / ANSWER_KEY_FILENAME
+    with open(key_path, 'w', encoding='utf-8') as f:
+        json.dump(build_answer_key(learners, cohort_seed, templates, batches), f, separators=(',', ':'))
+    return key_path
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Generate per-learner calculation exercises with answer keys')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--cohort', type=int, metavar='N', help='Generate learner-00001 .. learner-N')
+    source.add_argument('--learners', help='Text file with one learner id per line')
+    parser.add_argument('--seed', type=int, default=0, help='Cohort seed (default: 0)')
+    parser.add_argument('--templates', help=f"Comma-separated templates (default: all of {', '.join(TEMPLATES_BY_ID)})")
+    parser.add_argument('--output', help=f'Output directory (default: {OUTPUT_DIR})')
+    parser.add_argument('--show', help='Print the problem set of one learner instead of writing files')
+    args = parser.parse_args()
+
+    if args.cohort:
+        learners = [f"learner-{number:05d}" for number in range(1, args.cohort + 1)]
+    else:
+        with open(args.learners, 'r', encoding='utf-8') as f:
+            learners = [line.strip() for line in f if line.strip()]
+        separators = {'/', '\\', os.sep, os.altsep} - {None}
+        invalid = [learner for learner in learners
+                   if learner in ('.', '..') or any(separator in learner for separator in separators)]
+        if invalid:
+            parser.error(f"Learner ids cannot contain path separators: {', '.join(invalid)}")
+    if args.show and args.show not in learners:
+        learners.append(args.show)
+
+    if args.templates:
+        unknown = [name for name in args.templates.split(',') if name not in TEMPLATES_BY_ID]
+        if unknown:
+            parser.error(f"Unknown template(s): {', '.join(unknown)}")
+        templates = [TEMPLATES_BY_ID[name] for name in args.templates.split(',')]
+    else:
+        templates = TEMPLATES
+
+    started = time.perf_counter()
+    batches = generate(learners, args.seed, templates)
+    solved = time.perf_counter()
+
+    if args.show:
+        print(render_markdown(args.show, learners.index(args.show), templates, batches))
+        return 0
+
+    output_dir = Path(args.output) if args.output else OUTPUT_DIR
+    key_path = write_cohort(output_dir, learners, args.seed, templates, batches)
+    finished = time.perf_counter()
+
+    print("=" * 60)
+    print("Exercise Generator")
+    print("=" * 60)
+    print(f"✅ {len(learners):,} learner(s) x {len(templates)} template(s)")
+    print(f"   Drawn and solved in {(solved - started) * 1000:.0f} ms, written in {finished - solved:.1f}s")
+    print(f"   Problem sets: {output_dir}")
+    print(f"   Answer key:   {key_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
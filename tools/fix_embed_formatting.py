@@ -6,6 +6,9 @@ Adds blank line between audio and video embeds.
 
 from pathlib import Path
 import re
+import sys
+
+from profiling import pop_profile_argument, profiled, span
 
 # Configuration
 SCRIPT_DIR = Path(__file__).parent
@@ -31,10 +34,11 @@ def fix_embed_formatting(lesson_file: Path) -> tuple[bool, str]:
     # Check if pattern exists
     if re.search(pattern, content):
         # Replace the pattern
-        new_content = re.sub(pattern, replacement, content)
+        with span('rewrite'):
+            new_content = re.sub(pattern, replacement, content)
         
         # Write back to file
-        with open(lesson_file, 'w', encoding='utf-8') as f:
+        with span('write'), open(lesson_file, 'w', encoding='utf-8') as f:
             f.write(new_content)
         
         return True, f"Fixed formatting in {lesson_file.name}"
@@ -46,17 +50,17 @@ def fix_embed_formatting(lesson_file: Path) -> tuple[bool, str]:
         else:
             return False, f"Could not find expected embed pattern in {lesson_file.name}"
 
-def main():
+def main(lessons_dir: Path = LESSONS_DIR) -> int:
     """Process all lesson files"""
     print("=" * 60)
     print("Fixing Embed Formatting in Lesson Files")
     print("=" * 60)
     print()
     
-    lesson_files = sorted(LESSONS_DIR.glob("lesson-*.md"))
+    lesson_files = sorted(lessons_dir.glob("lesson-*.md"))
     if not lesson_files:
         print("No lesson files found!")
-        return
+        return 1
     
     success_count = 0
     skip_count = 0
@@ -86,7 +90,9 @@ def main():
     print(f"⏭️  Already correct: {skip_count}")
     print(f"❌ Failed: {fail_count}")
     print()
+    return 1 if fail_count else 0
 
 if __name__ == "__main__":
-    main()
+    with profiled(pop_profile_argument(sys.argv), 'fix_embed_formatting'):
+        sys.exit(main())
 
@@ -6,8 +6,11 @@ Encodes special characters in filenames to make URLs work properly in GitBook.
 
 from pathlib import Path
 import re
+import sys
 from urllib.parse import quote
 
+from profiling import pop_profile_argument, profiled, span
+
 # Configuration
 SCRIPT_DIR = Path(__file__).parent
 GITBOOK_DIR = SCRIPT_DIR.parent
@@ -32,7 +35,7 @@ def encode_url_in_embed(match):
     
     return match.group(0)
 
-def fix_url_encoding(lesson_file: Path) -> tuple[bool, str]:
+def fix_url_encoding(lesson_file: Path, bucket_name: str = BUCKET_NAME) -> tuple[bool, str]:
     """
     Fix URL encoding in embed tags.
     """
@@ -40,36 +43,37 @@ def fix_url_encoding(lesson_file: Path) -> tuple[bool, str]:
     with open(lesson_file, 'r', encoding='utf-8') as f:
         content = f.read()
     
-    # Pattern to match embed tags with money-markets-media URLs
-    pattern = r'\{% embed url="(https://storage\.googleapis\.com/money-markets-media/[^"]+)" %\}'
+    # Pattern to match embed tags with media bucket URLs
+    pattern = r'\{% embed url="(https://storage\.googleapis\.com/' + re.escape(bucket_name) + r'/[^"]+)" %\}'
     
     # Check if pattern exists
     matches = re.findall(pattern, content)
     if matches:
         # Replace all embed URLs with encoded versions
-        new_content = re.sub(pattern, encode_url_in_embed, content)
+        with span('rewrite'):
+            new_content = re.sub(pattern, encode_url_in_embed, content)
         
         # Only write if something changed
         if new_content != content:
-            with open(lesson_file, 'w', encoding='utf-8') as f:
+            with span('write'), open(lesson_file, 'w', encoding='utf-8') as f:
                 f.write(new_content)
             return True, f"Fixed URL encoding in {lesson_file.name}"
         else:
             return True, f"URLs already encoded in {lesson_file.name}"
     else:
-        return False, f"No money-markets-media embeds found in {lesson_file.name}"
+        return False, f"No {bucket_name} embeds found in {lesson_file.name}"
 
-def main():
+def main(lessons_dir: Path = LESSONS_DIR, bucket_name: str = BUCKET_NAME) -> int:
     """Process all lesson files"""
     print("=" * 60)
     print("Fixing URL Encoding in Embed Tags")
     print("=" * 60)
     print()
     
-    lesson_files = sorted(LESSONS_DIR.glob("lesson-*.md"))
+    lesson_files = sorted(lessons_dir.glob("lesson-*.md"))
     if not lesson_files:
         print("No lesson files found!")
-        return
+        return 1
     
     success_count = 0
     skip_count = 0
@@ -77,7 +81,7 @@ def main():
     
     for lesson_file in lesson_files:
         print(f"Processing: {lesson_file.name}")
-        success, message = fix_url_encoding(lesson_file)
+        success, message = fix_url_encoding(lesson_file, bucket_name)
         
         if success:
             if "already encoded" in message:
@@ -99,7 +103,9 @@ def main():
     print(f"⏭️  Already encoded: {skip_count}")
     print(f"❌ Failed: {fail_count}")
     print()
+    return 1 if fail_count else 0
 
 if __name__ == "__main__":
-    main()
+    with profiled(pop_profile_argument(sys.argv), 'fix_url_encoding'):
+        sys.exit(main())
 
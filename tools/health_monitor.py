@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+"""
+Asynchronous health-factor monitor for many positions (lesson 4, exercise 4, lesson 12).
+
+Price and borrow-rate updates arrive from one or more pluggable async sources
+(a JSON-lines file replay, a TCP socket standing in for an RPC feed, or a
+synthetic random walk) and are processed in order from a shared queue. Each
+position's risk-weighted collateral and debt values are kept as running sums:
+an update to asset A only touches the positions indexed under A, adjusting
+their sums by the price (or borrow index) change and re-banding them.
+
+Bands follow lesson 3's zones: safe > 2.0, watchful 1.5-2.0, danger 1.2-1.5,
+critical 1.0-1.2, liquidatable < 1.0. A band change is alerted once it has
+held for --debounce seconds of feed time and cleared the boundary by the
+--hysteresis margin; falling below 1.0 is alerted immediately.
+
+Update lines: {"type": "price", "asset": "ETH", "price": 3012.5, "time": 1700000000}
+              {"type": "rate", "asset": "USDC", "rate": 0.061, "time": 1700000012}
+Positions JSON: {"markets": {"ETH": {"price": 3000, "liquidation_threshold": 0.825},
+                             "USDC": {"price": 1, "liquidation_threshold": 0.87, "borrow_rate": 0.05}},
+                 "positions": [{"id": "0xabc", "collateral": {"ETH": 10}, "debt": {"USDC": 15000}}]}
+"""
+
+import asyncio
+import json
+import math
+import sys
+import time
+from pathlib import Path
+from typing import AsyncIterator, Callable, Dict, List, Optional
+
+import numpy as np
+
+SECONDS_PER_YEAR = 365 * 86400
+DEFAULT_BANDS = (1.0, 1.2, 1.5, 2.0)
+ZONE_NAMES = ('liquidatable', 'critical', 'danger', 'watchful', 'safe')
+LATENCY_SAMPLES = 100_000
+
+
+class Market:
+    """Price, borrow rate and borrow index of one asset"""
+
+    def __init__(self, price: float, liquidation_threshold: float = 0.0, borrow_rate: float = 0.0,
+                 updated_at: float = 0.0):
+        self.price = price
+        self.liquidation_threshold = liquidation_threshold
+        self.borrow_rate = borrow_rate
+        self.borrow_index = 1.0
+        self.updated_at = updated_at
+
+    def accrue(self, t: float) -> float:
+        """Advance the borrow index to t at the current rate; returns the new index"""
+        if t > self.updated_at:
+            self.borrow_index *= math.exp(self.borrow_rate * (t - self.updated_at) / SECONDS_PER_YEAR)
+            self.updated_at = t
+        return self.borrow_index
+
+
+class HealthMonitor:
+    """
+    Positions indexed by asset, with incrementally maintained health factors.
+
+    weighted[i] = sum of collateral amount x price x liquidation threshold,
+    debt[i] = sum of scaled debt x borrow index x price; a price or rate
+    change on one asset adds a delta to the positions holding it.
+    """
+
+    def __init__(self, markets: Dict[str, Market], positions: List[Dict], bands=DEFAULT_BANDS,
+                 debounce: float = 30.0, hysteresis: float = 0.01, on_alert: Optional[Callable[[Dict], None]] = None):
+        self.markets = markets
+        self.ids = [position['id'] for position in positions]
+        self.bands = np.asarray(bands, dtype=float)
+        self.raise_bands = self.bands * (1.0 + hysteresis)
+        self.lower_bands = self.bands * (1.0 - hysteresis)
+        # Health factor limits of each band, widened by the hysteresis margin
+        self.leave_below_by_zone = np.concatenate([[-np.inf], self.lower_bands])
+        self.leave_above_by_zone = np.concatenate([self.raise_bands, [np.inf]])
+        self.debounce = debounce
+        self.on_alert = on_alert or (lambda alert: None)
+
+        count = len(positions)
+        self.weighted = np.zeros(count)
+        self.debt = np.zeros(count)
+        collateral_index: Dict[str, List] = {asset: [[], []] for asset in markets}
+        debt_index: Dict[str, List] = {asset: [[], []] for asset in markets}
+        for i, position in enumerate(positions):
+            for asset, amount in position.get('collateral', {}).items():
+                coefficient = amount * markets[asset].liquidation_threshold
+                collateral_index[asset][0].append(i)
+                collateral_index[asset][1].append(coefficient)
+                self.weighted[i] += coefficient * markets[asset].price
+            for asset, amount in position.get('debt', {}).items():
+                # Scaled debt (amount / borrow index), as Aave stores variable debt
+                scaled = amount / markets[asset].borrow_index
+                debt_index[asset][0].append(i)
+                debt_index[asset][1].append(scaled)
+                self.debt[i] += amount * markets[asset].price
+
+        self.collateral_ids = {asset: np.array(ids, dtype=np.int64) for asset, (ids, _) in collateral_index.items()}
+        self.collateral_coef = {asset: np.array(coefs) for asset, (_, coefs) in collateral_index.items()}
+        self.debt_ids = {asset: np.array(ids, dtype=np.int64) for asset, (ids, _) in debt_index.items()}
+        self.debt_scaled = {asset: np.array(scaled) for asset, (_, scaled) in debt_index.items()}
+        self.affected = {asset: np.union1d(self.collateral_ids[asset], self.debt_ids[asset]) for asset in markets}
+
+        self.zone = self.zones(self.health_factors())
+        self.leave_below = self.leave_below_by_zone[self.zone]
+        self.leave_above = self.leave_above_by_zone[self.zone]
+        self.pending = np.zeros(count, dtype=bool)
+        self.pending_zone = self.zone.copy()
+        self.pending_since = np.zeros(count)
+        self.now = 0.0
+        self.updates = 0
+        self.alerts = 0
+        self.latencies = np.zeros(LATENCY_SAMPLES)
+
+    def health_factors(self, ids=None) -> np.ndarray:
+        weighted = self.weighted if ids is None else self.weighted[ids]
+        debt = self.debt if ids is None else self.debt[ids]
+        return np.divide(weighted, debt, out=np.full(len(debt), np.inf), where=debt > 0)
+
+    @staticmethod
+    def _count_at_or_below(bounds, health) -> np.ndarray:
+        # A few comparisons beat searchsorted when there are only four bounds
+        counts = np.zeros(len(health), dtype=np.int8)
+        for bound in bounds:
+            counts += health >= bound
+        return counts
+
+    def zones(self, health) -> np.ndarray:
+        return self._count_at_or_below(self.bands, health)
+
+    def apply(self, update: Dict):
+        """Apply one price or rate update and re-band the positions it touches"""
+        started = time.perf_counter()
+        asset = update['asset']
+        market = self.markets.get(asset)
+        if market is None:
+            return
+        t = float(update.get('time', self.now))
+        self.now = max(self.now, t)
+
+        old_price, old_index = market.price, market.borrow_index
+        new_index = market.accrue(t)
+        if update['type'] == 'price':
+            market.price = float(update['price'])
+        elif update['type'] == 'rate':
+            market.borrow_rate = float(update['rate'])
+        else:
+            raise ValueError(f"Unknown update type: {update['type']!r}")
+
+        if market.price != old_price:
+            ids = self.collateral_ids[asset]
+            self.weighted[ids] += self.collateral_coef[asset] * (market.price - old_price)
+        if market.price != old_price or new_index != old_index:
+            ids = self.debt_ids[asset]
+            self.debt[ids] += self.debt_scaled[asset] * (new_index * market.price - old_index * old_price)
+
+        self._reband(self.affected[asset], t)
+        self._flush_pending(t)
+        self.latencies[self.updates % LATENCY_SAMPLES] = time.perf_counter() - started
+        self.updates += 1
+
+    def _reband(self, ids: np.ndarray, t: float):
+        if not len(ids):
+            return
+        health = self.health_factors(ids)
+        # Hysteresis: a position must clear a boundary by the margin to leave its band
+        moved = (health < self.leave_below[ids]) | (health >= self.leave_above[ids])
+        pending = self.pending[ids]
+        # Back in the confirmed band: drop any pending change
+        settled = ids[pending & ~moved]
+        self.pending[settled] = False
+        if not moved.any():
+            return
+
+        moved_ids, moved_health = ids[moved], health[moved]
+        confirmed = self.zone[moved_ids]
+        improved = self._count_at_or_below(self.raise_bands, moved_health)
+        worsened = self._count_at_or_below(self.lower_bands, moved_health)
+        target = np.where(improved > confirmed, improved, worsened)
+
+        restart = ~self.pending[moved_ids] | (target != self.pending_zone[moved_ids])
+        self.pending[moved_ids] = True
+        self.pending_zone[moved_ids] = target
+        self.pending_since[moved_ids[restart]] = t
+        urgent = moved_ids[(target == 0) | (self.debounce <= 0)]
+        if len(urgent):
+            self._confirm(urgent, t)
+
+    def _flush_pending(self, t: float):
+        """Confirm every pending band change that has now held for the debounce period"""
+        if not self.pending.any():
+            return
+        due = np.flatnonzero(self.pending & (t - self.pending_since >= self.debounce))
+        if len(due):
+            self._confirm(due, t)
+
+    def _confirm(self, ids: np.ndarray, t: float):
+        health = self.health_factors(ids)
+        for position, hf in zip(ids.tolist(), health.tolist()):
+            previous, current = int(self.zone[position]), int(self.pending_zone[position])
+            self.zone[position] = current
+            self.leave_below[position] = self.leave_below_by_zone[current]
+            self.leave_above[position] = self.leave_above_by_zone[current]
+            self.pending[position] = False
+            self.alerts += 1
+            self.on_alert({
+                'time': t, 'position': self.ids[position], 'health_factor': hf,
+                'from': ZONE_NAMES[previous], 'to': ZONE_NAMES[current],
+                'direction': 'worse' if current < previous else 'better',
+            })
+
+    def zone_counts(self) -> Dict[str, int]:
+        counts = np.bincount(self.zone, minlength=len(ZONE_NAMES))
+        return dict(zip(ZONE_NAMES, counts.tolist()))
+
+    def latency_stats(self) -> Dict[str, float]:
+        samples = self.latencies[:min(self.updates, LATENCY_SAMPLES)]
+        if not len(samples):
+            return {}
+        p50, p99 = np.percentile(samples, [50, 99])
+        return {'mean': float(samples.mean()), 'p50': float(p50), 'p99': float(p99), 'max': float(samples.max())}
+
+    async def run(self, *sources: AsyncIterator[Dict]):
+        """Consume every source concurrently; updates are applied one at a time in arrival order"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=10_000)
+        done = object()
+
+        async def pump(source):
+            try:
+                async for update in source:
+                    await queue.put(update)
+            finally:
+                await queue.put(done)
+
+        tasks = [asyncio.create_task(pump(source)) for source in sources]
+        remaining = len(tasks)
+        try:
+            while remaining:
+                update = await queue.get()
+                if update is done:
+                    remaining -= 1
+                else:
+                    self.apply(update)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def file_source(path: Path, pace: bool = False) -> AsyncIterator[Dict]:
+    """Replay a JSON-lines update file (pace: sleep out the gaps between update times)"""
+    first_time = started = None
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            update = json.loads(line)
+            if pace and 'time' in update:
+                if first_time is None:
+                    first_time, started = update['time'], time.monotonic()
+                delay = (update['time'] - first_time) - (time.monotonic() - started)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            yield update
+            # Let other sources and the consumer run between lines
+            await asyncio.sleep(0)
+
+
+async def socket_source(host: str, port: int) -> AsyncIterator[Dict]:
+    """JSON-lines updates read from a TCP connection (a local stand-in for an RPC subscription)"""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            if line.strip():
+                yield json.loads(line)
+    finally:
+        writer.close()
+
+
+async def synthetic_source(markets: Dict[str, Market], count: int, interval: float = 1.0, step_sigma: float = 0.0005,
+                           rate_every: int = 50, seed: int = 0) -> AsyncIterator[Dict]:
+    """Random-walk price updates (step_sigma per update) for the non-borrowed assets, plus occasional rate changes"""
+    rng = np.random.default_rng(seed)
+    borrowed = [asset for asset, market in markets.items() if market.borrow_rate > 0]
+    assets = [asset for asset in markets if asset not in borrowed]
+    prices = {asset: markets[asset].price for asset in assets}
+    t = 0.0
+    for index in range(count):
+        t += interval
+        if borrowed and index % rate_every == rate_every - 1:
+            asset = borrowed[rng.integers(len(borrowed))]
+            yield {'type': 'rate', 'asset': asset, 'rate': float(rng.uniform(0.02, 0.25)), 'time': t}
+        else:
+            asset = assets[rng.integers(len(assets))]
+            prices[asset] *= math.exp(rng.normal(0.0, step_sigma))
+            yield {'type': 'price', 'asset': asset, 'price': prices[asset], 'time': t}
+        if index % 1000 == 999:
+            await asyncio.sleep(0)
+
+
+def synthetic_book(count: int, seed: int = 0):
+    """Markets plus `count` random positions spread across the health bands"""
+    rng = np.random.default_rng(seed)
+    markets = {
+        'ETH': Market(3000.0, 0.825),
+        'WBTC': Market(60000.0, 0.78),
+        'wstETH': Market(3500.0, 0.81),
+        'USDC': Market(1.0, 0.87, borrow_rate=0.06),
+        'DAI': Market(1.0, 0.77, borrow_rate=0.07),
+    }
+    collaterals, stables = ['ETH', 'WBTC', 'wstETH'], ['USDC', 'DAI']
+    positions = []
+    for i in range(count):
+        held = rng.choice(collaterals, size=rng.integers(1, 3), replace=False)
+        collateral = {asset: float(rng.lognormal(10, 1.2) / markets[asset].price) for asset in held}
+        weighted = sum(amount * markets[asset].price * markets[asset].liquidation_threshold
+                       for asset, amount in collateral.items())
+        health = float(np.clip(rng.lognormal(np.log(1.8), 0.3), 1.02, 6.0))
+        positions.append({'id': f"pos-{i:05d}", 'collateral': collateral,
+                          'debt': {str(rng.choice(stables)): weighted / health}})
+    return markets, positions
+
+
+def load_book(path: Path):
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    markets = {asset: Market(float(spec['price']), float(spec.get('liquidation_threshold', 0.0)),
+                             float(spec.get('borrow_rate', 0.0)))
+               for asset, spec in data['markets'].items()}
+    for position in data['positions']:
+        unknown = (set(position.get('collateral', {})) | set(position.get('debt', {}))) - set(markets)
+        if unknown:
+            raise ValueError(f"Position {position['id']} uses unknown asset(s): {', '.join(sorted(unknown))}")
+    return markets, data['positions']
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Asynchronous health-factor monitor')
+    book = parser.add_mutually_exclusive_group(required=True)
+    book.add_argument('--positions', help='Positions JSON (markets + positions)')
+    book.add_argument('--synthetic', type=int, metavar='N', help='Generate N random positions')
+    parser.add_argument('--feed', action='append', default=[], help='JSON-lines update file (repeatable)')
+    parser.add_argument('--connect', action='append', default=[], metavar='HOST:PORT',
+                        help='Read JSON-lines updates from a TCP socket (repeatable)')
+    parser.add_argument('--updates', type=int, default=100_000,
+                        help='Synthetic updates when no --feed/--connect is given (default: 100000)')
+    parser.add_argument('--pace', action='store_true', help='Replay --feed files in real time')
+    parser.add_argument('--bands', default=','.join(map(str, DEFAULT_BANDS)),
+                        help='Band boundaries (default: 1.0,1.2,1.5,2.0)')
+    parser.add_argument('--debounce', type=float, default=30.0, help='Seconds a band change must hold (default: 30)')
+    parser.add_argument('--hysteresis', type=float, default=0.01, help='Relative boundary margin (default: 0.01)')
+    parser.add_argument('--alerts-jsonl', help='Append every alert to this file')
+    parser.add_argument('--quiet', action='store_true', help='Do not print individual alerts')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for synthetic positions and updates')
+    args = parser.parse_args()
+
+    bands = [float(value) for value in args.bands.split(',')]
+    if len(bands) != len(ZONE_NAMES) - 1 or bands != sorted(bands):
+        parser.error(f"--bands needs {len(ZONE_NAMES) - 1} increasing values")
+
+    try:
+        markets, positions = load_book(Path(args.positions)) if args.positions else synthetic_book(args.synthetic, args.seed)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"❌ Could not load positions: {e}")
+        return 1
+
+    alerts_file = open(args.alerts_jsonl, 'a', encoding='utf-8') if args.alerts_jsonl else None
+
+    def on_alert(alert: Dict):
+        if alerts_file:
+            alerts_file.write(json.dumps(alert) + '\n')
+        if not args.quiet:
+            icon = '🚨' if alert['direction'] == 'worse' else '✅'
+            print(f"  {icon} t={alert['time']:,.0f} {alert['position']} HF {alert['health_factor']:.3f}: "
+                  f"{alert['from']} → {alert['to']}")
+
+    started = time.perf_counter()
+    monitor = HealthMonitor(markets, positions, bands, args.debounce, args.hysteresis, on_alert)
+    indexed = time.perf_counter()
+
+    print("=" * 60)
+    print(f"Health Monitor: {len(positions):,} positions, {len(markets)} assets")
+    print("=" * 60)
+    print(f"Indexed in {(indexed - started) * 1000:.0f} ms; zones: "
+          + ', '.join(f"{name} {count:,}" for name, count in monitor.zone_counts().items()))
+    print()
+
+    sources = [file_source(Path(path), args.pace) for path in args.feed]
+    for address in args.connect:
+        host, _, port = address.rpartition(':')
+        sources.append(socket_source(host or '127.0.0.1', int(port)))
+    if not sources:
+        sources.append(synthetic_source(markets, args.updates, seed=args.seed))
+
+    try:
+        asyncio.run(monitor.run(*sources))
+    except (OSError, ValueError, json.JSONDecodeError) as e:
+        print(f"❌ {e}")
+        return 1
+    except KeyboardInterrupt:
+        print("\n⏹️  Stopped")
+    finally:
+        if alerts_file:
+            alerts_file.close()
+    elapsed = time.perf_counter() - indexed
+
+    stats = monitor.latency_stats()
+    print()
+    print("=" * 60)
+    print("Summary")
+    print("=" * 60)
+    print(f"Updates: {monitor.updates:,} in {elapsed:.2f}s, alerts: {monitor.alerts:,}")
+    if stats:
+        print(f"Per-update latency: mean {stats['mean'] * 1e6:.0f} µs, p50 {stats['p50'] * 1e6:.0f} µs, "
+              f"p99 {stats['p99'] * 1e6:.0f} µs, max {stats['max'] * 1e6:.0f} µs")
+    print("Zones: " + ', '.join(f"{name} {count:,}" for name, count in monitor.zone_counts().items()))
+    print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+"""
+Package lesson videos as adaptive-bitrate HLS (master playlist + renditions).
+
+Each source .mp4 is transcoded with a locally installed ffmpeg into a ladder
+of H.264/AAC renditions (never above the source resolution), cut into
+segments whose keyframes line up across renditions so players can switch
+mid-stream. Renditions are encoded in parallel.
+
+Packages are content-addressed: they live in .cache/hls/packages/<key>/, where
+the key hashes the source bytes together with the ladder settings, so an
+unchanged video is never re-encoded (and two books sharing a video share its
+package). The per-book index (.cache/hls/<book>.json) maps each video file name
+to its package and to the buckets it has been uploaded to; add_media_embeds.py
+uses it to embed the master playlist instead of the .mp4.
+
+Uploaded layout: <bucket>/lesson-XX/hls/<key>/master.m3u8
+                 <bucket>/lesson-XX/hls/<key>/<rendition>/index.m3u8, seg_00000.ts, ...
+"""
+
+import contextvars
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import unquote, urlparse
+
+from profiling import add_profile_argument, profiled, span
+
+# Configuration
+SCRIPT_DIR = Path(__file__).parent
+GITBOOK_DIR = SCRIPT_DIR.parent
+VIDEO_DIR = GITBOOK_DIR / "content" / "videos"
+HLS_CACHE_DIR = GITBOOK_DIR / ".cache" / "hls"
+# Same name workspace.py uses for this book, so both runners share one index
+INDEX_PATH = HLS_CACHE_DIR / f"{GITBOOK_DIR.name}.json"
+BUCKET_NAME = "money-markets-media"
+
+# (name, height, video kbit/s, audio kbit/s); renditions taller than the source are dropped
+LADDER = [
+    ('1080p', 1080, 5000, 128),
+    ('720p', 720, 2800, 128),
+    ('480p', 480, 1400, 96),
+    ('360p', 360, 800, 64),
+]
+SEGMENT_SECONDS = 6
+X264_PRESET = 'veryfast'
+# avc1 Main@4.0 and AAC-LC, what the encoder settings below produce
+VIDEO_CODEC = 'avc1.4d4028'
+AUDIO_CODEC = 'mp4a.40.2'
+
+
+class HLSError(Exception):
+    """Raised when ffmpeg/ffprobe is missing or fails"""
+
+
+def require_tool(name: str) -> str:
+    path = shutil.which(name)
+    if path is None:
+        raise HLSError(f"{name} not found on PATH (install ffmpeg, e.g. `brew install ffmpeg` or `apt install ffmpeg`)")
+    return path
+
+
+def file_digest(path: Path, chunk_size: int = 4 * 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def ladder_fingerprint(ladder=LADDER) -> str:
+    settings = json.dumps([ladder, SEGMENT_SECONDS, X264_PRESET], separators=(',', ':'))
+    return hashlib.sha256(settings.encode()).hexdigest()[:8]
+
+
+def probe(source: Path) -> Dict:
+    """Width, height and whether the source has an audio stream"""
+    result = subprocess.run(
+        [require_tool('ffprobe'), '-v', 'error', '-show_entries', 'stream=codec_type,width,height',
+         '-of', 'json', str(source)],
+        capture_output=True, text=True)
+    if result.returncode != 0:
+        raise HLSError(f"ffprobe failed for {source.name}: {result.stderr.strip()}")
+    streams = json.loads(result.stdout).get('streams', [])
+    video = next((stream for stream in streams if stream.get('codec_type') == 'video'), None)
+    if video is None:
+        raise HLSError(f"{source.name} has no video stream")
+    return {
+        'width': int(video['width']),
+        'height': int(video['height']),
+        'has_audio': any(stream.get('codec_type') == 'audio' for stream in streams),
+    }
+
+
+def renditions_for(info: Dict, ladder=LADDER) -> List[Dict]:
+    """Ladder rungs that fit the source, with even widths that keep its aspect ratio"""
+    fitting = [rung for rung in ladder if rung[1] <= info['height']] or [min(ladder, key=lambda rung: rung[1])]
+    renditions = []
+    for name, height, video_kbps, audio_kbps in fitting:
+        width = int(round(info['width'] * height / info['height'] / 2)) * 2
+        renditions.append({'name': name, 'width': width, 'height': height,
+                           'video_kbps': video_kbps, 'audio_kbps': audio_kbps if info['has_audio'] else 0})
+    return renditions
+
+
+def encode_command(source: Path, rendition: Dict, output_dir: Path, threads: int) -> List[str]:
+    kbps = rendition['video_kbps']
+    command = [
+        require_tool('ffmpeg'), '-hide_banner', '-loglevel', 'error', '-y', '-i', str(source),
+        '-vf', f"scale={rendition['width']}:{rendition['height']}",
+        '-c:v', 'libx264', '-preset', X264_PRESET, '-profile:v', 'main', '-pix_fmt', 'yuv420p',
+        '-b:v', f'{kbps}k', '-maxrate', f'{int(kbps * 1.07)}k', '-bufsize', f'{int(kbps * 1.5)}k',
+        # Keyframes on the segment grid (not on scene cuts) so every rendition segments identically
+        '-force_key_frames', f'expr:gte(t,n_forced*{SEGMENT_SECONDS})', '-sc_threshold', '0',
+        '-threads', str(threads),
+    ]
+    if rendition['audio_kbps']:
+        command += ['-c:a', 'aac', '-b:a', f"{rendition['audio_kbps']}k", '-ac', '2']
+    else:
+        command += ['-an']
+    command += [
+        '-f', 'hls', '-hls_time', str(SEGMENT_SECONDS), '-hls_playlist_type', 'vod',
+        '-hls_segment_filename', str(output_dir / 'seg_%05d.ts'),
+        str(output_dir / 'index.m3u8'),
+    ]
+    return command
+
+
+def master_playlist(renditions: List[Dict]) -> str:
+    lines = ['#EXTM3U', '#EXT-X-VERSION:3', '#EXT-X-INDEPENDENT-SEGMENTS']
+    for rendition in renditions:
+        average = (rendition['video_kbps'] + rendition['audio_kbps']) * 1000
+        codecs = VIDEO_CODEC + (f',{AUDIO_CODEC}' if rendition['audio_kbps'] else '')
+        # BANDWIDTH is the peak rate: the VBV maxrate plus container overhead
+        lines.append(f"#EXT-X-STREAM-INF:BANDWIDTH={int(average * 1.15)},AVERAGE-BANDWIDTH={average},"
+                     f"RESOLUTION={rendition['width']}x{rendition['height']},CODECS=\"{codecs}\"")
+        lines.append(f"{rendition['name']}/index.m3u8")
+    return '\n'.join(lines) + '\n'
+
+
+def _map_in_context(executor, fn, items) -> list:
+    """
+    executor.map(fn, items) with each call in a copy of the caller's context, so
+    per-book output captured by workspace.py follows the worker threads.
+    """
+    futures = [executor.submit(contextvars.copy_context().run, fn, item) for item in items]
+    return [future.result() for future in futures]
+
+
+def load_index(index_path: Path = INDEX_PATH) -> Dict[str, Dict]:
+    try:
+        with open(index_path, 'r') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+class HLSPackager:
+    """Encodes videos into cached HLS packages and tracks them in a per-book index"""
+
+    def __init__(self, cache_dir: Path = HLS_CACHE_DIR, index_path: Optional[Path] = None,
+                 workers: Optional[int] = None):
+        self.packages_dir = Path(cache_dir) / "packages"
+        self.index_path = Path(index_path) if index_path else INDEX_PATH
+        self.workers = workers or min(len(LADDER), os.cpu_count() or 1)
+        self.index = load_index(self.index_path)
+
+    def save_index(self):
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.index_path, 'w') as f:
+            json.dump(self.index, f, indent=2, sort_keys=True)
+
+    def source_digest(self, source: Path) -> str:
+        """SHA-256 of the source, reused from the index while size and mtime are unchanged"""
+        stat = source.stat()
+        entry = self.index.get(source.name)
+        if entry and entry.get('size') == stat.st_size and entry.get('mtime') == stat.st_mtime:
+            return entry['sha256']
+        with span('hash'):
+            return file_digest(source)
+
+    def package(self, source: Path, force: bool = False) -> Dict:
+        """Package one video (or reuse its cached package); returns its index entry"""
+        source = Path(source)
+        digest = self.source_digest(source)
+        key = f"{digest[:16]}-{ladder_fingerprint()}"
+        package_dir = self.packages_dir / key
+        entry = self.index.get(source.name, {})
+        if entry.get('key') != key:
+            entry = {'uploaded': []}
+        stat = source.stat()
+        entry.update({'key': key, 'sha256': digest, 'size': stat.st_size, 'mtime': stat.st_mtime})
+
+        if force and package_dir.exists():
+            shutil.rmtree(package_dir)
+            entry['uploaded'] = []
+        if (package_dir / 'master.m3u8').exists():
+            print(f"  ⏭️  {source.name}: cached package {key}")
+            with open(package_dir / 'package.json', 'r') as f:
+                entry['renditions'] = json.load(f)['renditions']
+        else:
+            entry['renditions'] = self._encode(source, package_dir)
+        self.index[source.name] = entry
+        self.save_index()
+        return entry
+
+    def _encode(self, source: Path, package_dir: Path) -> List[Dict]:
+        info = probe(source)
+        renditions = renditions_for(info)
+        # Encode into a scratch dir and rename at the end, so an interrupted run never looks cached
+        partial_dir = package_dir.with_name(package_dir.name + '.partial')
+        shutil.rmtree(partial_dir, ignore_errors=True)
+        workers = min(self.workers, len(renditions))
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        print(f"  🎬 {source.name}: {info['width']}x{info['height']} → "
+              f"{', '.join(rendition['name'] for rendition in renditions)} ({workers} parallel)")
+
+        def encode(rendition: Dict):
+            output_dir = partial_dir / rendition['name']
+            output_dir.mkdir(parents=True, exist_ok=True)
+            result = subprocess.run(encode_command(source, rendition, output_dir, threads),
+                                    capture_output=True, text=True)
+            if result.returncode != 0:
+                raise HLSError(f"ffmpeg failed for {source.name} {rendition['name']}: {result.stderr.strip()[-500:]}")
+            print(f"    ✅ {rendition['name']} ({len(list(output_dir.glob('*.ts')))} segments)")
+
+        try:
+            with span('encode'), ThreadPoolExecutor(max_workers=workers) as executor:
+                _map_in_context(executor, encode, renditions)
+            (partial_dir / 'master.m3u8').write_text(master_playlist(renditions))
+            with open(partial_dir / 'package.json', 'w') as f:
+                json.dump({'source': source.name, 'renditions': renditions}, f, indent=2)
+        except BaseException:
+            shutil.rmtree(partial_dir, ignore_errors=True)
+            raise
+        shutil.rmtree(package_dir, ignore_errors=True)
+        partial_dir.rename(package_dir)
+        return renditions
+
+    def upload(self, source_name: str, lesson_slug: str, bucket_name: str = BUCKET_NAME, storage_client=None,
+               limiter=None, workers: int = 8, force: bool = False) -> Optional[str]:
+        """Upload a package through upload_asset.upload_file; returns the master playlist URL"""
+        from upload_asset import upload_file
+
+        entry = self.index[source_name]
+        prefix = f"{lesson_slug}/hls/{entry['key']}"
+        url = f"https://storage.googleapis.com/{bucket_name}/{prefix}/master.m3u8"
+        if bucket_name in entry['uploaded'] and not force:
+            print(f"  ⏭️  {source_name}: already uploaded to gs://{bucket_name}/{prefix}/")
+            return url
+
+        package_dir = self.packages_dir / entry['key']
+        # Segments first and the master playlist last, so a half-finished upload is never playable
+        files = sorted(path for path in package_dir.rglob('*') if path.is_file() and path.name != 'package.json')
+        segments = [path for path in files if path.name != 'master.m3u8']
+
+        def put(path: Path) -> Optional[str]:
+            return upload_file(path, bucket_name=bucket_name, storage_client=storage_client, limiter=limiter,
+                               object_key=f"{prefix}/{path.relative_to(package_dir).as_posix()}",
+                               show_embed=False)
+
+        with span('upload'), ThreadPoolExecutor(max_workers=workers) as executor:
+            results = _map_in_context(executor, put, segments)
+        if all(results):
+            results.append(put(package_dir / 'master.m3u8'))
+        if not all(results):
+            failed = sum(1 for result in results if not result)
+            skipped = " (master playlist not uploaded)" if len(results) < len(files) else ""
+            print(f"  ❌ {source_name}: {failed} of {len(files)} file(s) failed{skipped}")
+            return None
+
+        entry['uploaded'] = sorted(set(entry['uploaded']) | {bucket_name})
+        self.save_index()
+        return url
+
+
+def master_url(index: Dict[str, Dict], video_filename: str, lesson_slug: str, bucket_name: str) -> Optional[str]:
+    """Master playlist URL for a video if its package has been uploaded to bucket_name"""
+    entry = index.get(video_filename)
+    if not entry or bucket_name not in entry.get('uploaded', []):
+        return None
+    return f"https://storage.googleapis.com/{bucket_name}/{lesson_slug}/hls/{entry['key']}/master.m3u8"
+
+
+def package_for_url(index: Dict[str, Dict], url: str) -> Optional[Tuple[str, Dict]]:
+    """(video file name, index entry) behind a master playlist URL; None for unknown or stale keys"""
+    parts = unquote(urlparse(url).path).strip('/').split('/')
+    # <bucket>/lesson-XX/hls/<key>/master.m3u8
+    if len(parts) != 5 or parts[2] != 'hls' or parts[4] != 'master.m3u8':
+        return None
+    for name, entry in index.items():
+        if entry.get('key') == parts[3]:
+            return name, entry
+    return None
+
+
+def package_videos(video_dir: Path = VIDEO_DIR, bucket_name: Optional[str] = None, storage_client=None,
+                   limiter=None, cache_dir: Path = HLS_CACHE_DIR, index_path: Optional[Path] = None,
+                   workers: Optional[int] = None, force: bool = False) -> int:
+    """Package every lesson video, and upload the packages when bucket_name is given"""
+    from upload_asset import extract_lesson_number
+
+    print("=" * 60)
+    print("Packaging Lesson Videos as HLS")
+    print("=" * 60)
+    print()
+
+    try:
+        require_tool('ffmpeg')
+        require_tool('ffprobe')
+    except HLSError as e:
+        print(f"❌ {e}")
+        return 1
+
+    packager = HLSPackager(cache_dir, index_path, workers)
+    failed = 0
+    for video in sorted(Path(video_dir).glob("*.mp4")):
+        lesson_num = extract_lesson_number(video.name)
+        if lesson_num is None:
+            print(f"  ⚠️  Could not extract lesson number from: {video.name}")
+            continue
+        try:
+            packager.package(video, force=force)
+        except HLSError as e:
+            print(f"  ❌ {e}")
+            failed += 1
+            continue
+        if bucket_name:
+            url = packager.upload(video.name, f"lesson-{lesson_num:02d}", bucket_name, storage_client, limiter,
+                                  force=force)
+            if url:
+                print(f"  ✅ {url}")
+            else:
+                failed += 1
+        print()
+
+    print("=" * 60)
+    print(f"{'❌' if failed else '✅'} {len(packager.index)} video(s) indexed, {failed} failed")
+    print("=" * 60)
+    return 1 if failed else 0
+
+
+def main():
+    import argparse
+    from bandwidth import add_bandwidth_arguments, limiter_from_options
+
+    parser = argparse.ArgumentParser(description='Package lesson videos as adaptive-bitrate HLS')
+    parser.add_argument('--video-dir', default=str(VIDEO_DIR), help='Directory of source .mp4 files')
+    parser.add_argument('--upload', action='store_true', help='Upload packages to the media bucket')
+    parser.add_argument('--bucket', default=os.getenv('GCS_BUCKET_NAME', BUCKET_NAME),
+                        help='Media bucket (default: $GCS_BUCKET_NAME or money-markets-media)')
+    parser.add_argument('--workers', type=int, help='Renditions encoded in parallel (default: one per rung)')
+    parser.add_argument('--force', action='store_true', help='Re-encode and re-upload even if cached')
+    add_profile_argument(parser)
+    add_bandwidth_arguments(parser)
+    args = parser.parse_args()
+
+    try:
+        limiter = limiter_from_options(args.bandwidth, args.bandwidth_schedule)
+    except ValueError as e:
+        parser.error(str(e))
+
+    storage_client = None
+    if args.upload:
+        from upload_asset import get_storage_client
+        storage_client = get_storage_client()
+        if storage_client is None:
+            return 1
+
+    def run():
+        return package_videos(Path(args.video_dir), args.bucket if args.upload else None, storage_client,
+                              limiter, workers=args.workers, force=args.force)
+
+    with profiled(args.profile, 'hls_package'):
+        if limiter is None:
+            return run()
+        with limiter:
+            return run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
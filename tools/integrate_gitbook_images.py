@@ -9,27 +9,45 @@ import re
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 
+from perceptual_hash import PerceptualCache
+from profiling import add_profile_argument, profiled, span
+from workspace import Inventory
+
 
 class MoneyMarketsImageIntegrator:
     """Integrates images into money markets gitbook markdown files"""
     
-    def __init__(self, base_dir: Optional[Path] = None, bucket_name: str = "money-markets-gitbook-images"):
-        """Initialize integrator with paths"""
+    def __init__(self, base_dir: Optional[Path] = None, bucket_name: str = "money-markets-gitbook-images",
+                 specs_path: Optional[Path] = None, images_source: Optional[Path] = None,
+                 inventory: Optional[Inventory] = None, perceptual: Optional[PerceptualCache] = None,
+                 content_dir: Optional[Path] = None):
+        """
+        Initialize integrator with paths (specs/images default to the money markets infographics tree,
+        content_dir to base_dir/content).
+
+        With a perceptual hash cache, an existing reference is kept when the
+        image it points to looks the same as the current one (see keep_unchanged_url).
+        """
         if base_dir is None:
             self.base_dir = Path(__file__).parent.parent
         else:
             self.base_dir = Path(base_dir)
         
         # Update paths for money markets
-        self.specs_path = self.base_dir.parent.parent.parent / 'assets' / 'infographics' / 'scripts' / 'money_markets_asset_specs.json'
-        self.images_source = self.base_dir.parent.parent.parent / 'assets' / 'infographics' / 'output' / 'money-markets'
-        self.lessons_dir = self.base_dir / 'content' / 'lessons'
-        self.exercises_dir = self.base_dir / 'content' / 'exercises'
+        infographics_dir = self.base_dir.parent.parent.parent / 'assets' / 'infographics'
+        self.specs_path = Path(specs_path) if specs_path else infographics_dir / 'scripts' / 'money_markets_asset_specs.json'
+        self.images_source = Path(images_source) if images_source else infographics_dir / 'output' / 'money-markets'
+        # Each image folder is listed once instead of globbed per asset
+        self.inventory = inventory or Inventory()
+        self.content_dir = Path(content_dir) if content_dir else self.base_dir / 'content'
+        self.lessons_dir = self.content_dir / 'lessons'
+        self.exercises_dir = self.content_dir / 'exercises'
         self.bucket_name = bucket_name
         self.gcs_base_url = f"https://storage.googleapis.com/{bucket_name}"
+        self.perceptual = perceptual
         
         # Load asset specifications
-        with open(self.specs_path, 'r') as f:
+        with span('spec load'), open(self.specs_path, 'r') as f:
             self.specs = json.load(f)
     
     def find_insertion_point(self, content: str, placement: str, asset_title: str) -> Optional[int]:
@@ -44,6 +62,10 @@ class MoneyMarketsImageIntegrator:
         Returns:
             Index where image should be inserted, or None if not found
         """
+        with span('placement resolution'):
+            return self._find_insertion_point(content, placement)
+    
+    def _find_insertion_point(self, content: str, placement: str) -> Optional[int]:
         # Extract section name from placement
         match = re.search(r"['\"]([^'\"]+)['\"]", placement)
         if match:
@@ -105,7 +127,8 @@ class MoneyMarketsImageIntegrator:
         
         # Find file matching asset_id
         pattern = f"{asset_id}_*.png"
-        matches = list(source_dir.glob(pattern))
+        with span('inventory scan'):
+            matches = self.inventory.files(source_dir, pattern)
         if matches:
             return matches[0]
         return None
@@ -121,13 +144,39 @@ class MoneyMarketsImageIntegrator:
         # Convert to GCS URL
         return f"{self.gcs_base_url}/{relative_path.as_posix()}"
     
+    def keep_unchanged_url(self, content: str, asset_id: str, gcs_url: str, lesson_id: Optional[str] = None,
+                           exercise_id: Optional[str] = None) -> str:
+        """
+        The URL already referenced for asset_id when that uploaded image looks
+        the same as the current file (e.g. regenerated under a new slug),
+        otherwise gcs_url. Avoids rewriting markdown for no visible change.
+        """
+        if self.perceptual is None:
+            return gcs_url
+        pattern = re.compile(rf"!\[.*?\]\({re.escape(self.gcs_base_url)}/([^)]*?{re.escape(asset_id)}[^)]*\.png)\)",
+                             re.IGNORECASE)
+        match = pattern.search(content)
+        if not match or match.group(1) == gcs_url[len(self.gcs_base_url) + 1:]:
+            return gcs_url
+        image_file = self.get_actual_image_filename(asset_id, lesson_id, exercise_id)
+        with span('perceptual hash'):
+            record = self.perceptual.record(image_file)
+        if self.perceptual.unchanged(self.bucket_name, match.group(1), record):
+            return f"{self.gcs_base_url}/{match.group(1)}"
+        return gcs_url
+    
     def insert_image_reference(self, content: str, insertion_point: int, gcs_url: str, asset_title: str) -> str:
         """Insert image markdown reference at specified point"""
-        image_markdown = f"\n\n![{asset_title}]({gcs_url})\n\n"
-        return content[:insertion_point] + image_markdown + content[insertion_point:]
+        with span('rewrite'):
+            image_markdown = f"\n\n![{asset_title}]({gcs_url})\n\n"
+            return content[:insertion_point] + image_markdown + content[insertion_point:]
     
     def replace_old_image_references(self, content: str, asset_id: str, gcs_url: str, asset_title: str) -> Tuple[str, bool]:
         """Replace existing image references (local or old GCS URLs) with new GCS URL"""
+        with span('rewrite'):
+            return self._replace_old_image_references(content, asset_id, gcs_url, asset_title)
+    
+    def _replace_old_image_references(self, content: str, asset_id: str, gcs_url: str, asset_title: str) -> Tuple[str, bool]:
         # Pattern to match image markdown with this asset_id
         pattern = re.compile(rf"!\[.*?\]\((https?://storage\.googleapis\.com/[^/]+/.*?{re.escape(asset_id)}[^\)]*\.png|images/.*?{re.escape(asset_id)}[^\)]*\.png)\)", re.IGNORECASE)
         
@@ -178,6 +227,7 @@ class MoneyMarketsImageIntegrator:
                     'reason': 'Image file not found in source'
                 })
                 continue
+            gcs_url = self.keep_unchanged_url(content, asset_id, gcs_url, lesson_id=lesson_id)
             
             # Try to replace existing reference
             content, replaced = self.replace_old_image_references(content, asset_id, gcs_url, asset_title)
@@ -202,17 +252,18 @@ class MoneyMarketsImageIntegrator:
             insertion_point = self.find_insertion_point(content, placement, asset_title)
             
             if insertion_point is None:
-                # Try keyword-based search
-                keywords = re.findall(r'\b\w+\b', placement.lower())
-                for keyword in keywords:
-                    if len(keyword) > 4:
-                        pattern = re.compile(re.escape(keyword), re.IGNORECASE)
-                        matches = list(pattern.finditer(content))
-                        if matches:
-                            match_pos = matches[0].end()
-                            next_para = content.find('\n\n', match_pos)
-                            insertion_point = next_para + 2 if next_para != -1 else match_pos
-                            break
+                with span('placement resolution'):
+                    # Try keyword-based search
+                    keywords = re.findall(r'\b\w+\b', placement.lower())
+                    for keyword in keywords:
+                        if len(keyword) > 4:
+                            pattern = re.compile(re.escape(keyword), re.IGNORECASE)
+                            matches = list(pattern.finditer(content))
+                            if matches:
+                                match_pos = matches[0].end()
+                                next_para = content.find('\n\n', match_pos)
+                                insertion_point = next_para + 2 if next_para != -1 else match_pos
+                                break
             
             if insertion_point is None:
                 results.append({
@@ -241,7 +292,7 @@ class MoneyMarketsImageIntegrator:
         
         # Write updated content
         if not dry_run and content != original_content:
-            with open(lesson_file, 'w', encoding='utf-8') as f:
+            with span('write'), open(lesson_file, 'w', encoding='utf-8') as f:
                 f.write(content)
         
         return {
@@ -288,6 +339,7 @@ class MoneyMarketsImageIntegrator:
                     'reason': 'Image file not found in source'
                 })
                 continue
+            gcs_url = self.keep_unchanged_url(content, asset_id, gcs_url, exercise_id=exercise_id)
             
             # Try to replace existing reference
             content, replaced = self.replace_old_image_references(content, asset_id, gcs_url, asset_title)
@@ -312,16 +364,17 @@ class MoneyMarketsImageIntegrator:
             insertion_point = self.find_insertion_point(content, placement, asset_title)
             
             if insertion_point is None:
-                keywords = re.findall(r'\b\w+\b', placement.lower())
-                for keyword in keywords:
-                    if len(keyword) > 4:
-                        pattern = re.compile(re.escape(keyword), re.IGNORECASE)
-                        matches = list(pattern.finditer(content))
-                        if matches:
-                            match_pos = matches[0].end()
-                            next_para = content.find('\n\n', match_pos)
-                            insertion_point = next_para + 2 if next_para != -1 else match_pos
-                            break
+                with span('placement resolution'):
+                    keywords = re.findall(r'\b\w+\b', placement.lower())
+                    for keyword in keywords:
+                        if len(keyword) > 4:
+                            pattern = re.compile(re.escape(keyword), re.IGNORECASE)
+                            matches = list(pattern.finditer(content))
+                            if matches:
+                                match_pos = matches[0].end()
+                                next_para = content.find('\n\n', match_pos)
+                                insertion_point = next_para + 2 if next_para != -1 else match_pos
+                                break
             
             if insertion_point is None:
                 results.append({
@@ -350,7 +403,7 @@ class MoneyMarketsImageIntegrator:
         
         # Write updated content
         if not dry_run and content != original_content:
-            with open(exercise_file, 'w', encoding='utf-8') as f:
+            with span('write'), open(exercise_file, 'w', encoding='utf-8') as f:
                 f.write(content)
         
         return {
@@ -379,19 +432,11 @@ class MoneyMarketsImageIntegrator:
         return results
 
 
-if __name__ == "__main__":
-    import argparse
-    
-    parser = argparse.ArgumentParser(description='Integrate money markets images into gitbook markdown files')
-    parser.add_argument('--lesson', help='Integrate specific lesson (e.g., lesson_01)')
-    parser.add_argument('--exercise', help='Integrate specific exercise (e.g., exercise_01)')
-    parser.add_argument('--all', action='store_true', help='Integrate all lessons and exercises')
-    parser.add_argument('--dry-run', action='store_true', help='Show what would be done without making changes')
-    parser.add_argument('--bucket', default='money-markets-gitbook-images', help='GCS bucket name')
-    
-    args = parser.parse_args()
-    
+def run_cli(args):
+    """Run the integrator for the parsed command-line arguments"""
     integrator = MoneyMarketsImageIntegrator(bucket_name=args.bucket)
+    if args.skip_unchanged:
+        integrator.perceptual = PerceptualCache(images_dir=integrator.images_source)
     
     if args.all:
         results = integrator.integrate_all(dry_run=args.dry_run)
@@ -410,4 +455,26 @@ if __name__ == "__main__":
         print("  Integrate lesson: python integrate_gitbook_images.py --lesson lesson_01")
         print("  Integrate exercise: python integrate_gitbook_images.py --exercise exercise_01")
         print("  Dry run: python integrate_gitbook_images.py --all --dry-run")
+        print("  Profile: python integrate_gitbook_images.py --all --profile")
+    
+    if integrator.perceptual is not None:
+        integrator.perceptual.save()
+
 
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Integrate money markets images into gitbook markdown files')
+    parser.add_argument('--lesson', help='Integrate specific lesson (e.g., lesson_01)')
+    parser.add_argument('--exercise', help='Integrate specific exercise (e.g., exercise_01)')
+    parser.add_argument('--all', action='store_true', help='Integrate all lessons and exercises')
+    parser.add_argument('--dry-run', action='store_true', help='Show what would be done without making changes')
+    parser.add_argument('--bucket', default='money-markets-gitbook-images', help='GCS bucket name')
+    parser.add_argument('--skip-unchanged', action='store_true',
+                        help='Keep existing references to uploaded images that look the same as the current file')
+    add_profile_argument(parser)
+    
+    args = parser.parse_args()
+    
+    with profiled(args.profile, 'integrate_gitbook_images'):
+        run_cli(args)
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Interest rate model math shared by the chart and strategy tools.
+Implements the kinked (jump-rate) model used by Aave/Compound-style markets and
+the curve of Morpho Blue's adaptive IRM at a given rate-at-target (see
+adaptive_irm.py for how the rate-at-target evolves over time).
+All functions accept scalars or numpy arrays.
+"""
+
+import numpy as np
+
+
+def kinked_borrow_rate(utilization, base_rate: float, slope1: float, slope2: float, optimal_utilization: float):
+    """
+    Borrow rate of a kinked interest rate model.
+
+    Below the kink the rate rises along slope1; above it the excess
+    utilization is charged at the much steeper slope2.
+    """
+    u = np.clip(np.asarray(utilization, dtype=float), 0.0, 1.0)
+    below = base_rate + slope1 * u / optimal_utilization
+    excess = (u - optimal_utilization) / (1.0 - optimal_utilization)
+    above = base_rate + slope1 + slope2 * excess
+    return np.where(u <= optimal_utilization, below, above)
+
+
+def adaptive_curve_error(utilization, target_utilization: float = 0.9):
+    """
+    Normalized distance from target utilization, in [-1, 1].
+
+    -1 at 0% utilization, 0 at the target, 1 at 100%. It positions the rate
+    on the curve and drives how fast the rate-at-target drifts.
+    """
+    u = np.clip(np.asarray(utilization, dtype=float), 0.0, 1.0)
+    return np.where(u > target_utilization,
+                    (u - target_utilization) / (1.0 - target_utilization),
+                    (u - target_utilization) / target_utilization)
+
+
+def adaptive_curve_borrow_rate(utilization, rate_at_target, target_utilization: float = 0.9,
+                               curve_steepness: float = 4.0):
+    """
+    Borrow rate on Morpho's adaptive curve for a given rate-at-target.
+
+    The curve runs from rate_at_target / steepness at 0% utilization through
+    rate_at_target at the target to rate_at_target x steepness at 100%.
+    """
+    err = adaptive_curve_error(utilization, target_utilization)
+    coefficient = np.where(err < 0, 1.0 - 1.0 / curve_steepness, curve_steepness - 1.0)
+    return (coefficient * err + 1.0) * np.asarray(rate_at_target, dtype=float)
+
+
+def supply_rate(borrow_rate, utilization, reserve_factor: float = 0.0):
+    """Supply rate = borrow rate x utilization x (1 - reserve factor)"""
+    return np.asarray(borrow_rate, dtype=float) * np.asarray(utilization, dtype=float) * (1.0 - reserve_factor)
+
+
+def utilization(total_borrow, total_supply):
+    """Utilization = borrowed / supplied (0 for an empty market)"""
+    total_borrow = np.asarray(total_borrow, dtype=float)
+    total_supply = np.asarray(total_supply, dtype=float)
+    return np.divide(total_borrow, total_supply, out=np.zeros(np.broadcast(total_borrow, total_supply).shape),
+                     where=total_supply > 0)
+
+
+def health_factor(collateral_value, liquidation_threshold, debt):
+    """Health factor = collateral value x liquidation threshold / debt (inf when debt is zero)"""
+    collateral_value = np.asarray(collateral_value, dtype=float)
+    debt = np.asarray(debt, dtype=float)
+    weighted = collateral_value * liquidation_threshold
+    return np.divide(weighted, debt, out=np.full(np.broadcast(weighted, debt).shape, np.inf), where=debt > 0)
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Leverage-looping outcomes over a full parameter grid (lessons 8 and 9).
+
+A loop deposits collateral, borrows `ltv` of each new deposit's value, swaps
+the loan into more collateral (losing swap_fee) and deposits it again. Per
+unit of starting capital, with q = ltv x (1 - swap_fee), n loops leave
+
+    collateral = (1 - q^(n+1)) / (1 - q)      debt = ltv x (1 - q^n) / (1 - q)
+
+(n = inf is the flash-loan / Multiply limit). Collateral is priced in the
+debt asset at 1.0 on entry; a shock is a fractional drop of that price.
+
+The grid is every combination of ltv, loops, supply rate, borrow rate and
+shock. Positions only depend on (ltv, loops), so they are built once on that
+small grid and the rest is broadcasting: a million points take a few tens of
+milliseconds. `iterate_position` repeats the deposit/borrow/swap steps
+literally and is kept as a cross-check of the closed form (--check).
+
+Usage:
+    python leverage_loop.py
+    python leverage_loop.py --ltv 0.5:0.9:41 --loops 1:10:10 --supply 0.03:0.09:25 \\
+        --borrow 0.02:0.08:25 --shocks 0:0.4:40 --liquidation-threshold 0.93
+    python leverage_loop.py --csv grid.csv --check
+"""
+
+import csv
+import sys
+import time
+from typing import Dict, Tuple
+
+import numpy as np
+
+from interest_rate_models import health_factor
+
+AXES = ('ltv', 'loops', 'supply_rate', 'borrow_rate', 'shock')
+# Iterated loops stop once a step adds less than this much collateral
+ITERATION_TOLERANCE = 1e-15
+MAX_ITERATIONS = 100_000
+
+
+def _check_ltv(ltv: np.ndarray, swap_fee: float):
+    if np.any(ltv < 0) or np.any(ltv * (1.0 - swap_fee) >= 1.0):
+        raise ValueError("ltv x (1 - swap_fee) must be in [0, 1)")
+
+
+def loop_position(ltv, loops, swap_fee: float = 0.0) -> Tuple[np.ndarray, np.ndarray]:
+    """Closed-form (collateral, debt) per unit of starting capital after `loops` loops"""
+    ltv = np.asarray(ltv, dtype=float)
+    loops = np.asarray(loops, dtype=float)
+    _check_ltv(ltv, swap_fee)
+    q = ltv * (1.0 - swap_fee)
+    # q^inf = 0 for q < 1, which numpy gives directly
+    collateral = (1.0 - q ** (loops + 1.0)) / (1.0 - q)
+    debt = ltv * (1.0 - q ** loops) / (1.0 - q)
+    return collateral, debt
+
+
+def iterate_position(ltv, loops, swap_fee: float = 0.0) -> Tuple[np.ndarray, np.ndarray]:
+    """(collateral, debt) by stepping every loop, all grid points together"""
+    ltv, loops = np.broadcast_arrays(np.asarray(ltv, dtype=float), np.asarray(loops, dtype=float))
+    _check_ltv(ltv, swap_fee)
+    deposit = np.ones(ltv.shape)
+    collateral = deposit.copy()
+    debt = np.zeros(ltv.shape)
+    step = 0
+    while step < MAX_ITERATIONS:
+        active = loops > step
+        if not active.any() or deposit[active].max() < ITERATION_TOLERANCE:
+            break
+        borrowed = np.where(active, deposit * ltv, 0.0)
+        deposit = borrowed * (1.0 - swap_fee)
+        debt += borrowed
+        collateral += deposit
+        step += 1
+    return collateral, debt
+
+
+def evaluate(collateral, debt, supply_rate, borrow_rate, shock, liquidation_threshold: float) -> Dict[str, np.ndarray]:
+    """
+    Outcomes of looped positions after a price shock (all inputs broadcast).
+
+    net_apy is the annual return on the equity left after the shock (NaN once
+    equity is gone); liquidation_price is relative to the entry price and
+    does not depend on the shock.
+    """
+    collateral = np.asarray(collateral, dtype=float)
+    debt = np.asarray(debt, dtype=float)
+    value = collateral * (1.0 - np.asarray(shock, dtype=float))
+    equity = value - debt
+    earned = value * supply_rate - debt * borrow_rate
+    return {
+        'net_apy': np.divide(earned, equity, out=np.full(np.broadcast(earned, equity).shape, np.nan),
+                             where=equity > 0),
+        'leverage': np.divide(value, equity, out=np.full(equity.shape, np.inf), where=equity > 0),
+        'health_factor': health_factor(value, liquidation_threshold, debt),
+        'liquidation_price': np.broadcast_to(debt / (collateral * liquidation_threshold), equity.shape),
+        'equity': equity,
+    }
+
+
+def loop_grid(ltv, loops, supply_rate, borrow_rate, shock, liquidation_threshold: float,
+              swap_fee: float = 0.0, iterated: bool = False) -> Dict[str, np.ndarray]:
+    """
+    Evaluate every combination of the five axes; results have shape
+    (len(ltv), len(loops), len(supply_rate), len(borrow_rate), len(shock)).
+    """
+    axes = [np.atleast_1d(np.asarray(values, dtype=float)) for values in (ltv, loops, supply_rate, borrow_rate, shock)]
+    shape = tuple(len(values) for values in axes)
+    ltv, loops, supply, borrow, shock = (values.reshape([-1 if axis == position else 1 for axis in range(5)])
+                                         for position, values in enumerate(axes))
+    build = iterate_position if iterated else loop_position
+    collateral, debt = build(ltv, loops, swap_fee)
+    results = evaluate(collateral, debt, supply, borrow, shock, liquidation_threshold)
+    return {name: np.broadcast_to(values, shape) for name, values in results.items()}
+
+
+def parse_axis(text: str) -> np.ndarray:
+    """'0.5,0.7,0.9' or a START:STOP:COUNT range like '0.5:0.9:41' ('inf' allowed in lists)"""
+    if ':' in text:
+        start, stop, count = text.split(':')
+        return np.linspace(float(start), float(stop), int(count))
+    return np.array([float(value) for value in text.split(',')])
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Leverage-looping outcomes over a grid of LTV, loops, rates and shocks')
+    parser.add_argument('--ltv', default='0.3:0.9:61', help='Borrowed share of each deposit (default: 0.3:0.9:61)')
+    parser.add_argument('--loops', default='1,2,3,4,5,6,8,10,15,inf', help="Loop counts, 'inf' for the limit")
+    parser.add_argument('--supply', default='0.02:0.10:41', help='Supply/staking APR of the collateral')
+    parser.add_argument('--borrow', default='0.01:0.10:41', help='Borrow APR of the debt')
+    parser.add_argument('--shocks', default='0:0.5:11', help='Collateral price drops (default: 0:0.5:11)')
+    parser.add_argument('--liquidation-threshold', type=float, default=0.825, help='Default: 0.825')
+    parser.add_argument('--swap-fee', type=float, default=0.0, help='Share lost on each borrow-to-collateral swap')
+    parser.add_argument('--min-health', type=float, default=2.0, help='Health factor floor for the summary (default: 2.0)')
+    parser.add_argument('--check', action='store_true', help='Also build positions by iterating loops and compare')
+    parser.add_argument('--csv', help='Write every grid point to this CSV')
+    args = parser.parse_args()
+
+    try:
+        axes = [parse_axis(text) for text in (args.ltv, args.loops, args.supply, args.borrow, args.shocks)]
+        started = time.perf_counter()
+        results = loop_grid(*axes, liquidation_threshold=args.liquidation_threshold, swap_fee=args.swap_fee)
+        elapsed = time.perf_counter() - started
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+    points = results['net_apy'].size
+
+    print("=" * 60)
+    print(f"Leverage Loop Grid: {points:,} points (" + " x ".join(f"{len(a)} {name}" for a, name in zip(axes, AXES)) + ")")
+    print("=" * 60)
+    print(f"Evaluated in {elapsed * 1000:.0f} ms ({points / elapsed / 1e6:.1f}M points/s)")
+
+    status = 0
+    if args.check:
+        iterated = loop_grid(*axes, liquidation_threshold=args.liquidation_threshold, swap_fee=args.swap_fee,
+                             iterated=True)
+        error = max(float(np.nanmax(np.abs(iterated[name] - results[name]) / np.maximum(np.abs(results[name]), 1.0),
+                                    initial=0.0))
+                    for name in ('equity', 'liquidation_price'))
+        status = 0 if error < 1e-9 else 1
+        print(f"{'✅' if status == 0 else '❌'} Iterated loops match the closed form (max relative error {error:.1e})")
+    print()
+
+    # Best safe setup at the first shock, for the median supply/borrow rates
+    supply_index, borrow_index = len(axes[2]) // 2, len(axes[3]) // 2
+    print(f"At supply {axes[2][supply_index]:.2%}, borrow {axes[3][borrow_index]:.2%}, "
+          f"shock {axes[4][0]:.0%}, HF >= {args.min_health:g}:")
+    print(f"  {'Loops':>6} {'Best LTV':>9} {'Leverage':>9} {'Net APY':>9} {'HF':>6} {'Liq. price':>11}")
+    for loop_index, loops in enumerate(axes[1]):
+        apy = results['net_apy'][:, loop_index, supply_index, borrow_index, 0]
+        safe = results['health_factor'][:, loop_index, supply_index, borrow_index, 0] >= args.min_health
+        if not safe.any():
+            print(f"  {loops:>6g} {'-':>9}")
+            continue
+        best = int(np.nanargmax(np.where(safe, apy, -np.inf)))
+        at = (best, loop_index, supply_index, borrow_index, 0)
+        print(f"  {loops:>6g} {axes[0][best]:9.2%} {results['leverage'][at]:8.2f}x {apy[best]:9.2%} "
+              f"{results['health_factor'][at]:6.2f} {results['liquidation_price'][at]:11.2%}")
+
+    negative = float(np.mean(results['net_apy'][..., 0] < 0))
+    print()
+    print(f"⚠️  Net APY is negative for {negative:.1%} of unshocked grid points (borrow cost above amplified yield)")
+
+    if args.csv:
+        index = np.indices(results['net_apy'].shape).reshape(5, -1)
+        with open(args.csv, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(list(AXES) + list(results))
+            columns = [axes[axis][index[axis]] for axis in range(5)] + [values.reshape(-1) for values in results.values()]
+            writer.writerows(zip(*(column.tolist() for column in columns)))
+        print(f"✅ Wrote {points:,} rows to {args.csv}")
+    print()
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
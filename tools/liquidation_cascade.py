@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Simulate liquidation cascades in one lending market (lessons 3 and 8).
+
+Positions (collateral units, debt) are indexed once by the price at which each
+becomes liquidatable, with prefix sums of debt and collateral over that order.
+A shock then only needs binary searches: every round looks up the positions
+whose liquidation price lies between the previous and the current price, sells
+the seized collateral into a constant-product pool, and repeats until the
+price stops moving. All shock sizes of a sweep advance together as numpy arrays,
+so no step ever rescans the population.
+
+Positions CSV columns: collateral, debt (extra columns are ignored).
+
+Model assumptions:
+- market parameters (liquidation threshold, bonus, close factor) are shared
+  by all positions, as within a single market
+- each position is liquidated once, in the round its threshold is crossed,
+  at that round's price; the liquidator seizes debt x close factor x (1 + bonus)
+  worth of collateral, capped at the position's collateral
+- liquidators sell seized collateral immediately into a pool holding
+  `depth` units of collateral
+"""
+
+import csv
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Dict
+
+import numpy as np
+
+MAX_ROUNDS = 500
+PRICE_TOLERANCE = 1e-10
+
+
+def load_positions(path: Path):
+    """Read collateral and debt columns from a positions CSV"""
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        header = next(csv.reader(f), [])
+    missing = {'collateral', 'debt'} - set(header)
+    if missing:
+        raise ValueError(f"{path.name} is missing column(s): {', '.join(sorted(missing))}")
+    data = np.loadtxt(path, delimiter=',', skiprows=1, ndmin=2,
+                      usecols=(header.index('collateral'), header.index('debt')))
+    return data[:, 0], data[:, 1]
+
+
+def synthetic_positions(count: int, price: float, liquidation_threshold: float, seed: int = 0,
+                        median_health: float = 1.6):
+    """
+    Random population: lognormal position sizes and health factors around median_health.
+
+    Sizes follow a heavy tail like real markets (a few whales, many small
+    positions); health factors are floored just above 1 so nothing starts liquidatable.
+    """
+    rng = np.random.default_rng(seed)
+    collateral = rng.lognormal(mean=0.0, sigma=1.5, size=count)
+    health = np.maximum(rng.lognormal(mean=np.log(median_health), sigma=0.25, size=count), 1.005)
+    debt = collateral * price * liquidation_threshold / health
+    return collateral, debt
+
+
+class CascadeSimulator:
+    """Positions sorted by liquidation price, with prefix sums for O(log n) range totals"""
+
+    def __init__(self, collateral, debt, liquidation_threshold: float, liquidation_bonus: float = 0.05,
+                 close_factor: float = 1.0):
+        seize_ratio = liquidation_threshold * (1.0 + liquidation_bonus) * close_factor
+        if seize_ratio > 1.0:
+            # Also required by Aave's configuration checks; it keeps every capped
+            # position on one side of a single price cut (see _seized)
+            raise ValueError("liquidation_threshold x (1 + bonus) x close_factor must be <= 1")
+        self.threshold = liquidation_threshold
+        self.bonus = liquidation_bonus
+        self.close_factor = close_factor
+        self.seize_ratio = seize_ratio
+
+        collateral = np.asarray(collateral, dtype=float)
+        debt = np.asarray(debt, dtype=float)
+        keep = (collateral > 0) & (debt > 0)
+        liquidation_price = debt[keep] / (collateral[keep] * liquidation_threshold)
+        order = np.argsort(liquidation_price, kind='stable')
+
+        self.count = int(keep.sum())
+        self.liquidation_price = liquidation_price[order]
+        # Leading zero so sums over sorted[i:j] are prefix[j] - prefix[i]
+        self.debt_prefix = np.concatenate([[0.0], np.cumsum(debt[keep][order])])
+        self.collateral_prefix = np.concatenate([[0.0], np.cumsum(collateral[keep][order])])
+
+    def _index(self, price):
+        """First sorted position liquidatable at price (liquidation price >= price)"""
+        return np.searchsorted(self.liquidation_price, price, side='left')
+
+    def _seized(self, price, upper_index):
+        """
+        Collateral seized from positions newly liquidatable at price.
+
+        New positions are sorted[lower:upper_index]. A position is capped at its
+        collateral when debt x close_factor x (1 + bonus) / price exceeds it,
+        i.e. when its liquidation price is above price / seize_ratio, so the
+        capped ones are exactly the top of that range.
+        """
+        lower = self._index(price)
+        cap = np.clip(self._index(price / self.seize_ratio), lower, upper_index)
+        uncapped_debt = self.debt_prefix[cap] - self.debt_prefix[lower]
+        capped_collateral = self.collateral_prefix[upper_index] - self.collateral_prefix[cap]
+        seized = uncapped_debt * self.close_factor * (1.0 + self.bonus) / price + capped_collateral
+        repaid = uncapped_debt * self.close_factor + capped_collateral * price / (1.0 + self.bonus)
+        return seized, repaid, lower
+
+    def simulate(self, start_price: float, shocks, depth: float) -> Dict[str, np.ndarray]:
+        """
+        Run the cascade for every shock (fractional initial price drop) at once.
+
+        depth is the collateral held by the constant-product pool liquidators
+        sell into: selling q units moves the price by (depth / (depth + q))^2.
+        """
+        shocks = np.asarray(shocks, dtype=float)
+        shocked = start_price * (1.0 - shocks)
+        price = shocked.copy()
+        upper = np.full(shocks.shape, self.count)
+        sold = np.zeros(shocks.shape)
+        repaid = np.zeros(shocks.shape)
+        rounds = np.zeros(shocks.shape, dtype=int)
+        active = np.ones(shocks.shape, dtype=bool)
+
+        for _ in range(MAX_ROUNDS):
+            if not active.any():
+                break
+            seized, debt_repaid, lower = self._seized(price[active], upper[active])
+            sold[active] += seized
+            repaid[active] += debt_repaid
+            upper[active] = lower
+            rounds[active] += 1
+
+            new_price = shocked[active] * (depth / (depth + sold[active])) ** 2
+            moved = np.abs(new_price - price[active]) > PRICE_TOLERANCE * start_price
+            price[active] = new_price
+            active_indices = np.flatnonzero(active)
+            active[active_indices[~moved]] = False
+
+        return {
+            'shock': shocks,
+            'final_price': price,
+            'total_drop': 1.0 - price / start_price,
+            'amplification': np.divide(1.0 - price / start_price, shocks, out=np.ones_like(shocks), where=shocks > 0),
+            'liquidated': self.count - upper,
+            'collateral_sold': sold,
+            'debt_repaid': repaid,
+            'rounds': rounds,
+        }
+
+
+def parse_shocks(text: str) -> np.ndarray:
+    """'0.05,0.1,0.2' or a START:STOP:COUNT range like '0:0.5:1000'"""
+    if ':' in text:
+        start, stop, count = text.split(':')
+        return np.linspace(float(start), float(stop), int(count))
+    return np.array([float(value) for value in text.split(',')])
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Liquidation cascade simulator for one lending market')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--positions', help='Positions CSV (collateral, debt)')
+    source.add_argument('--synthetic', type=int, metavar='N', help='Generate N random positions')
+    parser.add_argument('--price', type=float, required=True, help='Current collateral price in debt units')
+    parser.add_argument('--liquidation-threshold', type=float, default=0.825, help='Default: 0.825')
+    parser.add_argument('--bonus', type=float, default=0.05, help='Liquidation bonus (default: 0.05)')
+    parser.add_argument('--close-factor', type=float, default=1.0, help='Share of debt repaid (default: 1.0)')
+    parser.add_argument('--depth', type=float, required=True, help='Collateral units in the pool liquidators sell into')
+    parser.add_argument('--shocks', default='0:0.5:1001', help="Shock sizes: list or START:STOP:COUNT (default: 0:0.5:1001)")
+    parser.add_argument('--seed', type=int, default=0, help='Seed for --synthetic')
+    parser.add_argument('--csv', help='Write every shock result to this CSV')
+    parser.add_argument('--json', action='store_true', help='Print every shock result as JSON')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.positions:
+        try:
+            collateral, debt = load_positions(Path(args.positions))
+        except (OSError, ValueError) as e:
+            print(f"❌ {e}")
+            return 1
+    else:
+        collateral, debt = synthetic_positions(args.synthetic, args.price, args.liquidation_threshold, args.seed)
+    try:
+        simulator = CascadeSimulator(collateral, debt, args.liquidation_threshold, args.bonus, args.close_factor)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+    indexed = time.perf_counter()
+
+    shocks = parse_shocks(args.shocks)
+    results = simulator.simulate(args.price, shocks, args.depth)
+    finished = time.perf_counter()
+
+    columns = list(results)
+    if args.csv:
+        with open(args.csv, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            writer.writerows(zip(*(results[name].tolist() for name in columns)))
+    if args.json:
+        print(json.dumps([dict(zip(columns, row)) for row in zip(*(results[name].tolist() for name in columns))],
+                         indent=2))
+        return 0
+
+    print("=" * 60)
+    print(f"Liquidation Cascade: {simulator.count:,} positions, {len(shocks):,} shocks")
+    print("=" * 60)
+    print(f"Index built in {(indexed - started) * 1000:.0f} ms, sweep in {(finished - indexed) * 1000:.0f} ms")
+    print()
+    print(f"  {'Shock':>7} {'Final drop':>11} {'Amplif.':>8} {'Liquidated':>12} {'Sold':>14} {'Rounds':>7}")
+    step = max(1, len(shocks) // 20)
+    for index in range(0, len(shocks), step):
+        print(f"  {shocks[index]:7.2%} {results['total_drop'][index]:11.2%} {results['amplification'][index]:8.2f}x "
+              f"{results['liquidated'][index]:12,} {results['collateral_sold'][index]:14,.1f} "
+              f"{results['rounds'][index]:7}")
+
+    worst = int(np.argmax(results['amplification']))
+    print()
+    print(f"⚠️  Largest amplification: {results['amplification'][worst]:.2f}x at a {shocks[worst]:.2%} shock "
+          f"({results['total_drop'][worst]:.2%} final drop)")
+    if args.csv:
+        print(f"✅ Wrote {len(shocks):,} rows to {args.csv}")
+    print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
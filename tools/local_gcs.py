@@ -0,0 +1,644 @@
+#!/usr/bin/env python3
+"""
+Loopback stand-in for the Google Cloud Storage JSON API, with fault injection.
+
+Serves the calls the publishing tools make through google-cloud-storage:
+bucket get/create/patch, multipart and resumable uploads, object
+get/download/patch/delete, list (with pages), compose, rewrite and batch
+requests (sync_metadata.py). Objects live in memory. Point a client at it
+with LocalGCS.client(), which uses anonymous credentials, so the real
+library code paths (chunking, checksums, retries, resumes) run unchanged
+without network access.
+
+Faults and shaping apply per request:
+- latency (+ random jitter) before every response
+- a bandwidth cap on request bodies, shared by all connections
+  (bandwidth.TokenBucket, the same bucket the upload limiter uses)
+- injected 429 / 503 responses and connection resets (RST before any
+  response), drawn independently per request with a seeded RNG
+
+Every request is counted by kind and received body bytes are timestamped,
+so throughput_curve() gives bytes/s over time (see upload_load_test.py).
+
+Usage:
+    python local_gcs.py --port 4443 --latency 0.05 --fault-503 0.05
+    # then: storage.Client(project='local', credentials=AnonymousCredentials(),
+    #                      client_options={'api_endpoint': 'http://127.0.0.1:4443'})
+"""
+
+import base64
+import hashlib
+import json
+import random
+import socket
+import struct
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+
+import google_crc32c
+
+from bandwidth import Schedule, TokenBucket, parse_rate
+
+DEFAULT_PAGE_SIZE = 1000
+# Body bytes read per bandwidth-bucket draw
+READ_CHUNK_SIZE = 64 * 1024
+
+
+class GCSError(Exception):
+    """An error response (status + message) in the JSON API's error format"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _timestamp() -> str:
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+
+
+class StoredObject:
+    """Object bytes plus the metadata fields the tools read or patch"""
+
+    MUTABLE_FIELDS = ('contentType', 'contentEncoding', 'cacheControl', 'contentDisposition', 'contentLanguage')
+
+    def __init__(self, bucket: str, name: str, data: bytes, generation: int, resource: Dict):
+        self.bucket = bucket
+        self.name = name
+        self.data = data
+        self.generation = generation
+        self.metageneration = 1
+        self.created = self.updated = _timestamp()
+        self.fields = {field: resource[field] for field in self.MUTABLE_FIELDS if resource.get(field) is not None}
+        self.fields.setdefault('contentType', 'application/octet-stream')
+        self.metadata = dict(resource.get('metadata') or {})
+        self.md5 = base64.b64encode(hashlib.md5(data).digest()).decode('ascii')
+        self.crc32c = base64.b64encode(struct.pack('>I', google_crc32c.value(data))).decode('ascii')
+
+    def patch(self, resource: Dict):
+        for field in self.MUTABLE_FIELDS:
+            if field in resource:
+                if resource[field] is None:
+                    self.fields.pop(field, None)
+                else:
+                    self.fields[field] = resource[field]
+        if 'metadata' in resource:
+            if resource['metadata'] is None:
+                self.metadata = {}
+            else:
+                for key, value in resource['metadata'].items():
+                    if value is None:
+                        self.metadata.pop(key, None)
+                    else:
+                        self.metadata[key] = value
+        self.metageneration += 1
+        self.updated = _timestamp()
+
+    def resource(self, base_url: str) -> Dict:
+        encoded = quote(self.name, safe='')
+        resource = {
+            'kind': 'storage#object',
+            'id': f"{self.bucket}/{self.name}/{self.generation}",
+            'selfLink': f"{base_url}/storage/v1/b/{self.bucket}/o/{encoded}",
+            'mediaLink': f"{base_url}/download/storage/v1/b/{self.bucket}/o/{encoded}?generation={self.generation}&alt=media",
+            'name': self.name,
+            'bucket': self.bucket,
+            'generation': str(self.generation),
+            'metageneration': str(self.metageneration),
+            'size': str(len(self.data)),
+            'md5Hash': self.md5,
+            'crc32c': self.crc32c,
+            'etag': f"{self.generation}-{self.metageneration}",
+            'storageClass': 'STANDARD',
+            'timeCreated': self.created,
+            'updated': self.updated,
+        }
+        resource.update(self.fields)
+        if self.metadata:
+            resource['metadata'] = dict(self.metadata)
+        return resource
+
+
+class Store:
+    """In-memory buckets, objects and open resumable sessions (thread-safe)"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buckets: Dict[str, Dict] = {}
+        self.objects: Dict[str, Dict[str, StoredObject]] = {}
+        self.uploads: Dict[str, Dict] = {}
+        self.generation = int(time.time() * 1_000_000)
+
+    def create_bucket(self, name: str, resource: Optional[Dict] = None) -> Dict:
+        with self.lock:
+            if name in self.buckets:
+                raise GCSError(409, f"Bucket {name} already exists")
+            self.buckets[name] = {'kind': 'storage#bucket', 'id': name, 'name': name, 'location': 'US',
+                                  'storageClass': 'STANDARD', 'timeCreated': _timestamp(), 'metageneration': '1',
+                                  **{key: value for key, value in (resource or {}).items() if key != 'name'}}
+            self.objects[name] = {}
+            return self.buckets[name]
+
+    def bucket(self, name: str) -> Dict:
+        if name not in self.buckets:
+            raise GCSError(404, f"The specified bucket does not exist: {name}")
+        return self.buckets[name]
+
+    def get(self, bucket: str, name: str) -> StoredObject:
+        self.bucket(bucket)
+        stored = self.objects[bucket].get(name)
+        if stored is None:
+            raise GCSError(404, f"No such object: {bucket}/{name}")
+        return stored
+
+    def put(self, bucket: str, name: str, data: bytes, resource: Dict) -> StoredObject:
+        with self.lock:
+            self.bucket(bucket)
+            self.generation += 1
+            stored = StoredObject(bucket, name, data, self.generation, resource)
+            self.objects[bucket][name] = stored
+            return stored
+
+    def delete(self, bucket: str, name: str):
+        with self.lock:
+            self.get(bucket, name)
+            del self.objects[bucket][name]
+
+    def list(self, bucket: str, prefix: str = '', delimiter: str = '', start_after: str = '',
+             page_size: int = DEFAULT_PAGE_SIZE) -> Tuple[List[StoredObject], List[str], Optional[str]]:
+        """One page of objects (and delimiter prefixes) after start_after; returns the next page token"""
+        with self.lock:
+            self.bucket(bucket)
+            names = sorted(name for name in self.objects[bucket] if name.startswith(prefix) and name > start_after)
+            items, prefixes, last = [], set(), None
+            for name in names:
+                if len(items) + len(prefixes) >= page_size:
+                    return items, sorted(prefixes), last
+                rest = name[len(prefix):]
+                if delimiter and delimiter in rest:
+                    prefixes.add(prefix + rest[:rest.index(delimiter) + len(delimiter)])
+                else:
+                    items.append(self.objects[bucket][name])
+                last = name
+            return items, sorted(prefixes), None
+
+
+class Stats:
+    """Request counts by kind/outcome and timestamped body bytes"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+        self.requests: Dict[str, int] = {}
+        self.faults: Dict[str, int] = {}
+        self.events: List[Tuple[float, int]] = []
+
+    def count(self, kind: str):
+        with self.lock:
+            self.requests[kind] = self.requests.get(kind, 0) + 1
+
+    def fault(self, kind: str):
+        with self.lock:
+            self.faults[kind] = self.faults.get(kind, 0) + 1
+
+    def received(self, count: int):
+        with self.lock:
+            self.events.append((time.monotonic() - self.started, count))
+
+    def reset(self):
+        with self.lock:
+            self.started = time.monotonic()
+            self.requests, self.faults, self.events = {}, {}, []
+
+    def snapshot(self) -> Dict:
+        with self.lock:
+            return {'requests': dict(self.requests), 'faults': dict(self.faults),
+                    'bytes_received': sum(count for _, count in self.events),
+                    'elapsed': time.monotonic() - self.started}
+
+    def throughput_curve(self, interval: float = 0.5) -> List[Tuple[float, float]]:
+        """(bucket start seconds, bytes/s) for every interval since the last reset"""
+        with self.lock:
+            events = list(self.events)
+            elapsed = time.monotonic() - self.started
+        buckets = [0] * (int(elapsed / interval) + 1)
+        for moment, count in events:
+            buckets[min(int(moment / interval), len(buckets) - 1)] += count
+        # The last bucket is still filling: divide by the time it has covered
+        spans = [interval] * (len(buckets) - 1) + [max(elapsed - (len(buckets) - 1) * interval, 1e-9)]
+        return [(index * interval, total / span) for index, (total, span) in enumerate(zip(buckets, spans))]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately; without TCP_NODELAY every small
+    # response waits out the client's delayed ACK (~40 ms)
+    disable_nagle_algorithm = True
+    server: 'LocalGCS'
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    # -- transport --------------------------------------------------------
+
+    def _read_body(self) -> bytes:
+        length = int(self.headers.get('Content-Length') or 0)
+        chunks = []
+        while length > 0:
+            chunk = self.rfile.read(min(READ_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            if self.server.bucket is not None:
+                self.server.bucket.consume(len(chunk))
+            self.server.stats.received(len(chunk))
+            chunks.append(chunk)
+            length -= len(chunk)
+        return b''.join(chunks)
+
+    def _send(self, status: int, body: bytes = b'', content_type: str = 'application/json',
+              headers: Optional[Dict[str, str]] = None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if body and self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def _send_json(self, status: int, payload: Dict, headers: Optional[Dict[str, str]] = None):
+        self._send(status, json.dumps(payload).encode('utf-8'), headers=headers)
+
+    def _send_error(self, status: int, message: str):
+        self._send_json(status, {'error': {'code': status, 'message': message,
+                                           'errors': [{'message': message, 'domain': 'global'}]}})
+
+    def _reset_connection(self):
+        """Drop the connection with an RST, as a load balancer reset looks to the client"""
+        self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack('ii', 1, 0))
+        self.close_connection = True
+        self.connection.close()
+
+    # -- dispatch ---------------------------------------------------------
+
+    def _handle(self):
+        parts = urlsplit(self.path)
+        query = {key: values[-1] for key, values in parse_qs(parts.query, keep_blank_values=True).items()}
+        kind = self.server.classify(self.command, parts.path, query)
+        self.server.stats.count(kind)
+
+        fault = self.server.draw_fault()
+        if fault == 'reset':
+            self.server.stats.fault('reset')
+            self._reset_connection()
+            return
+        body = self._read_body()
+        self.server.delay()
+        if fault:
+            self.server.stats.fault(str(fault))
+            self._send_error(fault, 'Injected fault')
+            return
+        try:
+            status, payload, headers = self.server.api(self.command, parts.path, query, body, self.headers)
+        except GCSError as e:
+            self._send_error(e.status, e.message)
+            return
+        if isinstance(payload, tuple):
+            content_type, data = payload
+            self._send(status, data, content_type, headers)
+        elif payload is None:
+            self._send(status, b'', headers=headers)
+        else:
+            self._send_json(status, payload, headers)
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = do_HEAD = _handle
+
+
+class LocalGCS(ThreadingHTTPServer):
+    """
+    The server: LocalGCS(latency=..., fault_503=...).start() serves on a
+    loopback port in a daemon thread; use it as a context manager in tests.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0, jitter: float = 0.0,
+                 bandwidth: Optional[float] = None, fault_429: float = 0.0, fault_503: float = 0.0,
+                 fault_reset: float = 0.0, seed: int = 0, page_size: int = DEFAULT_PAGE_SIZE,
+                 verbose: bool = False):
+        super().__init__((host, port), _Handler)
+        self.latency = latency
+        self.jitter = jitter
+        self.bucket = TokenBucket(Schedule.fixed(bandwidth)) if bandwidth else None
+        self.fault_rates = [(429, fault_429), (503, fault_503), ('reset', fault_reset)]
+        self.random = random.Random(seed)
+        self.random_lock = threading.Lock()
+        self.page_size = page_size
+        self.verbose = verbose
+        self.store = Store()
+        self.stats = Stats()
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'LocalGCS':
+        self.thread = threading.Thread(target=self.serve_forever, name='local-gcs', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def client(self, project: str = 'local'):
+        """A google-cloud-storage client bound to this server"""
+        from google.auth.credentials import AnonymousCredentials
+        from google.cloud import storage
+
+        return storage.Client(project=project, credentials=AnonymousCredentials(),
+                              client_options={'api_endpoint': self.url})
+
+    def draw_fault(self):
+        with self.random_lock:
+            for fault, rate in self.fault_rates:
+                if rate and self.random.random() < rate:
+                    return fault
+        return None
+
+    def delay(self):
+        if self.latency or self.jitter:
+            with self.random_lock:
+                extra = self.random.uniform(0.0, self.jitter) if self.jitter else 0.0
+            time.sleep(self.latency + extra)
+
+    @staticmethod
+    def classify(method: str, path: str, query: Dict[str, str]) -> str:
+        """Request kind for the stats: upload-multipart, upload-resumable, list, compose, batch, ..."""
+        if path.startswith('/upload/'):
+            if query.get('upload_id'):
+                return 'upload-resumable-chunk'
+            return f"upload-{query.get('uploadType', 'media')}"
+        if path.startswith('/batch/'):
+            return 'batch'
+        if path.startswith('/download/') or query.get('alt') == 'media':
+            return 'download'
+        if path.endswith('/compose'):
+            return 'compose'
+        if '/rewriteTo/' in path:
+            return 'rewrite'
+        if path.rstrip('/').endswith('/o'):
+            return 'list'
+        if '/o/' in path:
+            return f"object-{method.lower()}"
+        return f"bucket-{method.lower()}"
+
+    # -- JSON API ---------------------------------------------------------
+
+    def api(self, method: str, path: str, query: Dict[str, str], body: bytes, headers) -> Tuple[int, object, Dict]:
+        """Serve one request; returns (status, JSON dict | (content type, bytes) | None, headers)"""
+        segments = [unquote(segment) for segment in path.strip('/').split('/')]
+        if segments[:2] == ['batch', 'storage']:
+            return self._batch(body, headers.get('Content-Type', ''))
+        if segments[0] == 'upload':
+            return self._upload(method, segments[4], query, body, headers)
+        if segments[0] == 'download':
+            segments = segments[1:]
+        if segments[:2] != ['storage', 'v1'] or len(segments) < 3 or segments[2] != 'b':
+            raise GCSError(404, f"Not found: {path}")
+
+        if len(segments) == 3:
+            if method != 'POST':
+                raise GCSError(405, 'Method not allowed')
+            resource = json.loads(body or b'{}')
+            return 200, self.store.create_bucket(resource['name'], resource), {}
+        bucket = segments[3]
+        if len(segments) == 4:
+            if method == 'GET':
+                return 200, self.store.bucket(bucket), {}
+            if method in ('PATCH', 'PUT'):
+                with self.store.lock:
+                    self.store.bucket(bucket).update(json.loads(body or b'{}'))
+                return 200, self.store.bucket(bucket), {}
+            raise GCSError(405, 'Method not allowed')
+        if len(segments) == 5 and segments[4] == 'o':
+            return self._list(bucket, query)
+
+        # Object names may contain '/', which the client percent-encodes
+        name = '/'.join(segments[5:])
+        if '/rewriteTo/' in path:
+            source, dest = path.split('/o/', 1)[1].split('/rewriteTo/b/')
+            dest_bucket, dest_name = dest.split('/o/', 1)
+            return self._rewrite(bucket, unquote(source), unquote(dest_bucket), unquote(dest_name), body)
+        if name.endswith('/compose') and method == 'POST':
+            return self._compose(bucket, name[:-len('/compose')], body)
+        if method in ('GET', 'HEAD'):
+            stored = self.store.get(bucket, name)
+            if query.get('alt') == 'media':
+                return 200, (stored.fields['contentType'], stored.data), {}
+            return 200, stored.resource(self.url), {}
+        if method in ('PATCH', 'PUT'):
+            with self.store.lock:
+                stored = self.store.get(bucket, name)
+                stored.patch(json.loads(body or b'{}'))
+            return 200, stored.resource(self.url), {}
+        if method == 'DELETE':
+            self.store.delete(bucket, name)
+            return 204, None, {}
+        raise GCSError(405, 'Method not allowed')
+
+    def _list(self, bucket: str, query: Dict[str, str]):
+        page_size = min(int(query.get('maxResults') or self.page_size), self.page_size)
+        items, prefixes, last = self.store.list(bucket, query.get('prefix', ''), query.get('delimiter', ''),
+                                                query.get('pageToken', ''), page_size)
+        payload = {'kind': 'storage#objects', 'items': [item.resource(self.url) for item in items]}
+        if prefixes:
+            payload['prefixes'] = prefixes
+        if last is not None:
+            payload['nextPageToken'] = last
+        return 200, payload, {}
+
+    def _compose(self, bucket: str, name: str, body: bytes):
+        request = json.loads(body or b'{}')
+        with self.store.lock:
+            data = b''.join(self.store.get(bucket, source['name']).data for source in request.get('sourceObjects', []))
+        stored = self.store.put(bucket, name, data, request.get('destination') or {})
+        return 200, stored.resource(self.url), {}
+
+    def _rewrite(self, bucket: str, name: str, dest_bucket: str, dest_name: str, body: bytes):
+        source = self.store.get(bucket, name)
+        resource = {**source.fields, 'metadata': source.metadata, **json.loads(body or b'{}')}
+        stored = self.store.put(dest_bucket, dest_name, source.data, resource)
+        size = str(len(stored.data))
+        return 200, {'kind': 'storage#rewriteResponse', 'totalBytesRewritten': size, 'objectSize': size,
+                     'done': True, 'resource': stored.resource(self.url)}, {}
+
+    def _upload(self, method: str, bucket: str, query: Dict[str, str], body: bytes, headers):
+        upload_type = query.get('uploadType', 'media')
+        if upload_type == 'resumable' and query.get('upload_id'):
+            return self._resumable_chunk(query['upload_id'], body, headers.get('Content-Range', ''))
+        self.store.bucket(bucket)
+        if upload_type == 'media':
+            stored = self.store.put(bucket, query['name'], body, {'contentType': headers.get('Content-Type')})
+            return 200, stored.resource(self.url), {}
+        if upload_type == 'multipart':
+            resource, data, media_type = self._split_multipart(body, headers.get('Content-Type', ''))
+            # Like GCS, the media part's own Content-Type applies when the metadata has none
+            if not resource.get('contentType') and media_type:
+                resource['contentType'] = media_type
+            stored = self.store.put(bucket, resource.get('name') or query['name'], data, resource)
+            return 200, stored.resource(self.url), {}
+        if upload_type == 'resumable':
+            resource = json.loads(body or b'{}')
+            resource.setdefault('name', query.get('name'))
+            if not resource.get('contentType') and headers.get('X-Upload-Content-Type'):
+                resource['contentType'] = headers['X-Upload-Content-Type']
+            upload_id = uuid.uuid4().hex
+            with self.store.lock:
+                self.store.uploads[upload_id] = {'bucket': bucket, 'resource': resource, 'data': bytearray()}
+            location = f"{self.url}/upload/storage/v1/b/{bucket}/o?uploadType=resumable&upload_id={upload_id}"
+            return 200, None, {'Location': location}
+        raise GCSError(400, f"Unsupported uploadType: {upload_type}")
+
+    @staticmethod
+    def _split_multipart(body: bytes, content_type: str) -> Tuple[Dict, bytes, Optional[str]]:
+        """(metadata, media, media Content-Type) from a multipart/related upload body"""
+        boundary = content_type.split('boundary=', 1)[1].strip('"').encode('ascii')
+        parts = body.split(b'--' + boundary)[1:-1]
+        if len(parts) != 2:
+            raise GCSError(400, 'Expected metadata and media parts')
+        (_, metadata_part), (media_headers, media_part) = (part.split(b'\r\n\r\n', 1) for part in parts)
+        media_type = None
+        for line in media_headers.decode('latin-1').split('\r\n'):
+            field, _, value = line.partition(':')
+            if field.strip().lower() == 'content-type':
+                media_type = value.strip()
+        return json.loads(metadata_part), media_part[:-2] if media_part.endswith(b'\r\n') else media_part, media_type
+
+    def _resumable_chunk(self, upload_id: str, body: bytes, content_range: str):
+        """Append a chunk (Content-Range: bytes a-b/total or bytes */total for a status query)"""
+        with self.store.lock:
+            session = self.store.uploads.get(upload_id)
+            if session is None:
+                raise GCSError(404, 'No such upload session')
+            spec = content_range.replace('bytes', '').strip()
+            span, _, total = spec.partition('/')
+            received = session['data']
+            if span != '*' and body:
+                start = int(span.split('-')[0])
+                if start > len(received):
+                    raise GCSError(400, f"Chunk starts at {start}, only {len(received)} bytes persisted")
+                # A retried chunk may overlap what was already persisted
+                del received[start:]
+                received.extend(body)
+            if total not in ('*', '') and len(received) >= int(total):
+                del self.store.uploads[upload_id]
+                finished = (session['bucket'], session['resource'], bytes(received))
+            else:
+                finished = None
+        if finished:
+            bucket, resource, data = finished
+            stored = self.store.put(bucket, resource['name'], data, resource)
+            return 200, stored.resource(self.url), {}
+        headers = {'Range': f"bytes=0-{len(received) - 1}"} if received else {}
+        return 308, None, headers
+
+    def _batch(self, body: bytes, content_type: str):
+        """Run each application/http part of a multipart/mixed batch and answer in kind"""
+        message = BytesParser(policy=HTTP).parsebytes(
+            b'Content-Type: ' + content_type.encode('ascii') + b'\r\nMIME-Version: 1.0\r\n\r\n' + body)
+        boundary = f"batch_{uuid.uuid4().hex}"
+        responses = []
+        for part in message.iter_parts():
+            # The client writes sub-requests with bare \n line endings
+            raw = part.get_payload(decode=True).replace(b'\r\n', b'\n')
+            request_line, _, rest = raw.partition(b'\n')
+            method, target, _ = request_line.decode('ascii').split(' ', 2)
+            sub_headers = BytesParser(policy=HTTP).parsebytes(rest)
+            sub_body = rest.split(b'\n\n', 1)[1] if b'\n\n' in rest else b''
+            parts = urlsplit(target)
+            query = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+            self.stats.count(f"batch-{self.classify(method, parts.path, query)}")
+            try:
+                status, payload, _ = self.api(method, parts.path, query, sub_body, sub_headers)
+                text = json.dumps(payload) if isinstance(payload, dict) else ''
+            except GCSError as e:
+                status, text = e.status, json.dumps({'error': {'code': e.status, 'message': e.message}})
+            content_id = part.get('Content-ID', '').strip('<>')
+            responses.append(
+                f"--{boundary}\r\nContent-Type: application/http\r\nContent-ID: <response-{content_id}>\r\n\r\n"
+                f"HTTP/1.1 {status} {self._reason(status)}\r\nContent-Type: application/json; charset=UTF-8\r\n"
+                f"Content-Length: {len(text.encode('utf-8'))}\r\n\r\n{text}\r\n")
+        data = (''.join(responses) + f"--{boundary}--\r\n").encode('utf-8')
+        return 200, (f"multipart/mixed; boundary={boundary}", data), {}
+
+    @staticmethod
+    def _reason(status: int) -> str:
+        return BaseHTTPRequestHandler.responses.get(status, ('',))[0]
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Local GCS JSON API stand-in with latency and fault injection')
+    parser.add_argument('--host', default='127.0.0.1', help='Bind address (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=4443, help='Port (default: 4443)')
+    parser.add_argument('--bucket', action='append', default=[], help='Bucket to create at startup (repeatable)')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every response')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Extra random latency, up to this many seconds')
+    parser.add_argument('--bandwidth', help='Cap on request bodies across connections, e.g. 20MB/s')
+    parser.add_argument('--fault-429', type=float, default=0.0, help='Share of requests answered 429')
+    parser.add_argument('--fault-503', type=float, default=0.0, help='Share of requests answered 503')
+    parser.add_argument('--fault-reset', type=float, default=0.0, help='Share of connections reset')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for fault and jitter draws')
+    parser.add_argument('--verbose', action='store_true', help='Log every request')
+    args = parser.parse_args()
+
+    try:
+        bandwidth = parse_rate(args.bandwidth) if args.bandwidth else None
+    except ValueError as e:
+        parser.error(str(e))
+    server = LocalGCS(args.host, args.port, args.latency, args.jitter, bandwidth, args.fault_429, args.fault_503,
+                      args.fault_reset, args.seed, verbose=args.verbose)
+    for name in args.bucket:
+        server.store.create_bucket(name)
+
+    print("=" * 60)
+    print(f"Local GCS at {server.url}")
+    print("=" * 60)
+    print(f"Buckets: {', '.join(args.bucket) or '(none; create via the API)'}")
+    print(f"Latency: {args.latency * 1000:.0f} ms (+ up to {args.jitter * 1000:.0f} ms)  "
+          f"Faults: 429 {args.fault_429:.1%}, 503 {args.fault_503:.1%}, reset {args.fault_reset:.1%}")
+    print("Ctrl+C to stop")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        stats = server.stats.snapshot()
+        print()
+        print(f"Requests: {sum(stats['requests'].values())}  Faults: {sum(stats['faults'].values())}  "
+              f"Received: {stats['bytes_received'] / 1e6:.1f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+Build a compact JSON media manifest per lesson so the player and the
+interactive pages know each asset before fetching it.
+
+Every audio/video embed and image on a lesson page is resolved to the local
+file it was uploaded from (the same mapping page_weight.py uses; HLS master
+playlists through the hls_package index) and described as it is served:
+
+    {"lesson": "lesson-01", "page": "lesson-01-....md", "assets": [
+      {"type": "audio", "url": "...", "mime": "audio/mp4", "bytes": 9437184,
+       "sha256": "...", "duration": 612.48, "preload_bytes": 48213}, ...]}
+
+MP4/M4A files are uploaded faststart (mp4_faststart.prepare_for_upload), so
+bytes, sha256 and preload_bytes (the ftyp + moov prefix a player needs before
+it can start) describe the rewritten layout, computed without writing a copy.
+Images carry width and height; video adds its display size, and HLS embeds
+their renditions.
+
+Generation is incremental: per-file records are reused while size and mtime
+are unchanged, a manifest is rewritten only when its content changes, and an
+upload happens only when that version is not in the bucket yet. Manifests
+live in .cache/manifest/<book>/ and are uploaded next to the lesson's media
+as <bucket>/lesson-XX/manifest.json.
+
+Usage:
+    python media_manifest.py
+    python media_manifest.py --upload [--bucket money-markets-media] [--force]
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+from add_media_embeds import extract_lesson_number
+from hls_package import load_index, package_for_url
+from mp4_faststart import (FASTSTART_MIME_TYPES, FaststartError, faststart_plan, needs_faststart,
+                           read_movie_info, read_top_level_boxes)
+from page_weight import DEFAULT_LAYOUT, asset_type, extract_assets, local_path_for_url
+from profiling import add_profile_argument, profiled, span
+from upload_asset import guess_mime_type
+
+# Configuration
+SCRIPT_DIR = Path(__file__).parent
+GITBOOK_DIR = SCRIPT_DIR.parent
+LESSONS_DIR = GITBOOK_DIR / "content" / "lessons"
+MANIFEST_CACHE_DIR = GITBOOK_DIR / ".cache" / "manifest"
+# Same name workspace.py uses for this book, so both runners share one cache
+CACHE_PATH = MANIFEST_CACHE_DIR / f"{GITBOOK_DIR.name}.json"
+OUTPUT_DIR = MANIFEST_CACHE_DIR / GITBOOK_DIR.name
+MANIFEST_NAME = "manifest.json"
+HASH_CHUNK_SIZE = 4 * 1024 * 1024
+
+
+def _hash_pieces(data, pieces: List) -> Dict:
+    """Size and SHA-256 of the bytes a faststart plan (or plain ranges) would produce"""
+    digest = hashlib.sha256()
+    size = 0
+    for piece in pieces:
+        if isinstance(piece, bytes):
+            digest.update(piece)
+            size += len(piece)
+            continue
+        offset, length = piece
+        for start in range(offset, offset + length, HASH_CHUNK_SIZE):
+            digest.update(data[start:min(start + HASH_CHUNK_SIZE, offset + length)])
+        size += length
+    return {'bytes': size, 'sha256': digest.hexdigest()}
+
+
+def mp4_record(path: Path) -> Dict:
+    """Served size/hash, duration, display size and preload prefix of an MP4/M4A"""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return {'bytes': 0, 'sha256': hashlib.sha256().hexdigest()}
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            whole = [(0, len(data))]
+            try:
+                boxes = read_top_level_boxes(data)
+                moov = next((box for box in boxes if box[0] == b'moov'), None)
+                if moov is None:
+                    return _hash_pieces(data, whole)
+                record = read_movie_info(data[moov[1]:moov[1] + moov[2]])
+            except (FaststartError, struct.error):
+                return _hash_pieces(data, whole)
+
+            pieces, preload = whole, None
+            if needs_faststart(boxes):
+                try:
+                    pieces = faststart_plan(data, boxes)
+                except (FaststartError, struct.error):
+                    # Uploaded as-is, so the player has to fetch up to the trailing moov
+                    pass
+                else:
+                    moov_index = next(index for index, piece in enumerate(pieces) if isinstance(piece, bytes))
+                    preload = sum(len(piece) if isinstance(piece, bytes) else piece[1]
+                                  for piece in pieces[:moov_index + 1])
+            else:
+                preload = moov[1] + moov[2]
+            record.update(_hash_pieces(data, pieces))
+            record['preload_bytes'] = preload
+            return record
+
+
+def image_record(path: Path) -> Dict:
+    """Size, SHA-256 and pixel dimensions of an image (header only, no decode)"""
+    from PIL import Image
+
+    data = path.read_bytes()
+    record = {'bytes': len(data), 'sha256': hashlib.sha256(data).hexdigest()}
+    try:
+        with Image.open(path) as image:
+            record['width'], record['height'] = image.size
+    except OSError:
+        pass
+    return record
+
+
+def file_record(path: Path, mime_type: str) -> Dict:
+    if mime_type in FASTSTART_MIME_TYPES:
+        return mp4_record(path)
+    if mime_type.startswith('image/'):
+        return image_record(path)
+    data = path.read_bytes()
+    return {'bytes': len(data), 'sha256': hashlib.sha256(data).hexdigest()}
+
+
+class ManifestBuilder:
+    """Builds lesson manifests from cached per-file records and tracks which versions were uploaded"""
+
+    def __init__(self, lessons_dir: Path = LESSONS_DIR, layout: Optional[Dict] = None,
+                 cache_path: Optional[Path] = None, output_dir: Optional[Path] = None,
+                 hls_index: Optional[Dict[str, Dict]] = None):
+        self.lessons_dir = Path(lessons_dir)
+        self.layout = layout or DEFAULT_LAYOUT
+        self.cache_path = Path(cache_path) if cache_path else CACHE_PATH
+        self.output_dir = Path(output_dir) if output_dir else OUTPUT_DIR
+        self.hls_index = hls_index if hls_index is not None else load_index()
+        self.files: Dict[str, Dict] = {}
+        self.manifests: Dict[str, Dict] = {}
+        if self.cache_path.exists():
+            try:
+                with open(self.cache_path, 'r') as f:
+                    data = json.load(f)
+                self.files = data.get('files', {})
+                self.manifests = data.get('manifests', {})
+            except (OSError, json.JSONDecodeError):
+                pass
+        self._used = set()
+
+    def save(self, prune: bool = False):
+        """Write the cache; prune drops records of files no manifest referenced this run"""
+        if prune:
+            self.files = {key: record for key, record in self.files.items() if key in self._used}
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.cache_path.with_suffix('.json.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump({'files': self.files, 'manifests': self.manifests}, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.cache_path)
+
+    def record(self, path: Path, mime_type: str) -> Dict:
+        """Cached record of a local file, recomputed when its size or mtime changed"""
+        key = str(Path(path).resolve())
+        self._used.add(key)
+        stat = path.stat()
+        cached = self.files.get(key)
+        if cached and cached['size'] == stat.st_size and cached['mtime_ns'] == stat.st_mtime_ns:
+            return cached['record']
+        with span('hash'):
+            record = file_record(path, mime_type)
+        self.files[key] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'record': record}
+        return record
+
+    def asset(self, url: str, page_path: Path) -> Dict:
+        """Manifest entry for one asset URL of a page"""
+        mime_type = guess_mime_type(urlparse(url).path)
+        entry = {'type': asset_type(url), 'url': url, 'mime': mime_type}
+        if mime_type == 'application/vnd.apple.mpegurl':
+            entry['type'] = 'video'
+            source = package_for_url(self.hls_index, url)
+            if source is None:
+                return entry
+            name, index_entry = source
+            path = Path(self.layout['video_dir']) / name
+            if path.is_file():
+                movie = self.record(path, 'video/mp4')
+                entry.update({field: movie[field] for field in ('duration', 'width', 'height') if field in movie})
+                if entry.get('duration') is not None:
+                    entry['duration'] = round(entry['duration'], 3)
+            renditions = index_entry.get('renditions', [])
+            if renditions:
+                entry['width'], entry['height'] = renditions[0]['width'], renditions[0]['height']
+            entry['renditions'] = [{'name': rendition['name'], 'width': rendition['width'],
+                                    'height': rendition['height'],
+                                    'kbps': rendition['video_kbps'] + rendition['audio_kbps']}
+                                   for rendition in renditions]
+            return entry
+
+        path = local_path_for_url(url, page_path, self.layout)
+        if path is None or not path.is_file():
+            return entry
+        record = self.record(path, mime_type)
+        entry.update(record)
+        if entry.get('duration') is not None:
+            entry['duration'] = round(entry['duration'], 3)
+        if entry['type'] == 'audio':
+            # tkhd sizes of sound tracks are 0x0
+            entry.pop('width', None)
+            entry.pop('height', None)
+        return {field: value for field, value in entry.items() if value is not None}
+
+    def build(self, lesson_file: Path) -> Optional[Dict]:
+        """Manifest of one lesson page (None when its lesson number cannot be read)"""
+        lesson_num = extract_lesson_number(lesson_file.name)
+        if lesson_num is None:
+            return None
+        content = lesson_file.read_text(encoding='utf-8')
+        urls = list(dict.fromkeys(extract_assets(content)))
+        with ThreadPoolExecutor(max_workers=min(8, len(urls) or 1)) as executor:
+            assets = list(executor.map(lambda url: self.asset(url, lesson_file), urls))
+        return {'lesson': f"lesson-{lesson_num:02d}", 'page': lesson_file.name, 'assets': assets}
+
+    def write(self, manifest: Dict) -> bool:
+        """Write a manifest if its content changed; returns True when it did"""
+        body = json.dumps(manifest, separators=(',', ':'), sort_keys=True).encode('utf-8')
+        digest = hashlib.sha256(body).hexdigest()
+        path = self.output_dir / f"{manifest['lesson']}.json"
+        state = self.manifests.get(manifest['lesson'], {})
+        if state.get('sha256') == digest and path.exists():
+            return False
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(body)
+        self.manifests[manifest['lesson']] = {'sha256': digest, 'uploaded': []}
+        return True
+
+    def upload(self, lesson_slug: str, bucket_name: str, storage_client=None, limiter=None,
+               force: bool = False) -> Optional[str]:
+        """Upload a lesson manifest next to its media; returns its URL"""
+        from upload_asset import upload_file
+
+        state = self.manifests[lesson_slug]
+        url = f"https://storage.googleapis.com/{bucket_name}/{lesson_slug}/{MANIFEST_NAME}"
+        if bucket_name in state['uploaded'] and not force:
+            return url
+        with span('upload'):
+            result = upload_file(self.output_dir / f"{lesson_slug}.json", bucket_name=bucket_name,
+                                 storage_client=storage_client, limiter=limiter,
+                                 object_key=f"{lesson_slug}/{MANIFEST_NAME}", show_embed=False)
+        if result is None:
+            return None
+        state['uploaded'] = sorted(set(state['uploaded']) | {bucket_name})
+        return url
+
+
+def generate_manifests(lessons_dir: Path = LESSONS_DIR, layout: Optional[Dict] = None, bucket_name: Optional[str] = None,
+                       storage_client=None, limiter=None, cache_path: Optional[Path] = None,
+                       output_dir: Optional[Path] = None, hls_index: Optional[Dict[str, Dict]] = None,
+                       force: bool = False) -> int:
+    """Build every lesson manifest, and upload new versions when bucket_name is given"""
+    print("=" * 60)
+    print("Building Lesson Media Manifests")
+    print("=" * 60)
+    print()
+
+    lesson_files = sorted(Path(lessons_dir).glob("lesson-*.md"))
+    if not lesson_files:
+        print("No lesson files found!")
+        return 1
+
+    builder = ManifestBuilder(lessons_dir, layout, cache_path, output_dir, hls_index)
+    written = unchanged = failed = 0
+    for lesson_file in lesson_files:
+        manifest = builder.build(lesson_file)
+        if manifest is None:
+            print(f"  ⚠️  Could not extract lesson number from: {lesson_file.name}")
+            continue
+        assets = manifest['assets']
+        described = sum(1 for asset in assets if 'sha256' in asset or 'renditions' in asset)
+        total = sum(asset.get('bytes', 0) for asset in assets)
+        if builder.write(manifest) or force:
+            print(f"  ✅ {manifest['lesson']}: {len(assets)} asset(s), {total / 1e6:.1f} MB")
+            written += 1
+        else:
+            print(f"  ⏭️  {manifest['lesson']}: unchanged")
+            unchanged += 1
+        if described < len(assets):
+            print(f"     ⚠️  {len(assets) - described} asset(s) have no local file; listed by URL only")
+        if bucket_name:
+            url = builder.upload(manifest['lesson'], bucket_name, storage_client, limiter, force=force)
+            if url is None:
+                failed += 1
+        builder.save()
+    builder.save(prune=True)
+
+    print()
+    print("=" * 60)
+    print(f"✅ Written: {written}  ⏭️  Unchanged: {unchanged}  ❌ Failed uploads: {failed}")
+    print(f"Manifests: {builder.output_dir}")
+    print("=" * 60)
+    return 1 if failed else 0
+
+
+def main():
+    import argparse
+    from bandwidth import add_bandwidth_arguments, limiter_from_options
+
+    parser = argparse.ArgumentParser(description='Build (and upload) per-lesson media manifests')
+    parser.add_argument('--lessons-dir', default=str(LESSONS_DIR), help='Directory of lesson pages')
+    parser.add_argument('--upload', action='store_true', help='Upload new manifests to the media bucket')
+    parser.add_argument('--bucket', default=os.getenv('GCS_BUCKET_NAME', DEFAULT_LAYOUT['media_bucket']),
+                        help='Media bucket (default: $GCS_BUCKET_NAME or money-markets-media)')
+    parser.add_argument('--force', action='store_true', help='Rewrite and re-upload every manifest')
+    add_profile_argument(parser)
+    add_bandwidth_arguments(parser)
+    args = parser.parse_args()
+
+    try:
+        limiter = limiter_from_options(args.bandwidth, args.bandwidth_schedule)
+    except ValueError as e:
+        parser.error(str(e))
+
+    storage_client = None
+    if args.upload:
+        from upload_asset import get_storage_client
+        storage_client = get_storage_client()
+        if storage_client is None:
+            return 1
+
+    def run():
+        return generate_manifests(Path(args.lessons_dir), bucket_name=args.bucket if args.upload else None,
+                                  storage_client=storage_client, limiter=limiter, force=args.force)
+
+    with profiled(args.profile, 'media_manifest'):
+        if limiter is None:
+            return run()
+        with limiter:
+            return run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
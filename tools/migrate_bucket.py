@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+"""
+Migrate or re-key objects between GCS buckets with server-side copies, then
+rewrite every affected URL in content/ in a single pass.
+Objects are copied with the rewrite API (continuation tokens for large objects),
+so no bytes pass through this machine.
+
+The journal is written before anything changes and updated as each copy,
+file rewrite and source delete completes, so --rollback can restore the
+markdown and undo the copies even after an interrupted run. Destinations
+that already exist are never overwritten: identical objects are reused (and
+left alone on rollback), different ones are reported as conflicts, and so
+are source objects whose new keys collide with each other.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import quote, unquote
+
+from upload_asset import get_storage_client
+
+# Configuration
+SCRIPT_DIR = Path(__file__).parent
+GITBOOK_DIR = SCRIPT_DIR.parent
+CONTENT_DIR = GITBOOK_DIR / "content"
+JOURNAL_DIR = GITBOOK_DIR / ".cache" / "migrations"
+GCS_URL_PATTERN = re.compile(r'https://storage\.googleapis\.com/([a-z0-9._-]+)/([^\s")\]]+)')
+
+
+# ---------------------------------------------------------------------------
+# Key layouts
+# ---------------------------------------------------------------------------
+
+def media_to_images_layout(key: str) -> str:
+    """lesson-02/audio/file.m4a -> lessons/lesson_02/audio/file.m4a"""
+    match = re.match(r'^lesson-(\d+)/(.+)$', key)
+    if match:
+        return f"lessons/lesson_{match.group(1)}/{match.group(2)}"
+    return key
+
+
+def images_to_media_layout(key: str) -> str:
+    """lessons/lesson_02/file.png -> lesson-02/images/file.png"""
+    match = re.match(r'^lessons/lesson_(\d+)/([^/]+)$', key)
+    if match:
+        return f"lesson-{match.group(1)}/images/{match.group(2)}"
+    return key
+
+
+LAYOUTS: Dict[str, Callable[[str], str]] = {
+    'identity': lambda key: key,
+    'media-to-images': media_to_images_layout,
+    'images-to-media': images_to_media_layout,
+}
+
+
+def prefix_rewriter(rules: List[Tuple[str, str]], base: Callable[[str], str]) -> Callable[[str], str]:
+    """Apply the first matching OLD=NEW prefix rule after the base layout"""
+    def rewrite(key: str) -> str:
+        key = base(key)
+        for old, new in rules:
+            if key.startswith(old):
+                return new + key[len(old):]
+        return key
+    return rewrite
+
+
+def public_url(bucket: str, key: str) -> str:
+    """Public URL with each path segment percent-encoded (as add_media_embeds.py does)"""
+    return f"https://storage.googleapis.com/{bucket}/" + '/'.join(quote(part, safe='') for part in key.split('/'))
+
+
+# ---------------------------------------------------------------------------
+# Server-side copy
+# ---------------------------------------------------------------------------
+
+def server_side_copy(client, source_bucket: str, source_key: str, dest_bucket: str, dest_key: str) -> int:
+    """
+    Copy one object with the rewrite API, following continuation tokens.
+
+    Returns the number of bytes rewritten. Metadata (content type, cache
+    control, custom metadata) is carried over by the service.
+    """
+    source_blob = client.bucket(source_bucket).blob(source_key)
+    dest_blob = client.bucket(dest_bucket).blob(dest_key)
+    token, rewritten, total = dest_blob.rewrite(source_blob)
+    while token is not None:
+        token, rewritten, total = dest_blob.rewrite(source_blob, token=token)
+    return total
+
+
+def copy_objects(client, moves: List[Dict], workers: int,
+                 on_copied: Optional[Callable[[Dict], None]] = None) -> Tuple[List[Dict], List[Tuple[Dict, str]]]:
+    """Run server-side copies concurrently; returns (copied, failed). on_copied runs as each copy lands."""
+    copied, failed = [], []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(server_side_copy, client, move['source_bucket'], move['source_key'],
+                            move['dest_bucket'], move['dest_key']): move
+            for move in moves
+        }
+        for future in as_completed(futures):
+            move = futures[future]
+            try:
+                move['bytes'] = future.result()
+                copied.append(move)
+                if on_copied is not None:
+                    on_copied(move)
+                print(f"  ✓ gs://{move['source_bucket']}/{move['source_key']} → "
+                      f"gs://{move['dest_bucket']}/{move['dest_key']}")
+            except Exception as e:
+                failed.append((move, str(e)))
+                print(f"  ✗ {move['source_key']}: {e}")
+    return copied, failed
+
+
+# ---------------------------------------------------------------------------
+# Markdown URL rewrite
+# ---------------------------------------------------------------------------
+
+def plan_content_rewrites(content_dir: Path, url_map: Dict[Tuple[str, str], str]) -> List[Dict]:
+    """
+    Find every URL of a moved object in one pass over content/.
+
+    url_map maps (bucket, decoded key) to the new public URL, so encoded and
+    unencoded spellings of the same object are both caught. Returns one entry
+    per file to change with its original and updated text.
+    """
+    changes = []
+
+    def replace(match) -> str:
+        new_url = url_map.get((match.group(1), unquote(match.group(2))))
+        return new_url if new_url else match.group(0)
+
+    for md_file in sorted(content_dir.rglob('*.md')):
+        original = md_file.read_text(encoding='utf-8')
+        updated = GCS_URL_PATTERN.sub(replace, original)
+        if updated != original:
+            changes.append({'path': str(md_file), 'original': original, 'updated': updated})
+    return changes
+
+
+def journal_entry(change: Dict) -> Dict:
+    """What the journal keeps of a file change: the original text and a hash of the new one"""
+    return {'path': change['path'], 'original': change['original'],
+            'updated_sha256': hashlib.sha256(change['updated'].encode('utf-8')).hexdigest()}
+
+
+# ---------------------------------------------------------------------------
+# Journal / rollback
+# ---------------------------------------------------------------------------
+
+def new_journal_path() -> Path:
+    return JOURNAL_DIR / f"migration-{time.strftime('%Y%m%d-%H%M%S')}.json"
+
+
+def write_journal(journal: Dict, journal_path: Path) -> Path:
+    """Atomically replace the journal, so a crash never leaves a half-written one"""
+    journal_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = journal_path.with_suffix('.json.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(journal, f, indent=2)
+    os.replace(tmp_path, journal_path)
+    return journal_path
+
+
+def rollback(journal_path: Path, workers: int, storage_client=None) -> bool:
+    """Restore markdown files and undo the object copies recorded in a journal (complete or not)"""
+    with open(journal_path, 'r', encoding='utf-8') as f:
+        journal = json.load(f)
+
+    ok = True
+    for change in journal['content_changes']:
+        path = Path(change['path'])
+        current = path.read_text(encoding='utf-8') if path.exists() else ''
+        if current == change['original']:
+            # Interrupted before this file was rewritten
+            continue
+        if hashlib.sha256(current.encode('utf-8')).hexdigest() != change['updated_sha256']:
+            print(f"  ⚠️  {path.name} was edited after the migration, restoring anyway (current text is lost)")
+        path.write_text(change['original'], encoding='utf-8')
+        print(f"  ↩️  Restored {path.name}")
+
+    if not journal['copied'] and not journal['deleted']:
+        return ok
+
+    client = storage_client or get_storage_client()
+    if client is None:
+        return False
+
+    # Sources that were deleted are copied back before their copies are removed
+    restore = [
+        {'source_bucket': move['dest_bucket'], 'source_key': move['dest_key'],
+         'dest_bucket': move['source_bucket'], 'dest_key': move['source_key']}
+        for move in journal['deleted']
+    ]
+    if restore:
+        _, failed = copy_objects(client, restore, workers)
+        if failed:
+            print("  ❌ Some objects could not be restored; leaving destination copies in place")
+            return False
+
+    for move in journal['copied']:
+        if (move['source_bucket'], move['source_key']) == (move['dest_bucket'], move['dest_key']):
+            continue
+        try:
+            client.bucket(move['dest_bucket']).blob(move['dest_key']).delete()
+            print(f"  🗑️  Removed gs://{move['dest_bucket']}/{move['dest_key']}")
+        except Exception as e:
+            print(f"  ✗ Could not remove gs://{move['dest_bucket']}/{move['dest_key']}: {e}")
+            ok = False
+    return ok
+
+
+# ---------------------------------------------------------------------------
+# Migration
+# ---------------------------------------------------------------------------
+
+def _same_object(source, existing) -> bool:
+    """True when an existing destination holds the same bytes as the source"""
+    if source.size != existing.size:
+        return False
+    if source.crc32c and existing.crc32c:
+        return source.crc32c == existing.crc32c
+    return bool(source.md5_hash) and source.md5_hash == existing.md5_hash
+
+
+def plan_moves(client, source_bucket: str, dest_bucket: str, key_rewriter: Callable[[str], str],
+               prefix: Optional[str] = None) -> Tuple[List[Dict], List[Dict], List[Dict]]:
+    """
+    List source objects and compute their destination keys (unchanged objects are skipped).
+
+    Returns (moves, present, conflicts): moves need a copy, present already
+    exist at the destination with the same bytes, conflicts exist there with
+    different bytes, or share their destination key with another source
+    ('duplicate_of'), and are left alone.
+    """
+    sources = [blob for blob in client.list_blobs(source_bucket, prefix=prefix)]
+    destination = {blob.name: blob for blob in client.list_blobs(dest_bucket)}
+    planned = []
+    for blob in sources:
+        dest_key = key_rewriter(blob.name)
+        if source_bucket == dest_bucket and dest_key == blob.name:
+            continue
+        planned.append((blob, dest_key))
+    sources_by_dest: Dict[str, List[str]] = {}
+    for blob, dest_key in planned:
+        sources_by_dest.setdefault(dest_key, []).append(blob.name)
+
+    moves, present, conflicts = [], [], []
+    for blob, dest_key in planned:
+        move = {
+            'source_bucket': source_bucket,
+            'source_key': blob.name,
+            'dest_bucket': dest_bucket,
+            'dest_key': dest_key,
+        }
+        existing = destination.get(dest_key)
+        if len(sources_by_dest[dest_key]) > 1:
+            # Concurrent copies to one key would silently keep the last writer
+            move['duplicate_of'] = [name for name in sources_by_dest[dest_key] if name != blob.name]
+            conflicts.append(move)
+        elif existing is None:
+            moves.append(move)
+        elif _same_object(blob, existing):
+            present.append(move)
+        else:
+            move['existing_generation'] = existing.generation
+            conflicts.append(move)
+    return moves, present, conflicts
+
+
+def migrate(source_bucket: str, dest_bucket: str, key_rewriter: Callable[[str], str],
+            prefix: Optional[str] = None, workers: int = 16, delete_source: bool = False,
+            dry_run: bool = False, content_dir: Optional[Path] = None, storage_client=None,
+            journal_path: Optional[Path] = None) -> bool:
+    content_dir = Path(content_dir) if content_dir else CONTENT_DIR
+    client = storage_client or get_storage_client()
+    if client is None:
+        return False
+
+    moves, present, conflicts = plan_moves(client, source_bucket, dest_bucket, key_rewriter, prefix)
+    print(f"Objects to migrate: {len(moves)} (already at the destination: {len(present)})")
+    for move in conflicts:
+        if 'duplicate_of' in move:
+            print(f"  ⚠️  {move['source_key']} and {', '.join(move['duplicate_of'])} map to "
+                  f"gs://{dest_bucket}/{move['dest_key']}; not copying {move['source_key']}")
+        else:
+            print(f"  ⚠️  gs://{dest_bucket}/{move['dest_key']} already exists with different content; "
+                  f"not copying {move['source_key']}")
+    if not moves and not present:
+        return not conflicts
+
+    if dry_run:
+        for move in moves:
+            print(f"  Would copy: {move['source_key']} → gs://{dest_bucket}/{move['dest_key']}")
+        url_map = {(m['source_bucket'], m['source_key']): public_url(m['dest_bucket'], m['dest_key'])
+                   for m in moves + present}
+        changes = plan_content_rewrites(content_dir, url_map)
+        print(f"Files that would be rewritten: {len(changes)}")
+        return not conflicts
+
+    journal_path = Path(journal_path) if journal_path else new_journal_path()
+    journal = {
+        'source_bucket': source_bucket,
+        'dest_bucket': dest_bucket,
+        'status': 'copying',
+        'planned': moves,
+        # Destinations this run created; only these are removed on rollback
+        'copied': [],
+        'already_present': present,
+        'conflicts': conflicts,
+        'failed': [],
+        'content_changes': [],
+        'deleted': [],
+    }
+    write_journal(journal, journal_path)
+    print(f"Journal: {journal_path}")
+
+    def record_copy(move: Dict):
+        journal['copied'].append(move)
+        write_journal(journal, journal_path)
+
+    copied, failed = copy_objects(client, moves, workers, on_copied=record_copy)
+    journal['failed'] = [move for move, _ in failed]
+    print(f"Copied {len(copied)} objects ({sum(m['bytes'] for m in copied) / 1024 / 1024:.1f} MB server-side)")
+
+    # Only objects that are at the destination get their URLs rewritten; the
+    # original text is journaled before any file is touched
+    landed = copied + present
+    url_map = {(m['source_bucket'], m['source_key']): public_url(m['dest_bucket'], m['dest_key']) for m in landed}
+    changes = plan_content_rewrites(content_dir, url_map)
+    journal['status'] = 'rewriting'
+    journal['content_changes'] = [journal_entry(change) for change in changes]
+    write_journal(journal, journal_path)
+    for change in changes:
+        Path(change['path']).write_text(change['updated'], encoding='utf-8')
+    print(f"Rewrote URLs in {len(changes)} file(s)")
+
+    ok = not failed and not conflicts
+    if delete_source and ok:
+        journal['status'] = 'deleting'
+        for move in landed:
+            try:
+                client.bucket(move['source_bucket']).blob(move['source_key']).delete()
+            except Exception as e:
+                print(f"  ✗ Could not delete gs://{move['source_bucket']}/{move['source_key']}: {e}")
+                ok = False
+                break
+            journal['deleted'].append(move)
+            write_journal(journal, journal_path)
+    elif delete_source:
+        print("⚠️  Sources kept: not every object reached the destination")
+
+    journal['status'] = 'complete'
+    write_journal(journal, journal_path)
+    print(f"Undo with: python migrate_bucket.py --rollback {journal_path}")
+    return ok
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Server-side GCS bucket migration with markdown URL rewrite')
+    parser.add_argument('--source-bucket', help='Bucket to copy from (e.g., money-markets-media)')
+    parser.add_argument('--dest-bucket', help='Bucket to copy into (defaults to the source bucket for re-keying)')
+    parser.add_argument('--layout', choices=sorted(LAYOUTS), default='identity', help='Key layout conversion')
+    parser.add_argument('--rename-prefix', action='append', default=[], metavar='OLD=NEW',
+                        help='Additional key prefix rewrite (repeatable)')
+    parser.add_argument('--prefix', help='Only migrate objects under this source prefix')
+    parser.add_argument('--workers', type=int, default=16, help='Concurrent rewrite calls (default: 16)')
+    parser.add_argument('--delete-source', action='store_true', help='Delete source objects after a clean copy')
+    parser.add_argument('--dry-run', action='store_true', help='Show planned copies and rewrites only')
+    parser.add_argument('--rollback', metavar='JOURNAL', help='Undo a previous migration from its journal')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("Bucket Migration" if not args.rollback else "Bucket Migration Rollback")
+    print("=" * 60)
+
+    if args.rollback:
+        return 0 if rollback(Path(args.rollback), args.workers) else 1
+
+    if not args.source_bucket:
+        parser.error('--source-bucket is required')
+
+    rules = []
+    for rule in args.rename_prefix:
+        if '=' not in rule:
+            parser.error(f"--rename-prefix expects OLD=NEW, got: {rule}")
+        rules.append(tuple(rule.split('=', 1)))
+
+    success = migrate(
+        source_bucket=args.source_bucket,
+        dest_bucket=args.dest_bucket or args.source_bucket,
+        key_rewriter=prefix_rewriter(rules, LAYOUTS[args.layout]),
+        prefix=args.prefix,
+        workers=args.workers,
+        delete_source=args.delete_source,
+        dry_run=args.dry_run,
+    )
+    return 0 if success else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
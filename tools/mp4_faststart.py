@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+Relocate the moov atom of MP4/M4A files to the front ("faststart") so the
+embedded player can start playback before the whole file has downloaded.
+Pure Python: the file is streamed through mmap, only the moov atom is held
+in memory, and stco/co64 chunk offsets are rewritten for the new layout.
+"""
+
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from bisect import bisect_right
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# MIME types handled by the upload path
+FASTSTART_MIME_TYPES = {'video/mp4', 'audio/mp4', 'audio/x-m4a', 'video/quicktime'}
+
+# Boxes whose payload is a list of child boxes (chunk offset tables live below these)
+CONTAINER_BOXES = {b'moov', b'trak', b'mdia', b'minf', b'stbl'}
+
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+class FaststartError(Exception):
+    """Raised when a file cannot be parsed or rewritten"""
+
+
+def read_top_level_boxes(data) -> List[Tuple[bytes, int, int]]:
+    """
+    List top-level boxes as (type, offset, size).
+
+    Handles 64-bit sizes (size == 1) and the open-ended last box (size == 0).
+    """
+    boxes = []
+    offset = 0
+    length = len(data)
+    while offset + 8 <= length:
+        size, box_type = struct.unpack('>I4s', data[offset:offset + 8])
+        if size == 1:
+            if offset + 16 > length:
+                raise FaststartError(f"Truncated 64-bit box header at offset {offset}")
+            size = struct.unpack('>Q', data[offset + 8:offset + 16])[0]
+        elif size == 0:
+            size = length - offset
+        if size < 8 or offset + size > length:
+            raise FaststartError(f"Invalid size {size} for box '{box_type.decode('latin-1')}' at offset {offset}")
+        boxes.append((box_type, offset, size))
+        offset += size
+    return boxes
+
+
+def needs_faststart(boxes: List[Tuple[bytes, int, int]]) -> bool:
+    """True when moov comes after the first mdat"""
+    types = [box_type for box_type, _, _ in boxes]
+    if b'moov' not in types or b'mdat' not in types:
+        return False
+    return types.index(b'moov') > types.index(b'mdat')
+
+
+def _header_size(data: bytes, offset: int) -> Tuple[int, int]:
+    """Return (header size, box size) of the box starting at offset"""
+    size = struct.unpack('>I', data[offset:offset + 4])[0]
+    if size == 1:
+        return 16, struct.unpack('>Q', data[offset + 8:offset + 16])[0]
+    if size == 0:
+        return 8, len(data) - offset
+    return 8, size
+
+
+def _child_boxes(data, start: int, end: int):
+    """Yield (type, payload start, box end) for the boxes between start and end"""
+    while start + 8 <= end:
+        header_size, size = _header_size(data, start)
+        if size < header_size or start + size > end:
+            raise FaststartError(f"Invalid box size {size} at offset {start}")
+        yield data[start + 4:start + 8], start + header_size, start + size
+        start += size
+
+
+def read_movie_info(moov) -> Dict:
+    """
+    Duration (seconds, from mvhd) and display size (largest tkhd, 0x0 for
+    audio-only files) of a moov atom.
+    """
+    info = {'duration': None, 'width': 0, 'height': 0}
+    for box_type, payload, box_end in _child_boxes(moov, _header_size(moov, 0)[0], len(moov)):
+        if box_type == b'mvhd':
+            # Version 1 widens the times and duration to 64 bits
+            if moov[payload] == 1:
+                timescale, duration = struct.unpack('>IQ', moov[payload + 20:payload + 32])
+            else:
+                timescale, duration = struct.unpack('>II', moov[payload + 12:payload + 20])
+            if timescale:
+                info['duration'] = duration / timescale
+        elif box_type == b'trak':
+            for child_type, child_payload, child_end in _child_boxes(moov, payload, box_end):
+                if child_type == b'tkhd':
+                    # Width and height are the last two 16.16 fields in both versions
+                    width, height = (value >> 16 for value in struct.unpack('>II', moov[child_end - 8:child_end]))
+                    if width * height > info['width'] * info['height']:
+                        info['width'], info['height'] = width, height
+    return info
+
+
+def _box(box_type: bytes, payload: bytes) -> bytes:
+    size = len(payload) + 8
+    if size > 0xFFFFFFFF:
+        return struct.pack('>I4sQ', 1, box_type, size + 8) + payload
+    return struct.pack('>I4s', size, box_type) + payload
+
+
+def _rewrite_box(data: bytes, offset: int, end: int, relocate, use_co64: bool) -> bytes:
+    """
+    Rebuild a box, patching chunk offset tables.
+
+    relocate maps an old absolute file offset to its new one; use_co64
+    upgrades every stco table to co64 (needed when offsets overflow 32 bits).
+    """
+    header_size, size = _header_size(data, offset)
+    box_type = data[offset + 4:offset + 8]
+    payload_start = offset + header_size
+    box_end = offset + size
+    if box_end > end:
+        raise FaststartError(f"Box '{box_type.decode('latin-1')}' overruns its parent")
+
+    if box_type == b'cmov':
+        raise FaststartError("Compressed moov atoms are not supported")
+
+    if box_type in CONTAINER_BOXES:
+        children = []
+        child = payload_start
+        while child + 8 <= box_end:
+            child_header, child_size = _header_size(data, child)
+            if child_size < child_header:
+                raise FaststartError(f"Invalid child box size inside '{box_type.decode('latin-1')}'")
+            children.append(_rewrite_box(data, child, box_end, relocate, use_co64))
+            child += child_size
+        # Preserve any trailing padding bytes verbatim
+        return _box(box_type, b''.join(children) + data[child:box_end])
+
+    if box_type in (b'stco', b'co64'):
+        version_flags = data[payload_start:payload_start + 4]
+        count = struct.unpack('>I', data[payload_start + 4:payload_start + 8])[0]
+        table_start = payload_start + 8
+        width = 4 if box_type == b'stco' else 8
+        fmt = f'>{count}{"I" if width == 4 else "Q"}'
+        offsets = struct.unpack(fmt, data[table_start:table_start + count * width])
+        new_offsets = [relocate(value) for value in offsets]
+
+        if box_type == b'stco' and not use_co64:
+            if new_offsets and max(new_offsets) > 0xFFFFFFFF:
+                raise OverflowError("stco offset overflow")
+            return _box(b'stco', version_flags + struct.pack(f'>I{count}I', count, *new_offsets))
+        return _box(b'co64', version_flags + struct.pack(f'>I{count}Q', count, *new_offsets))
+
+    return bytes(data[offset:box_end])
+
+
+def build_faststart_moov(moov: bytes, moov_new_offset: int, layout: List[Tuple[int, int, int]]) -> bytes:
+    """
+    Rewrite a moov atom for placement at moov_new_offset.
+
+    layout is a sorted list of (old_offset, old_size, new_offset) for every
+    top-level box except moov; chunk offsets are shifted by the movement of
+    the box that contains them. The moov size feeds back into the layout, so
+    the new offsets are recomputed from the rewritten size.
+    """
+    old_starts = [old for old, _, _ in layout]
+
+    def make_relocate(moov_size: int):
+        def relocate(value: int) -> int:
+            index = bisect_right(old_starts, value) - 1
+            if index < 0:
+                return value
+            old_start, old_size, new_start = layout[index]
+            if value >= old_start + old_size:
+                return value
+            # Boxes that end up after moov move by its (possibly grown) size
+            shift = new_start - old_start
+            if new_start >= moov_new_offset:
+                shift += moov_size
+            return value + shift
+        return relocate
+
+    use_co64 = False
+    moov_size = len(moov)
+    for _ in range(3):
+        try:
+            rewritten = _rewrite_box(moov, 0, len(moov), make_relocate(moov_size), use_co64)
+        except OverflowError:
+            use_co64 = True
+            continue
+        if len(rewritten) == moov_size:
+            return rewritten
+        moov_size = len(rewritten)
+    raise FaststartError("Could not converge on a stable moov size")
+
+
+def faststart_plan(data, boxes: List[Tuple[bytes, int, int]]) -> List:
+    """
+    Layout of the faststart copy as a list of pieces: (offset, size) ranges
+    copied from data, and the rewritten moov as bytes.
+    """
+    moov_box = next(box for box in boxes if box[0] == b'moov')
+    first_mdat = next(index for index, box in enumerate(boxes) if box[0] == b'mdat')
+    others = [box for box in boxes if box is not moov_box]
+
+    # New order: everything before the first mdat, then moov, then the rest
+    before = [box for box in others if box[1] < boxes[first_mdat][1]]
+    after = [box for box in others if box[1] >= boxes[first_mdat][1]]
+    moov_new_offset = sum(size for _, _, size in before)
+
+    # New offsets excluding the moov size, which build_faststart_moov adds
+    layout = []
+    position = 0
+    for box_type, offset, size in before:
+        layout.append((offset, size, position))
+        position += size
+    position = moov_new_offset
+    for box_type, offset, size in after:
+        layout.append((offset, size, position))
+        position += size
+    layout.sort()
+
+    moov = data[moov_box[1]:moov_box[1] + moov_box[2]]
+    new_moov = build_faststart_moov(moov, moov_new_offset, layout)
+    return ([(offset, size) for _, offset, size in before] + [new_moov]
+            + [(offset, size) for _, offset, size in after])
+
+
+def faststart(src_path, dst_path) -> bool:
+    """
+    Write a faststart copy of src_path to dst_path.
+
+    Returns False (and writes nothing) when the file is already faststart
+    or has no moov/mdat to reorder.
+    """
+    with open(src_path, 'rb') as src:
+        if os.fstat(src.fileno()).st_size == 0:
+            return False
+        with mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            boxes = read_top_level_boxes(data)
+            if not needs_faststart(boxes):
+                return False
+            plan = faststart_plan(data, boxes)
+            with open(dst_path, 'wb') as dst:
+                for piece in plan:
+                    if isinstance(piece, bytes):
+                        dst.write(piece)
+                    else:
+                        _copy_range(data, dst, *piece)
+    return True
+
+
+def _copy_range(data, dst, offset: int, size: int):
+    """Stream a byte range out of the mmap without materializing it"""
+    end = offset + size
+    while offset < end:
+        chunk_end = min(offset + COPY_CHUNK_SIZE, end)
+        dst.write(data[offset:chunk_end])
+        offset = chunk_end
+
+
+def prepare_for_upload(file_path, mime_type: str) -> Tuple[str, Optional[str]]:
+    """
+    Return (path_to_upload, temp_path_to_cleanup) for a media file.
+
+    MP4/M4A files with a trailing moov are rewritten into a temp file;
+    anything else (or anything that fails to parse) is uploaded as-is.
+    """
+    if mime_type not in FASTSTART_MIME_TYPES:
+        return str(file_path), None
+
+    suffix = Path(file_path).suffix
+    fd, temp_path = tempfile.mkstemp(suffix=suffix, prefix='faststart_')
+    os.close(fd)
+    try:
+        if faststart(file_path, temp_path):
+            print(f"  ⚡ Moved moov atom to front of {Path(file_path).name}")
+            return temp_path, temp_path
+    except (FaststartError, OSError, struct.error) as e:
+        print(f"  ⚠️  Faststart skipped for {Path(file_path).name}: {e}")
+    os.remove(temp_path)
+    return str(file_path), None
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python mp4_faststart.py <input.mp4> [output.mp4]")
+        print("\nWithout an output path the input file is rewritten in place.")
+        sys.exit(1)
+
+    src = sys.argv[1]
+    dst = sys.argv[2] if len(sys.argv) > 2 else src + '.faststart'
+    try:
+        changed = faststart(src, dst)
+    except FaststartError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    if not changed:
+        print(f"⏭️  {src} is already faststart (or has no moov/mdat)")
+    elif len(sys.argv) > 2:
+        print(f"✅ Wrote faststart copy: {dst}")
+    else:
+        os.replace(dst, src)
+        print(f"✅ Rewrote {src} in place")
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Report how many bytes a learner downloads per page and enforce size budgets.
+Resolves every embedded audio/video file and image referenced by each page,
+using local files when they are available (content/audio, content/videos and the
+infographics output tree) and a cached remote Content-Length otherwise.
+HLS master playlists are resolved through the hls_package index and weighed as
+the playlist plus their heaviest rendition, read from the local package.
+"""
+
+import csv
+import json
+import re
+import sys
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import unquote, urlparse
+
+from hls_package import HLS_CACHE_DIR, load_index, package_for_url
+
+# Configuration
+SCRIPT_DIR = Path(__file__).parent
+GITBOOK_DIR = SCRIPT_DIR.parent
+CONTENT_DIR = GITBOOK_DIR / "content"
+AUDIO_DIR = CONTENT_DIR / "audio"
+VIDEO_DIR = CONTENT_DIR / "videos"
+IMAGES_SOURCE = GITBOOK_DIR.parent.parent.parent / "assets" / "infographics" / "output" / "money-markets"
+MEDIA_BUCKET = "money-markets-media"
+IMAGES_BUCKET = "money-markets-gitbook-images"
+CACHE_DIR = GITBOOK_DIR / ".cache"
+
+# Where each bucket's objects come from locally (overridable per book, see workspace.py)
+DEFAULT_LAYOUT = {
+    'media_bucket': MEDIA_BUCKET,
+    'images_bucket': IMAGES_BUCKET,
+    'audio_dir': AUDIO_DIR,
+    'video_dir': VIDEO_DIR,
+    'images_source': IMAGES_SOURCE,
+}
+SIZE_CACHE_PATH = CACHE_DIR / "remote_sizes.json"
+
+MB = 1024 * 1024
+
+# Default budgets in bytes; 'page' applies to the sum of all assets on a page
+DEFAULT_BUDGETS = {
+    'page': 150 * MB,
+    'audio': 40 * MB,
+    'video': 100 * MB,
+    'image': 1 * MB,
+    'other': 5 * MB,
+}
+
+EMBED_PATTERN = re.compile(r'\{%\s*embed\s+url="([^"]+)"\s*%\}')
+IMAGE_PATTERN = re.compile(r'!\[[^\]]*\]\(\s*<?([^)\s>]+)>?(?:\s+"[^"]*")?\s*\)')
+AUDIO_EXTENSIONS = ('.m4a', '.mp3', '.aac', '.ogg', '.wav')
+VIDEO_EXTENSIONS = ('.mp4', '.webm', '.mov', '.m3u8')
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.svg', '.webp')
+ASSET_TYPES = ('audio', 'video', 'image', 'other')
+
+
+def asset_type(url: str) -> str:
+    """Classify an asset URL by extension"""
+    path = urlparse(url).path.lower()
+    if path.endswith(AUDIO_EXTENSIONS):
+        return 'audio'
+    if path.endswith(VIDEO_EXTENSIONS):
+        return 'video'
+    if path.endswith(IMAGE_EXTENSIONS):
+        return 'image'
+    return 'other'
+
+
+def extract_assets(content: str) -> List[str]:
+    """All embed and image URLs on a page, in order, without duplicates"""
+    urls = EMBED_PATTERN.findall(content) + IMAGE_PATTERN.findall(content)
+    return list(dict.fromkeys(urls))
+
+
+def local_path_for_url(url: str, page_path: Optional[Path] = None, layout: Optional[Dict] = None) -> Optional[Path]:
+    """
+    Map a GCS URL (or relative image path) to the local file it was uploaded from.
+
+    money-markets-media/lesson-XX/audio/<file> -> content/audio/<file>
+    money-markets-media/lesson-XX/video/<file> -> content/videos/<file>
+    money-markets-gitbook-images/<key>         -> infographics output/<key>
+    """
+    parsed = urlparse(url)
+    if not parsed.scheme:
+        if page_path is None:
+            return None
+        return (page_path.parent / unquote(parsed.path)).resolve()
+
+    if parsed.netloc != 'storage.googleapis.com':
+        return None
+    parts = unquote(parsed.path).lstrip('/').split('/', 1)
+    if len(parts) != 2:
+        return None
+    bucket, key = parts
+    layout = layout or DEFAULT_LAYOUT
+
+    if bucket == layout['media_bucket']:
+        key_parts = key.split('/')
+        if len(key_parts) == 3 and key_parts[1] == 'audio':
+            return layout['audio_dir'] / key_parts[2]
+        if len(key_parts) == 3 and key_parts[1] == 'video':
+            return layout['video_dir'] / key_parts[2]
+    elif bucket == layout['images_bucket'] and layout['images_source']:
+        return layout['images_source'] / key
+    return None
+
+
+def hls_package_size(package_dir: Path, renditions: List[Dict]) -> Optional[int]:
+    """Bytes a player fetches for a local HLS package: master playlist plus its heaviest rendition"""
+    master = package_dir / 'master.m3u8'
+    if not master.is_file():
+        return None
+    rendition_sizes = [
+        sum(path.stat().st_size for path in (package_dir / rendition['name']).iterdir() if path.is_file())
+        for rendition in renditions if (package_dir / rendition['name']).is_dir()
+    ]
+    if not rendition_sizes:
+        return None
+    return master.stat().st_size + max(rendition_sizes)
+
+
+def fetch_remote_size(url: str, timeout: float = 15.0) -> Optional[int]:
+    """Content-Length from a HEAD request (None if unavailable)"""
+    try:
+        request = urllib.request.Request(url, method='HEAD')
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            length = response.headers.get('Content-Length')
+            return int(length) if length is not None else None
+    except Exception:
+        return None
+
+
+class PageWeightAnalyzer:
+    """Resolves asset sizes per page and checks them against budgets"""
+
+    def __init__(self, content_dir: Optional[Path] = None, budgets: Optional[Dict[str, int]] = None,
+                 offline: bool = False, refresh: bool = False, layout: Optional[Dict] = None,
+                 size_cache: Optional[Dict[str, int]] = None, hls_index: Optional[Dict[str, Dict]] = None,
+                 hls_packages_dir: Optional[Path] = None):
+        self.content_dir = Path(content_dir) if content_dir else CONTENT_DIR
+        self.hls_index = hls_index if hls_index is not None else load_index()
+        self.hls_packages_dir = Path(hls_packages_dir) if hls_packages_dir else HLS_CACHE_DIR / "packages"
+        self.budgets = {**DEFAULT_BUDGETS, **(budgets or {})}
+        self.offline = offline
+        self.layout = {**DEFAULT_LAYOUT, **(layout or {})}
+        # A size cache passed in is shared with other analyzers and saved by its owner
+        self.owns_size_cache = size_cache is None
+        if size_cache is not None:
+            self.size_cache = size_cache
+        else:
+            self.size_cache = {} if refresh else self._load_size_cache()
+
+    def _load_size_cache(self) -> Dict[str, int]:
+        if SIZE_CACHE_PATH.exists():
+            try:
+                with open(SIZE_CACHE_PATH, 'r') as f:
+                    return json.load(f)
+            except (OSError, json.JSONDecodeError):
+                return {}
+        return {}
+
+    def _save_size_cache(self):
+        SIZE_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        with open(SIZE_CACHE_PATH, 'w') as f:
+            json.dump(self.size_cache, f, indent=2, sort_keys=True)
+
+    def resolve_sizes(self, assets: List[Dict], workers: int = 16):
+        """Fill in 'bytes' and 'source' for each asset (local file, cache, or HEAD)"""
+        remote = []
+        for asset in assets:
+            if urlparse(asset['url']).path.endswith('.m3u8'):
+                # HEAD on a playlist only measures the playlist, so HLS is never looked up remotely
+                source = package_for_url(self.hls_index, asset['url'])
+                size = None
+                if source is not None:
+                    _, entry = source
+                    size = hls_package_size(self.hls_packages_dir / entry['key'], entry.get('renditions', []))
+                asset['bytes'] = size
+                asset['source'] = 'local' if size is not None else 'unknown'
+                continue
+            local = local_path_for_url(asset['url'], asset['page_path'], self.layout)
+            if local is not None and local.is_file():
+                asset['bytes'] = local.stat().st_size
+                asset['source'] = 'local'
+            elif asset['url'] in self.size_cache:
+                asset['bytes'] = self.size_cache[asset['url']]
+                asset['source'] = 'cache'
+            else:
+                remote.append(asset)
+
+        urls = sorted({asset['url'] for asset in remote if urlparse(asset['url']).scheme in ('http', 'https')})
+        if urls and not self.offline:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                for url, size in zip(urls, executor.map(fetch_remote_size, urls)):
+                    if size is not None:
+                        self.size_cache[url] = size
+            if self.owns_size_cache:
+                self._save_size_cache()
+
+        for asset in remote:
+            size = self.size_cache.get(asset['url'])
+            asset['bytes'] = size
+            asset['source'] = 'remote' if size is not None else 'unknown'
+
+    def analyze(self) -> List[Dict]:
+        """One report row per page with byte totals by type and budget violations"""
+        pages = []
+        assets = []
+        for page_path in sorted(self.content_dir.rglob('*.md')):
+            content = page_path.read_text(encoding='utf-8')
+            page_assets = [
+                {'url': url, 'type': asset_type(url), 'page_path': page_path}
+                for url in extract_assets(content)
+            ]
+            assets.extend(page_assets)
+            pages.append({'page': page_path.relative_to(self.content_dir).as_posix(), 'assets': page_assets})
+
+        self.resolve_sizes(assets)
+
+        for page in pages:
+            totals = {asset_kind: 0 for asset_kind in ASSET_TYPES}
+            violations = []
+            unknown = 0
+            for asset in page['assets']:
+                if asset['bytes'] is None:
+                    unknown += 1
+                    continue
+                totals[asset['type']] += asset['bytes']
+                if asset['bytes'] > self.budgets[asset['type']]:
+                    violations.append(
+                        f"{asset['type']} {Path(unquote(urlparse(asset['url']).path)).name} "
+                        f"{format_bytes(asset['bytes'])} > {format_bytes(self.budgets[asset['type']])}"
+                    )
+            page['totals'] = totals
+            page['total'] = sum(totals.values())
+            page['unknown'] = unknown
+            if page['total'] > self.budgets['page']:
+                violations.insert(0, f"page {format_bytes(page['total'])} > {format_bytes(self.budgets['page'])}")
+            page['violations'] = violations
+        return pages
+
+
+def format_bytes(size: Optional[float]) -> str:
+    if size is None:
+        return '?'
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def print_table(pages: List[Dict]):
+    print(f"{'Page':<62} {'Total':>10} {'Audio':>10} {'Video':>10} {'Images':>10} {'Other':>9}")
+    print("-" * 116)
+    for page in pages:
+        totals = page['totals']
+        flag = '❌' if page['violations'] else '  '
+        print(f"{flag}{page['page'][:60]:<60} {format_bytes(page['total']):>10} {format_bytes(totals['audio']):>10} "
+              f"{format_bytes(totals['video']):>10} {format_bytes(totals['image']):>10} {format_bytes(totals['other']):>9}")
+        for violation in page['violations']:
+            print(f"      ⚠️  {violation}")
+        if page['unknown']:
+            print(f"      ❔ {page['unknown']} asset(s) with unknown size")
+
+
+def main():
+    import argparse
+
+    sort_keys = {
+        'total': lambda page: page['total'],
+        'audio': lambda page: page['totals']['audio'],
+        'video': lambda page: page['totals']['video'],
+        'images': lambda page: page['totals']['image'],
+        'page': lambda page: page['page'],
+    }
+
+    parser = argparse.ArgumentParser(description='Analyze per-page download weight and enforce budgets')
+    parser.add_argument('--sort', choices=sorted(sort_keys), default='total', help='Sort column (default: total)')
+    parser.add_argument('--reverse', action='store_true', help='Reverse the sort (sizes sort heaviest first by default)')
+    parser.add_argument('--format', choices=['table', 'csv', 'json'], default='table', help='Output format')
+    parser.add_argument('--offline', action='store_true', help='Do not issue HEAD requests for uncached assets')
+    parser.add_argument('--refresh', action='store_true', help='Ignore cached remote sizes')
+    for budget, default in DEFAULT_BUDGETS.items():
+        parser.add_argument(f'--{budget}-budget', type=float, default=default / MB,
+                            help=f'{budget} budget in MB (default: {default / MB:g})')
+    args = parser.parse_args()
+
+    budgets = {budget: int(getattr(args, f'{budget}_budget') * MB) for budget in DEFAULT_BUDGETS}
+    analyzer = PageWeightAnalyzer(budgets=budgets, offline=args.offline, refresh=args.refresh)
+    pages = analyzer.analyze()
+    descending = args.sort != 'page'
+    pages.sort(key=sort_keys[args.sort], reverse=descending != args.reverse)
+
+    if args.format == 'json':
+        print(json.dumps([
+            {key: page[key] for key in ('page', 'total', 'totals', 'unknown', 'violations')} for page in pages
+        ], indent=2))
+    elif args.format == 'csv':
+        writer = csv.writer(sys.stdout)
+        writer.writerow(['page', 'total_bytes', 'audio_bytes', 'video_bytes', 'image_bytes', 'other_bytes',
+                         'unknown_assets', 'violations'])
+        for page in pages:
+            totals = page['totals']
+            writer.writerow([page['page'], page['total'], totals['audio'], totals['video'], totals['image'],
+                             totals['other'], page['unknown'], '; '.join(page['violations'])])
+    else:
+        print("=" * 60)
+        print("Page Weight Report")
+        print("=" * 60)
+        print()
+        print_table(pages)
+        print()
+        over_budget = sum(1 for page in pages if page['violations'])
+        print(f"❌ Pages over budget: {over_budget}" if over_budget else "✅ All pages within budget")
+        print()
+
+    return 1 if any(page['violations'] for page in pages) else 0
+
+
+if __name__ == "__main__":
+    exit(main())
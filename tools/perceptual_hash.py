@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+"""
+Perceptual hashes (pHash + dHash) for the generated infographics.
+
+Regenerated charts often differ from the previous run by a few pixels
+(antialiasing, font hinting, a new matplotlib), so their bytes and SHA-256
+change while the picture does not. Every PNG under the money-markets output
+tree gets a 64-bit pHash (low-frequency DCT signs) and dHash (horizontal
+gradient signs); two images whose hashes are both within a small Hamming
+distance look the same.
+
+Hashes are cached in .cache/phash.json, keyed by path relative to the images
+folder and reused while size and mtime are unchanged. The cache also records
+the hashes of what was last uploaded per bucket object, so
+upload_images_to_gcs.py and integrate_gitbook_images.py (--skip-unchanged)
+can treat a regeneration with no visible change as unchanged.
+
+Hashes alone are too coarse for that: the infographics are mostly text, and
+a label edited from "75%" to "60%" moves them by a bit or two (a redrawn
+curve by none). So an image only counts as unchanged when both hashes match
+exactly and a 512-pixel-wide grayscale thumbnail differs from the uploaded
+version's by at most PIXEL_TOLERANCE anywhere. Thumbnails are kept per
+SHA-256 next to the cache (.cache/phash_thumbs/).
+
+Lookups use multi-index hashing: each hash is split into distance + 1
+segments, and any two hashes within `distance` bits must agree exactly on at
+least one segment, so candidates come from exact segment buckets instead of
+comparing every pair.
+
+Usage:
+    python perceptual_hash.py                  # report near-duplicates
+    python perceptual_hash.py --distance 8     # looser match
+    python perceptual_hash.py --changed        # images that differ visually from the last upload
+"""
+
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# Configuration
+SCRIPT_DIR = Path(__file__).parent
+GITBOOK_DIR = SCRIPT_DIR.parent
+IMAGES_DIR = GITBOOK_DIR.parent.parent.parent / "assets" / "infographics" / "output" / "money-markets"
+CACHE_PATH = GITBOOK_DIR / ".cache" / "phash.json"
+DEFAULT_BUCKET = os.getenv('GCS_BUCKET_NAME', 'money-markets-gitbook-images')
+
+HASH_BITS = 64
+# Both hashes within this many bits: reported as near-duplicates
+DUPLICATE_DISTANCE = 6
+# Unchanged: identical hashes and no thumbnail pixel off by more than this (0-255). A one-glyph
+# edit at 8pt moves some pixel by 36+; re-rendering noise by a few levels
+PIXEL_TOLERANCE = 8
+THUMBNAIL_WIDTH = 512
+
+_DCT_SIZE = 32
+_DCT_KEEP = 8
+
+
+def _dct_matrix(size: int) -> np.ndarray:
+    """Orthonormal DCT-II basis, so a 2D transform is M @ X @ M.T"""
+    k = np.arange(size)[:, None]
+    n = np.arange(size)[None, :]
+    matrix = np.cos(np.pi * (2 * n + 1) * k / (2 * size)) * np.sqrt(2.0 / size)
+    matrix[0] /= np.sqrt(2.0)
+    return matrix
+
+
+_DCT = _dct_matrix(_DCT_SIZE)
+
+
+def _grayscale(image):
+    """Luminance with transparency flattened onto white, as the page shows it"""
+    from PIL import Image
+
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGBA', image.size, (255, 255, 255, 255))
+        image = Image.alpha_composite(background, image)
+    return image.convert('L')
+
+
+def _bits_to_int(bits: np.ndarray) -> int:
+    return int.from_bytes(np.packbits(bits.reshape(-1).astype(np.uint8)).tobytes(), 'big')
+
+
+def dhash(gray) -> int:
+    """Signs of horizontal gradients on a 9x8 thumbnail"""
+    from PIL import Image
+
+    pixels = np.asarray(gray.resize((9, 8), Image.LANCZOS), dtype=float)
+    return _bits_to_int(pixels[:, 1:] > pixels[:, :-1])
+
+
+def phash(gray) -> int:
+    """Signs of the 8x8 lowest DCT frequencies of a 32x32 thumbnail, relative to their median"""
+    from PIL import Image
+
+    pixels = np.asarray(gray.resize((_DCT_SIZE, _DCT_SIZE), Image.LANCZOS), dtype=float)
+    low = (_DCT @ pixels @ _DCT.T)[:_DCT_KEEP, :_DCT_KEEP]
+    return _bits_to_int(low > np.median(low))
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+def hash_file(path: Path) -> Dict:
+    """Size, mtime, SHA-256 and perceptual hashes of one image"""
+    from PIL import Image
+
+    stat = path.stat()
+    data = path.read_bytes()
+    with Image.open(path) as image:
+        gray = _grayscale(image)
+    return {
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha256': hashlib.sha256(data).hexdigest(),
+        'phash': f"{phash(gray):016x}",
+        'dhash': f"{dhash(gray):016x}",
+    }
+
+
+def thumbnail(path: Path):
+    """Grayscale THUMBNAIL_WIDTH-wide box-filtered copy, for pixel-level comparison"""
+    from PIL import Image
+
+    with Image.open(path) as image:
+        gray = _grayscale(image)
+    height = max(1, round(gray.height * THUMBNAIL_WIDTH / gray.width))
+    return gray.resize((THUMBNAIL_WIDTH, height), Image.BOX)
+
+
+def distance(a: Dict, b: Dict) -> int:
+    """Larger of the pHash and dHash distances between two records"""
+    return max(hamming(int(a['phash'], 16), int(b['phash'], 16)),
+               hamming(int(a['dhash'], 16), int(b['dhash'], 16)))
+
+
+class HashIndex:
+    """Multi-index hashing: exact buckets per segment, exhaustive for distances up to max_distance"""
+
+    def __init__(self, max_distance: int = DUPLICATE_DISTANCE):
+        if not 0 <= max_distance < HASH_BITS:
+            raise ValueError(f"max_distance must be in [0, {HASH_BITS})")
+        self.max_distance = max_distance
+        bounds = np.linspace(0, HASH_BITS, max_distance + 2).astype(int)
+        self.segments = [(int(low), (1 << int(high - low)) - 1) for low, high in zip(bounds[:-1], bounds[1:])]
+        self.buckets: List[Dict[int, List[str]]] = [{} for _ in self.segments]
+        self.values: Dict[str, int] = {}
+
+    def _keys(self, value: int):
+        return [(value >> shift) & mask for shift, mask in self.segments]
+
+    def add(self, key: str, value: int):
+        self.values[key] = value
+        for buckets, segment in zip(self.buckets, self._keys(value)):
+            buckets.setdefault(segment, []).append(key)
+
+    def query(self, value: int, max_distance: Optional[int] = None) -> List[Tuple[str, int]]:
+        """Keys within max_distance bits of value, nearest first"""
+        max_distance = self.max_distance if max_distance is None else min(max_distance, self.max_distance)
+        candidates = set()
+        for buckets, segment in zip(self.buckets, self._keys(value)):
+            candidates.update(buckets.get(segment, ()))
+        matches = [(key, hamming(value, self.values[key])) for key in candidates]
+        return sorted((match for match in matches if match[1] <= max_distance), key=lambda match: (match[1], match[0]))
+
+
+class PerceptualCache:
+    """Hash records of the images tree plus the hashes last uploaded per bucket object"""
+
+    def __init__(self, images_dir: Optional[Path] = None, cache_path: Optional[Path] = None):
+        self.images_dir = Path(images_dir) if images_dir else IMAGES_DIR
+        self.cache_path = Path(cache_path) if cache_path else CACHE_PATH
+        self.thumbnails_dir = self.cache_path.parent / f"{self.cache_path.stem}_thumbs"
+        self.images: Dict[str, Dict] = {}
+        self.uploaded: Dict[str, Dict[str, Dict]] = {}
+        if self.cache_path.exists():
+            try:
+                with open(self.cache_path, 'r') as f:
+                    data = json.load(f)
+                self.images = data.get('images', {})
+                self.uploaded = data.get('uploaded', {})
+            except (OSError, json.JSONDecodeError):
+                pass
+
+    def save(self):
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.cache_path.with_suffix('.json.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump({'images': self.images, 'uploaded': self.uploaded}, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.cache_path)
+        # Thumbnails are only needed for current images and uploaded versions
+        if self.thumbnails_dir.exists():
+            wanted = {record['sha256'] for record in self.images.values()}
+            wanted.update(record['sha256'] for objects in self.uploaded.values() for record in objects.values())
+            for path in self.thumbnails_dir.glob('*.png'):
+                if path.stem not in wanted:
+                    path.unlink()
+
+    def thumbnail_path(self, sha256: str) -> Path:
+        return self.thumbnails_dir / f"{sha256}.png"
+
+    def record(self, path: Path) -> Dict:
+        """Cached hashes of an image, recomputed when its size or mtime changed"""
+        key = Path(path).relative_to(self.images_dir).as_posix()
+        stat = path.stat()
+        cached = self.images.get(key)
+        if cached and cached['size'] == stat.st_size and cached['mtime_ns'] == stat.st_mtime_ns:
+            record = cached
+        else:
+            record = self.images[key] = hash_file(path)
+        thumbnail_path = self.thumbnail_path(record['sha256'])
+        if not thumbnail_path.exists():
+            self.thumbnails_dir.mkdir(parents=True, exist_ok=True)
+            thumbnail(path).save(thumbnail_path, format='PNG')
+        return record
+
+    def scan(self, paths: Optional[Iterable[Path]] = None, workers: Optional[int] = None) -> Dict[str, Dict]:
+        """Hash every PNG (or the given paths) in parallel; drops records of deleted images"""
+        if paths is None:
+            paths = sorted(self.images_dir.rglob('*.png'))
+            present = {path.relative_to(self.images_dir).as_posix() for path in paths}
+            for key in set(self.images) - present:
+                del self.images[key]
+        paths = list(paths)
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            records = list(pool.map(self.record, paths))
+        return {path.relative_to(self.images_dir).as_posix(): record for path, record in zip(paths, records)}
+
+    def last_upload(self, bucket: str, object_key: str) -> Optional[Dict]:
+        return self.uploaded.get(bucket, {}).get(object_key)
+
+    def mark_uploaded(self, bucket: str, object_key: str, record: Dict):
+        self.uploaded.setdefault(bucket, {})[object_key] = {name: record[name] for name in ('sha256', 'phash', 'dhash')}
+
+    def unchanged(self, bucket: str, object_key: str, record: Dict) -> bool:
+        """
+        True when the object last uploaded under object_key is byte-identical
+        to record, or has the same hashes and a thumbnail within PIXEL_TOLERANCE
+        """
+        previous = self.last_upload(bucket, object_key)
+        if previous is None:
+            return False
+        if previous['sha256'] == record['sha256']:
+            return True
+        if distance(previous, record) != 0:
+            return False
+        return self.pixel_difference(previous['sha256'], record['sha256']) <= PIXEL_TOLERANCE
+
+    def pixel_difference(self, sha256_a: str, sha256_b: str) -> int:
+        """Largest thumbnail pixel difference (0-255); 255 when a thumbnail is missing or sizes differ"""
+        from PIL import Image
+
+        try:
+            with Image.open(self.thumbnail_path(sha256_a)) as a, Image.open(self.thumbnail_path(sha256_b)) as b:
+                if a.size != b.size:
+                    return 255
+                return int(np.abs(np.asarray(a, dtype=np.int16) - np.asarray(b, dtype=np.int16)).max())
+        except OSError:
+            return 255
+
+    def near_duplicates(self, records: Dict[str, Dict], max_distance: int = DUPLICATE_DISTANCE) -> List[List[Tuple[str, int]]]:
+        """
+        Groups of visually near-identical images, as (path, distance to the
+        group's first path); pairs are joined when both hashes are within
+        max_distance.
+        """
+        index = HashIndex(max_distance)
+        parent: Dict[str, str] = {}
+
+        def find(key: str) -> str:
+            while parent[key] != key:
+                parent[key] = parent[parent[key]]
+                key = parent[key]
+            return key
+
+        for key in sorted(records):
+            parent[key] = key
+            value = int(records[key]['phash'], 16)
+            for other, _ in index.query(value):
+                if distance(records[key], records[other]) <= max_distance:
+                    parent[find(key)] = find(other)
+            index.add(key, value)
+
+        groups: Dict[str, List[str]] = {}
+        for key in sorted(records):
+            groups.setdefault(find(key), []).append(key)
+        return [[(key, distance(records[key], records[members[0]])) for key in members]
+                for members in groups.values() if len(members) > 1]
+
+
+def section_of(key: str) -> str:
+    """'lessons/lesson_02' for 'lessons/lesson_02/mm02_01_x.png'"""
+    return '/'.join(key.split('/')[:2])
+
+
+def pop_skip_unchanged_argument(argv: List[str]) -> bool:
+    """Remove --skip-unchanged from argv (scripts without argparse); True when present"""
+    if '--skip-unchanged' in argv:
+        argv.remove('--skip-unchanged')
+        return True
+    return False
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Perceptual hashes and near-duplicate report for the infographics')
+    parser.add_argument('--images', help=f'Images folder (default: {IMAGES_DIR})')
+    parser.add_argument('--distance', type=int, default=DUPLICATE_DISTANCE,
+                        help=f'Max pHash/dHash distance for near-duplicates (default: {DUPLICATE_DISTANCE})')
+    parser.add_argument('--changed', action='store_true',
+                        help='List images that differ visually from the last upload instead')
+    parser.add_argument('--bucket', default=DEFAULT_BUCKET, help=f'Bucket for --changed (default: {DEFAULT_BUCKET})')
+    parser.add_argument('--workers', type=int, help='Hashing threads (default: CPU count)')
+    args = parser.parse_args()
+
+    cache = PerceptualCache(images_dir=args.images)
+    if not cache.images_dir.exists():
+        print(f"❌ Images directory not found: {cache.images_dir}")
+        return 1
+
+    print("=" * 60)
+    print("Perceptual Hashes")
+    print("=" * 60)
+    try:
+        records = cache.scan(workers=args.workers)
+    finally:
+        cache.save()
+    print(f"Hashed {len(records)} image(s) in {cache.images_dir}")
+    print()
+
+    if args.changed:
+        counts = {'unchanged': 0, 'changed': 0, 'new': 0}
+        for key, record in sorted(records.items()):
+            if cache.last_upload(args.bucket, key) is None:
+                counts['new'] += 1
+                print(f"  🆕 {key}")
+            elif cache.unchanged(args.bucket, key, record):
+                counts['unchanged'] += 1
+            else:
+                counts['changed'] += 1
+                previous = cache.last_upload(args.bucket, key)
+                print(f"  ✏️  {key} (distance {distance(previous, record)}, "
+                      f"pixels {cache.pixel_difference(previous['sha256'], record['sha256'])})")
+        print()
+        print(f"✅ Unchanged: {counts['unchanged']}  ✏️  Changed: {counts['changed']}  🆕 Never uploaded: {counts['new']}")
+        print()
+        return 0
+
+    groups = cache.near_duplicates(records, args.distance)
+    for members in groups:
+        sections = {section_of(key) for key, _ in members}
+        marker = '⚠️ ' if len(sections) > 1 else '  '
+        print(f"{marker} {len(members)} near-identical image(s) across {', '.join(sorted(sections))}:")
+        for key, bits in members:
+            print(f"     {key}" + (f" (distance {bits})" if bits else ""))
+    if groups:
+        print()
+    cross = sum(1 for members in groups if len({section_of(key) for key, _ in members}) > 1)
+    print(f"Near-duplicate groups: {len(groups)} ({cross} spanning lessons/exercises)")
+    print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+Render the GitBook content into a static HTML preview without pushing to GitBook.
+Follows the .gitbook.yaml root/structure and SUMMARY.md order, renders
+{% embed url=... %} blocks as audio/video/iframe elements, and rebuilds only
+pages whose source, navigation or neighbor titles changed.
+"""
+
+import hashlib
+import html
+import json
+import re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from check_links import gitbook_slug
+
+# Configuration
+SCRIPT_DIR = Path(__file__).parent
+GITBOOK_DIR = SCRIPT_DIR.parent
+OUTPUT_DIR = GITBOOK_DIR / "_preview"
+CACHE_DIR = GITBOOK_DIR / ".cache"
+CACHE_PATH = CACHE_DIR / "preview.json"
+
+# Bump when the page template or markdown handling changes
+RENDERER_VERSION = "1"
+
+EMBED_PATTERN = re.compile(r'\{%\s*embed\s+url="([^"]+)"\s*%\}')
+SUMMARY_ENTRY_PATTERN = re.compile(r'^(\s*)[*-]\s+\[([^\]]+)\]\(([^)]+)\)')
+SUMMARY_SECTION_PATTERN = re.compile(r'^##\s+(.+)$')
+MD_LINK_PATTERN = re.compile(r'(\]\()([^)#\s]+)\.md((?:#[^)]*)?\))')
+AUDIO_EXTENSIONS = ('.m4a', '.mp3', '.aac', '.ogg', '.wav')
+VIDEO_EXTENSIONS = ('.mp4', '.webm', '.mov', '.m3u8')
+
+STYLESHEET = """
+body { margin: 0; font-family: -apple-system, 'Segoe UI', Roboto, sans-serif; color: #1f2328; display: flex; }
+nav { width: 300px; min-height: 100vh; padding: 24px 16px; background: #f6f8fa; border-right: 1px solid #d0d7de; box-sizing: border-box; font-size: 14px; }
+nav h2 { font-size: 12px; text-transform: uppercase; color: #57606a; margin: 20px 0 6px; }
+nav a { display: block; padding: 4px 8px; color: #1f2328; text-decoration: none; border-radius: 6px; }
+nav a.current { background: #ddf4ff; font-weight: 600; }
+nav .depth-1 { padding-left: 24px; }
+main { flex: 1; max-width: 860px; padding: 32px 48px; }
+main img, main video, main iframe { max-width: 100%; }
+main iframe { width: 100%; height: 480px; border: 1px solid #d0d7de; }
+main table { border-collapse: collapse; }
+main td, main th { border: 1px solid #d0d7de; padding: 6px 12px; }
+main pre { background: #f6f8fa; padding: 12px; overflow-x: auto; }
+.pager { display: flex; justify-content: space-between; margin-top: 48px; border-top: 1px solid #d0d7de; padding-top: 16px; }
+"""
+
+
+def read_gitbook_config(config_path: Path) -> Dict[str, str]:
+    """Read root, readme, summary and metadata title from .gitbook.yaml (scalar keys only)"""
+    config = {'root': '.', 'readme': 'README.md', 'summary': 'SUMMARY.md', 'title': 'Preview'}
+    if not config_path.exists():
+        return config
+    for line in config_path.read_text(encoding='utf-8').split('\n'):
+        match = re.match(r'^\s*(root|readme|summary|title):\s*(.+?)\s*$', line)
+        if match:
+            config[match.group(1)] = match.group(2).strip('\'"')
+    return config
+
+
+def parse_summary(summary_text: str) -> List[Dict]:
+    """Parse SUMMARY.md into an ordered list of nav entries"""
+    entries = []
+    section = None
+    for line in summary_text.split('\n'):
+        section_match = SUMMARY_SECTION_PATTERN.match(line)
+        if section_match:
+            section = section_match.group(1).strip()
+            continue
+        entry_match = SUMMARY_ENTRY_PATTERN.match(line)
+        if entry_match:
+            indent, title, path = entry_match.groups()
+            entries.append({
+                'title': title,
+                'path': path.split('#', 1)[0],
+                'depth': len(indent.replace('\t', '  ')) // 2,
+                'section': section,
+            })
+    return entries
+
+
+def page_title(text: str, fallback: str) -> str:
+    """First level-1 heading of a page"""
+    match = re.search(r'^#\s+(.+)$', text, re.MULTILINE)
+    return match.group(1).strip() if match else fallback
+
+
+def html_path(md_path: str) -> str:
+    """content-relative .md path -> output .html path"""
+    if md_path.endswith('README.md') and md_path.count('/') == 0:
+        return 'index.html'
+    return md_path[:-3] + '.html'
+
+
+def render_embed(url: str) -> str:
+    """HTML element for a GitBook embed block"""
+    escaped = html.escape(url, quote=True)
+    path = url.split('?', 1)[0].lower()
+    if path.endswith(AUDIO_EXTENSIONS):
+        return f'<audio controls preload="metadata" src="{escaped}"></audio>'
+    if path.endswith(VIDEO_EXTENSIONS):
+        return f'<video controls preload="metadata" src="{escaped}"></video>'
+    return f'<iframe src="{escaped}" loading="lazy"></iframe>'
+
+
+def relative_href(from_page: str, to_page: str) -> str:
+    """Relative link between two output pages"""
+    depth = from_page.count('/')
+    return '../' * depth + to_page
+
+
+def rewrite_md_link(match) -> str:
+    """Point a relative .md link at the rendered .html page (the root README is index.html)"""
+    target = match.group(2)
+    if target.endswith('README') and '/' not in target.lstrip('./'):
+        target = target[:-len('README')] + 'index'
+    return match.group(1) + target + '.html' + match.group(3)
+
+
+def render_page(job: Dict) -> str:
+    """Render one page to HTML (worker process entry point)"""
+    import markdown
+
+    source = job['source']
+    # Embeds are block-level: replace them before markdown sees the Liquid syntax
+    source = EMBED_PATTERN.sub(lambda match: '\n' + render_embed(match.group(1)) + '\n', source)
+    source = MD_LINK_PATTERN.sub(rewrite_md_link, source)
+
+    body = markdown.markdown(
+        source,
+        extensions=['tables', 'fenced_code', 'sane_lists', 'toc'],
+        extension_configs={'toc': {'slugify': lambda value, separator: gitbook_slug(value)}},
+    )
+
+    nav_items = []
+    section = None
+    for entry in job['nav']:
+        if entry['section'] != section:
+            section = entry['section']
+            if section:
+                nav_items.append(f"<h2>{html.escape(section)}</h2>")
+        css = f"depth-{min(entry['depth'], 1)}"
+        if entry['output'] == job['output']:
+            css += ' current'
+        href = relative_href(job['output'], entry['output'])
+        nav_items.append(f'<a class="{css}" href="{href}">{html.escape(entry["title"])}</a>')
+
+    pager = []
+    for label, neighbor in (('←', job['prev']), ('→', job['next'])):
+        if neighbor:
+            href = relative_href(job['output'], neighbor['output'])
+            text = f"{label} {neighbor['title']}" if label == '←' else f"{neighbor['title']} {label}"
+            pager.append(f'<a href="{href}">{html.escape(text)}</a>')
+        else:
+            pager.append('<span></span>')
+
+    stylesheet = relative_href(job['output'], 'style.css')
+    page = f"""<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>{html.escape(job['title'])} · {html.escape(job['book_title'])}</title>
+<link rel="stylesheet" href="{stylesheet}">
+</head>
+<body>
+<nav>
+{chr(10).join(nav_items)}
+</nav>
+<main>
+{body}
+<div class="pager">{''.join(pager)}</div>
+</main>
+</body>
+</html>
+"""
+    output_path = Path(job['output_dir']) / job['output']
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    output_path.write_text(page, encoding='utf-8')
+    return job['output']
+
+
+class BookPreview:
+    """Builds the static HTML preview with a dependency-tracked page cache"""
+
+    def __init__(self, gitbook_dir: Optional[Path] = None, output_dir: Optional[Path] = None,
+                 cache_path: Optional[Path] = None):
+        self.gitbook_dir = Path(gitbook_dir) if gitbook_dir else GITBOOK_DIR
+        self.output_dir = Path(output_dir) if output_dir else OUTPUT_DIR
+        self.cache_path = Path(cache_path) if cache_path else CACHE_PATH
+
+        self.config = read_gitbook_config(self.gitbook_dir / '.gitbook.yaml')
+        self.content_dir = (self.gitbook_dir / self.config['root']).resolve()
+        self.book_title = self.config['title']
+
+    def _load_cache(self) -> Dict[str, str]:
+        if self.cache_path.exists():
+            try:
+                with open(self.cache_path, 'r') as f:
+                    return json.load(f)
+            except (OSError, json.JSONDecodeError):
+                return {}
+        return {}
+
+    def _save_cache(self, cache: Dict[str, str]):
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.cache_path, 'w') as f:
+            json.dump(cache, f, indent=2, sort_keys=True)
+
+    def collect_pages(self) -> Tuple[List[Dict], str]:
+        """Readme plus SUMMARY.md entries in reading order, and the nav hash"""
+        summary_text = (self.content_dir / self.config['summary']).read_text(encoding='utf-8')
+        entries = [{'title': 'Introduction', 'path': self.config['readme'], 'depth': 0, 'section': None}]
+        for entry in parse_summary(summary_text):
+            if entry['path'] != self.config['readme']:
+                entries.append(entry)
+
+        pages = []
+        for entry in entries:
+            source_path = self.content_dir / entry['path']
+            if not source_path.exists():
+                print(f"  ⚠️  SUMMARY.md entry not found: {entry['path']}")
+                continue
+            source = source_path.read_text(encoding='utf-8')
+            pages.append({
+                **entry,
+                'output': html_path(entry['path']),
+                'source': source,
+                'source_hash': hashlib.sha256(source.encode('utf-8')).hexdigest(),
+                'page_title': page_title(source, entry['title']),
+            })
+
+        nav = [{key: page[key] for key in ('title', 'output', 'depth', 'section')} for page in pages]
+        nav_hash = hashlib.sha256(json.dumps(nav, sort_keys=True).encode('utf-8')).hexdigest()
+        return pages, nav_hash
+
+    def build(self, force: bool = False, workers: Optional[int] = None) -> Dict:
+        """Render stale pages in parallel; returns rendered and skipped page lists"""
+        pages, nav_hash = self.collect_pages()
+        nav = [{key: page[key] for key in ('title', 'output', 'depth', 'section')} for page in pages]
+        cache = {} if force else self._load_cache()
+
+        def neighbor(index: int) -> Optional[Dict]:
+            if 0 <= index < len(pages):
+                return {'output': pages[index]['output'], 'title': pages[index]['page_title']}
+            return None
+
+        jobs = []
+        new_cache = {}
+        for index, page in enumerate(pages):
+            job = {
+                'source': page['source'],
+                'output': page['output'],
+                'output_dir': str(self.output_dir),
+                'title': page['page_title'],
+                'book_title': self.book_title,
+                'nav': nav,
+                'prev': neighbor(index - 1),
+                'next': neighbor(index + 1),
+            }
+            # A page depends on its own source, the nav tree and its neighbors' titles
+            dependency_hash = hashlib.sha256(json.dumps({
+                'renderer_version': RENDERER_VERSION,
+                'source': page['source_hash'],
+                'nav': nav_hash,
+                'prev': job['prev'],
+                'next': job['next'],
+                'book_title': self.book_title,
+            }, sort_keys=True).encode('utf-8')).hexdigest()
+            new_cache[page['output']] = dependency_hash
+
+            if cache.get(page['output']) != dependency_hash or not (self.output_dir / page['output']).exists():
+                jobs.append(job)
+
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        (self.output_dir / 'style.css').write_text(STYLESHEET.lstrip(), encoding='utf-8')
+
+        # A process pool only pays off when more than a couple of pages changed
+        if len(jobs) > 2:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                rendered = list(executor.map(render_page, jobs))
+        else:
+            rendered = [render_page(job) for job in jobs]
+
+        self._save_cache(new_cache)
+        return {
+            'rendered': rendered,
+            'skipped': [page['output'] for page in pages if page['output'] not in rendered],
+        }
+
+
+def main():
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description='Render a local static HTML preview of the GitBook')
+    parser.add_argument('--output', help=f'Output directory (default: {OUTPUT_DIR})')
+    parser.add_argument('--force', action='store_true', help='Rebuild every page')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: CPU count)')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("Rendering Book Preview")
+    print("=" * 60)
+
+    start = time.perf_counter()
+    preview = BookPreview(output_dir=args.output)
+    results = preview.build(force=args.force, workers=args.workers)
+    elapsed = time.perf_counter() - start
+
+    for output in results['rendered']:
+        print(f"  ✅ {output}")
+    print()
+    print(f"✅ Rendered: {len(results['rendered'])}")
+    print(f"⏭️  Unchanged: {len(results['skipped'])}")
+    print(f"⏱️  {elapsed:.2f}s")
+    print(f"Open: {preview.output_dir / 'index.html'}")
+    print()
+
+
+if __name__ == "__main__":
+    main()
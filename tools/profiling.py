@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Opt-in profiling shared by the tools (--profile).
+When enabled, a run writes a cProfile .pstats file, a collapsed-stack file
+(flamegraph.pl / speedscope ready) from a stack sampler, and the timings of the
+named spans around each phase. When disabled, span() returns a shared no-op
+context manager and nothing else runs.
+"""
+
+import cProfile
+import json
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+SCRIPT_DIR = Path(__file__).parent
+GITBOOK_DIR = SCRIPT_DIR.parent
+PROFILE_DIR = GITBOOK_DIR / ".cache" / "profiles"
+
+SAMPLE_INTERVAL = 0.001
+
+_enabled = False
+_span_totals: Dict[str, List[float]] = defaultdict(list)
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _Span:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        _span_totals[self.name].append(time.perf_counter() - self.start)
+        return False
+
+
+def span(name: str):
+    """Time a named phase (spec load, inventory scan, upload, ...) when profiling is on"""
+    if not _enabled:
+        return _NOOP_SPAN
+    return _Span(name)
+
+
+class _StackSampler(threading.Thread):
+    """Samples the main thread's stack into collapsed 'a;b;c count' form"""
+
+    def __init__(self, target_thread_id: int, interval: float = SAMPLE_INTERVAL):
+        super().__init__(daemon=True)
+        self.target_thread_id = target_thread_id
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.target_thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def add_profile_argument(parser):
+    """Register --profile [PREFIX] on an argparse parser"""
+    parser.add_argument('--profile', nargs='?', const='', default=None, metavar='PREFIX',
+                        help=f'Write pstats, collapsed stacks and span timings (default prefix under {PROFILE_DIR})')
+
+
+def pop_profile_argument(argv: List[str]) -> Optional[str]:
+    """
+    Remove --profile or --profile=PREFIX from a raw argv list (for scripts without argparse).
+
+    Returns None when the flag is absent, '' for the default prefix.
+    """
+    for index, arg in enumerate(argv):
+        if arg == '--profile':
+            del argv[index]
+            return ''
+        if arg.startswith('--profile='):
+            del argv[index]
+            return arg.split('=', 1)[1]
+    return None
+
+
+def _output_prefix(prefix: str, name: str) -> Path:
+    if prefix:
+        path = Path(prefix)
+        if prefix.endswith('/') or path.is_dir():
+            return path / f"{name}-{time.strftime('%Y%m%d-%H%M%S')}"
+        return path
+    return PROFILE_DIR / f"{name}-{time.strftime('%Y%m%d-%H%M%S')}"
+
+
+@contextmanager
+def profiled(prefix: Optional[str], name: str):
+    """
+    Profile the enclosed block when prefix is not None.
+
+    Writes <prefix>.pstats, <prefix>.collapsed and <prefix>.spans.json.
+    """
+    global _enabled
+    if prefix is None:
+        yield
+        return
+
+    output = _output_prefix(prefix, name)
+    output.parent.mkdir(parents=True, exist_ok=True)
+
+    _span_totals.clear()
+    _enabled = True
+    sampler = _StackSampler(threading.get_ident())
+    profiler = cProfile.Profile()
+    sampler.start()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        sampler.stop()
+        _enabled = False
+
+        pstats_path = output.parent / (output.name + '.pstats')
+        collapsed_path = output.parent / (output.name + '.collapsed')
+        spans_path = output.parent / (output.name + '.spans.json')
+
+        profiler.dump_stats(str(pstats_path))
+        with open(collapsed_path, 'w', encoding='utf-8') as f:
+            for stack, count in sorted(sampler.samples.items()):
+                f.write(f"{stack} {count}\n")
+        spans = {
+            span_name: {'count': len(durations), 'total_s': sum(durations), 'max_s': max(durations)}
+            for span_name, durations in _span_totals.items()
+        }
+        with open(spans_path, 'w', encoding='utf-8') as f:
+            json.dump(spans, f, indent=2, sort_keys=True)
+
+        print()
+        print("=" * 60)
+        print("Profile")
+        print("=" * 60)
+        for span_name, stats in sorted(spans.items(), key=lambda item: -item[1]['total_s']):
+            print(f"  {span_name:<24} {stats['total_s'] * 1000:10.1f} ms  ({stats['count']} call(s))")
+        print(f"  pstats:    {pstats_path}")
+        print(f"  collapsed: {collapsed_path}")
+        print(f"  spans:     {spans_path}")
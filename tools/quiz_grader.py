@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+"""
+Compile quiz question banks into a compact answer-key file and grade learner
+submissions through a local asyncio HTTP service.
+
+Question banks are markdown pages using GitBook task lists, one block per question:
+
+    ### Question 1
+    What does a Health Factor below 1.0 mean?
+    - [ ] The position earns bonus yield
+    - [x] The position can be liquidated
+
+Options are lettered A, B, C, ... in order; several [x] options make a
+multi-answer question. Each correct-answer set is stored as a bitmask, so
+grading a question is one dict lookup and one integer comparison.
+
+Usage:
+    python quiz_grader.py compile [bank.md ...] [--output answer_keys.json]
+    python quiz_grader.py serve [--keys answer_keys.json] [--port 8765]
+"""
+
+import asyncio
+import hashlib
+import json
+import re
+import sys
+import time
+from collections import deque
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# Configuration
+SCRIPT_DIR = Path(__file__).parent
+GITBOOK_DIR = SCRIPT_DIR.parent
+QUIZZES_DIR = GITBOOK_DIR / "content" / "quizzes"
+KEYS_PATH = GITBOOK_DIR / ".cache" / "answer_keys.json"
+DEFAULT_PASS_RATIO = 0.70
+LATENCY_WINDOW = 10000
+
+QUESTION_HEADING = re.compile(r'^#{2,4}\s+Question\s+(\w+)', re.IGNORECASE)
+OPTION_PATTERN = re.compile(r'^\s*[-*]\s+\[([ xX])\]\s+(.+)$')
+PASSING_SCORE_PATTERN = re.compile(r'\*\*Passing Score\*\*:\s*(\d+)%')
+LETTERS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+
+# ---------------------------------------------------------------------------
+# Compiler
+# ---------------------------------------------------------------------------
+
+def parse_question_bank(text: str) -> Dict:
+    """Parse one quiz page into {'pass_ratio', 'questions': {id: {'answer', 'options'}}}"""
+    questions: Dict[str, Dict] = {}
+    current: Optional[str] = None
+
+    for line in text.split('\n'):
+        heading = QUESTION_HEADING.match(line)
+        if heading:
+            current = f"q{heading.group(1)}"
+            questions[current] = {'answer': 0, 'options': 0}
+            continue
+        if line.startswith('#'):
+            current = None
+            continue
+        option = OPTION_PATTERN.match(line)
+        if option and current:
+            entry = questions[current]
+            if option.group(1).lower() == 'x':
+                entry['answer'] |= 1 << entry['options']
+            entry['options'] += 1
+
+    passing = PASSING_SCORE_PATTERN.search(text)
+    return {
+        'pass_ratio': int(passing.group(1)) / 100 if passing else DEFAULT_PASS_RATIO,
+        # Questions without options or without a marked answer cannot be auto-graded
+        'questions': {qid: q for qid, q in questions.items() if q['options'] and q['answer']},
+    }
+
+
+def quiz_id_for(path: Path) -> str:
+    """quiz-module-01.md -> module-01"""
+    return re.sub(r'^quiz-', '', path.stem)
+
+
+def compile_answer_keys(paths: List[Path]) -> Dict:
+    """Compile question banks into the answer-key document"""
+    keys = {'version': 1, 'quizzes': {}}
+    for path in paths:
+        text = path.read_text(encoding='utf-8')
+        bank = parse_question_bank(text)
+        if not bank['questions']:
+            print(f"  ⏭️  {path.name}: no gradable questions")
+            continue
+        keys['quizzes'][quiz_id_for(path)] = {
+            'source_sha256': hashlib.sha256(text.encode('utf-8')).hexdigest(),
+            'pass_ratio': bank['pass_ratio'],
+            # Compact form: question id -> [answer bitmask, option count]
+            'answers': {qid: [q['answer'], q['options']] for qid, q in bank['questions'].items()},
+        }
+        print(f"  ✅ {path.name}: {len(bank['questions'])} question(s)")
+    return keys
+
+
+# ---------------------------------------------------------------------------
+# Grading
+# ---------------------------------------------------------------------------
+
+_LETTER_BITS = {letter: 1 << index for index, letter in enumerate(LETTERS)}
+
+
+def answer_mask(answer) -> int:
+    """
+    Submission answer ('B', ['A', 'C'], 1, [0, 2]) -> option bitmask.
+
+    Raises ValueError for option numbers outside 0-25 and for anything that
+    is not a string, an integer or a flat list of those.
+    """
+    if isinstance(answer, str):
+        mask = 0
+        for letter in answer.upper():
+            mask |= _LETTER_BITS.get(letter, 0)
+        return mask
+    if isinstance(answer, int) and not isinstance(answer, bool):
+        if not 0 <= answer < len(LETTERS):
+            raise ValueError(f"option number out of range: {answer}")
+        return 1 << answer
+    if isinstance(answer, list):
+        mask = 0
+        for item in answer:
+            if isinstance(item, list):
+                raise ValueError("nested answer lists are not allowed")
+            mask |= answer_mask(item)
+        return mask
+    raise ValueError(f"unsupported answer type: {type(answer).__name__}")
+
+
+class Grader:
+    """Holds compiled answer keys in memory and grades submissions against them"""
+
+    def __init__(self, keys: Dict):
+        self.quizzes = {}
+        for quiz_id, quiz in keys['quizzes'].items():
+            answers = {qid: mask for qid, (mask, _) in quiz['answers'].items()}
+            self.quizzes[quiz_id] = (answers, len(answers), quiz['pass_ratio'])
+
+    @classmethod
+    def from_file(cls, path: Path) -> 'Grader':
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def grade(self, quiz_id: str, answers: Dict) -> Dict:
+        """Grade one submission: O(1) per answered question (ValueError for malformed answers)"""
+        key, total, pass_ratio = self.quizzes[quiz_id]
+        correct = 0
+        for qid, answer in answers.items():
+            expected = key.get(qid)
+            if expected is not None and answer_mask(answer) == expected:
+                correct += 1
+        score = correct / total
+        return {'correct': correct, 'total': total, 'score': round(score, 4), 'passed': score >= pass_ratio}
+
+
+class Stats:
+    """Throughput and latency counters exposed on /stats"""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.requests = 0
+        self.submissions = 0
+        self.errors = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def record(self, submissions: int, latency: float):
+        self.requests += 1
+        self.submissions += submissions
+        self.latencies.append(latency)
+
+    def snapshot(self) -> Dict:
+        uptime = time.monotonic() - self.started
+        ordered = sorted(self.latencies)
+
+        def percentile(fraction: float) -> float:
+            if not ordered:
+                return 0.0
+            return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000
+
+        return {
+            'uptime_s': round(uptime, 1),
+            'requests': self.requests,
+            'submissions': self.submissions,
+            'errors': self.errors,
+            'submissions_per_s': round(self.submissions / uptime, 1) if uptime else 0.0,
+            'latency_ms': {
+                'p50': round(percentile(0.50), 3),
+                'p99': round(percentile(0.99), 3),
+                'max': round(ordered[-1] * 1000, 3) if ordered else 0.0,
+            },
+        }
+
+
+# ---------------------------------------------------------------------------
+# HTTP service
+# ---------------------------------------------------------------------------
+
+STATUS_TEXT = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 413: 'Payload Too Large'}
+MAX_BODY_BYTES = 16 * 1024 * 1024
+
+
+def http_response(status: int, payload: Dict, keep_alive: bool) -> bytes:
+    body = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    headers = (
+        f"HTTP/1.1 {status} {STATUS_TEXT.get(status, 'Error')}\r\n"
+        f"Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    return headers.encode('latin-1') + body
+
+
+class GradingService:
+    """
+    Minimal HTTP/1.1 server on asyncio streams.
+
+    POST /grade  {"quiz": "module-01", "submissions": [{"learner": "...", "answers": {"q1": "B"}}]}
+    GET  /stats  throughput and latency counters
+    GET  /health liveness check
+    """
+
+    def __init__(self, grader: Grader):
+        self.grader = grader
+        self.stats = Stats()
+
+    def handle_grade(self, body: bytes) -> Tuple[int, Dict]:
+        start = time.perf_counter()
+        try:
+            request = json.loads(body)
+            quiz_id = request['quiz']
+            submissions = request['submissions']
+            if not isinstance(quiz_id, str) or not isinstance(submissions, list):
+                raise TypeError
+        except (ValueError, KeyError, TypeError):
+            self.stats.errors += 1
+            return 400, {'error': 'expected {"quiz": ..., "submissions": [...]}'}
+        if quiz_id not in self.grader.quizzes:
+            self.stats.errors += 1
+            return 404, {'error': f'unknown quiz: {quiz_id}'}
+
+        grade = self.grader.grade
+        results = []
+        for position, submission in enumerate(submissions):
+            answers = submission.get('answers', {}) if isinstance(submission, dict) else None
+            if not isinstance(answers, dict):
+                self.stats.errors += 1
+                return 400, {'error': f'submission {position}: expected {{"learner": ..., "answers": {{...}}}}'}
+            try:
+                results.append({'learner': submission.get('learner'), **grade(quiz_id, answers)})
+            except ValueError as e:
+                self.stats.errors += 1
+                return 400, {'error': f'submission {position}: {e}'}
+        self.stats.record(len(results), time.perf_counter() - start)
+        return 200, {'quiz': quiz_id, 'results': results}
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, path, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+                try:
+                    length = int(headers.get('content-length', 0) or 0)
+                    if length < 0:
+                        raise ValueError
+                except ValueError:
+                    # The body cannot be framed, so the connection cannot be reused
+                    self.stats.errors += 1
+                    writer.write(http_response(400, {'error': 'invalid Content-Length'}, False))
+                    break
+                if length > MAX_BODY_BYTES:
+                    writer.write(http_response(413, {'error': 'body too large'}, False))
+                    break
+                body = await reader.readexactly(length) if length else b''
+
+                if path == '/grade' and method == 'POST':
+                    status, payload = self.handle_grade(body)
+                elif path == '/stats' and method == 'GET':
+                    status, payload = 200, self.stats.snapshot()
+                elif path == '/health' and method == 'GET':
+                    status, payload = 200, {'status': 'ok', 'quizzes': sorted(self.grader.quizzes)}
+                elif path in ('/grade', '/stats', '/health'):
+                    status, payload = 405, {'error': 'method not allowed'}
+                else:
+                    status, payload = 404, {'error': 'not found'}
+
+                writer.write(http_response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str, port: int):
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        print(f"Grading service listening on http://{host}:{port}")
+        print(f"Loaded quizzes: {', '.join(sorted(self.grader.quizzes)) or '(none)'}")
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Compile quiz answer keys and run the grading service')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    compile_parser = subparsers.add_parser('compile', help='Compile question banks into answer keys')
+    compile_parser.add_argument('banks', nargs='*', help=f'Question bank markdown files (default: {QUIZZES_DIR}/*.md)')
+    compile_parser.add_argument('--output', default=str(KEYS_PATH), help=f'Answer-key file (default: {KEYS_PATH})')
+
+    serve_parser = subparsers.add_parser('serve', help='Run the asyncio grading service')
+    serve_parser.add_argument('--keys', default=str(KEYS_PATH), help=f'Answer-key file (default: {KEYS_PATH})')
+    serve_parser.add_argument('--host', default='127.0.0.1', help='Bind address (default: 127.0.0.1)')
+    serve_parser.add_argument('--port', type=int, default=8765, help='Port (default: 8765)')
+
+    args = parser.parse_args()
+
+    if args.command == 'compile':
+        print("=" * 60)
+        print("Compiling Quiz Answer Keys")
+        print("=" * 60)
+        paths = [Path(bank) for bank in args.banks] or sorted(QUIZZES_DIR.glob('*.md'))
+        keys = compile_answer_keys(paths)
+        output = Path(args.output)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(keys, f, separators=(',', ':'))
+        print(f"\n✅ {len(keys['quizzes'])} quiz(zes) written to {output}")
+        return 0
+
+    keys_path = Path(args.keys)
+    if not keys_path.exists():
+        print(f"ERROR: Answer keys not found: {keys_path}")
+        print("Run: python quiz_grader.py compile")
+        return 1
+    service = GradingService(Grader.from_file(keys_path))
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("\nStopped.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""
+Render the data-driven infographic charts (kinked rate curve, utilization impact,
+health factor, adaptive IRM over time, leverage-loop strategy map) directly from a parameter spec.
+Reads money_markets_chart_specs.json from the same folder as money_markets_asset_specs.json
+and writes PNGs to lessons/lesson_XX/<asset_id>_<slug>.png, the layout integrate_gitbook_images.py
+expects. Charts are rendered headless in a process pool and cached by parameter hash, so only
+charts whose parameters (or renderer version) changed are re-rendered.
+"""
+
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Configuration
+SCRIPT_DIR = Path(__file__).parent
+GITBOOK_DIR = SCRIPT_DIR.parent
+INFOGRAPHICS_DIR = GITBOOK_DIR.parent.parent.parent / "assets" / "infographics"
+SPECS_PATH = INFOGRAPHICS_DIR / "scripts" / "money_markets_chart_specs.json"
+OUTPUT_DIR = INFOGRAPHICS_DIR / "output" / "money-markets"
+CACHE_FILENAME = ".chart_cache.json"
+
+# Bump when a renderer's output changes so cached charts are re-rendered
+RENDERER_VERSION = "1"
+
+# Used when no chart spec file exists yet; mirrors the figures in lessons 2 and 6
+DEFAULT_CHART_SPECS = {
+    "lessons": {
+        "lesson_02": {
+            "charts": [
+                {
+                    "asset_id": "mm02_01",
+                    "slug": "health_factor_formula_visualization",
+                    "kind": "health_factor",
+                    "title": "Health Factor vs Collateral Price Drop",
+                    "params": {
+                        "collateral_value": 10000,
+                        "liquidation_threshold": 0.825,
+                        "debt": 5000,
+                        "bands": {"danger": 1.0, "warning": 1.5, "safe": 2.0},
+                    },
+                },
+                {
+                    "asset_id": "mm02_02",
+                    "slug": "interest_rate_curve_kinked_model",
+                    "kind": "kinked_rate",
+                    "title": "Interest Rate Curve (Kinked Model)",
+                    "params": {
+                        "base_rate": 0.0,
+                        "slope1": 0.04,
+                        "slope2": 0.75,
+                        "optimal_utilization": 0.80,
+                        "reserve_factor": 0.10,
+                    },
+                },
+                {
+                    "asset_id": "mm02_03",
+                    "slug": "utilization_impact_chart",
+                    "kind": "utilization_impact",
+                    "title": "Utilization Impact Chart",
+                    "params": {
+                        "total_supply": 1000000,
+                        "base_rate": 0.0,
+                        "slope1": 0.04,
+                        "slope2": 0.75,
+                        "optimal_utilization": 0.80,
+                        "reserve_factor": 0.10,
+                        "markers": [0.5, 0.8, 0.95],
+                    },
+                },
+            ]
+        },
+        "lesson_06": {
+            "charts": [
+                {
+                    "asset_id": "mm06_03",
+                    "slug": "adaptive_curve_irm_visualization",
+                    "kind": "adaptive_irm",
+                    "title": "Adaptive Curve IRM: Rate at Target Follows Utilization",
+                    "params": {
+                        "target_utilization": 0.90,
+                        "curve_steepness": 4.0,
+                        "initial_rate_at_target": 0.04,
+                        "interval_hours": 1,
+                        "phases": [[5, 0.90], [10, 0.97], [10, 0.90], [15, 0.70], [5, 0.90]],
+                    },
+                },
+            ]
+        },
+    },
+    "exercises": {},
+}
+
+
+def chart_hash(chart: Dict) -> str:
+    """Hash of everything that affects a chart's pixels"""
+    payload = {
+        'renderer_version': RENDERER_VERSION,
+        'kind': chart['kind'],
+        'title': chart.get('title', ''),
+        'params': chart.get('params', {}),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def chart_output_path(output_dir: Path, section: str, group_id: str, chart: Dict) -> Path:
+    """Output path in the lessons/lesson_XX/<asset_id>_<slug>.png layout"""
+    return output_dir / section / group_id / f"{chart['asset_id']}_{chart['slug']}.png"
+
+
+# ---------------------------------------------------------------------------
+# Renderers (run inside worker processes)
+# ---------------------------------------------------------------------------
+
+def _render_kinked_rate(ax, params: Dict):
+    import numpy as np
+    from interest_rate_models import kinked_borrow_rate, supply_rate
+
+    u = np.linspace(0.0, 1.0, 501)
+    borrow = kinked_borrow_rate(u, params['base_rate'], params['slope1'], params['slope2'], params['optimal_utilization'])
+    supply = supply_rate(borrow, u, params.get('reserve_factor', 0.0))
+
+    ax.plot(u * 100, borrow * 100, label='Borrow APR', color='#d9534f', linewidth=2.5)
+    ax.plot(u * 100, supply * 100, label='Supply APR', color='#2e7dd7', linewidth=2.5)
+    ax.axvline(params['optimal_utilization'] * 100, color='#555555', linestyle='--', linewidth=1)
+    ax.annotate(f"Kink ({params['optimal_utilization']:.0%})",
+                xy=(params['optimal_utilization'] * 100, ax.get_ylim()[1] * 0.9),
+                xytext=(-8, 0), textcoords='offset points', ha='right', color='#555555')
+    ax.set_xlabel('Utilization (%)')
+    ax.set_ylabel('Annual rate (%)')
+    ax.legend(loc='upper left')
+
+
+def _render_utilization_impact(ax, params: Dict):
+    import numpy as np
+    from interest_rate_models import kinked_borrow_rate, supply_rate
+
+    u = np.linspace(0.0, 1.0, 501)
+    borrow = kinked_borrow_rate(u, params['base_rate'], params['slope1'], params['slope2'], params['optimal_utilization'])
+    supply = supply_rate(borrow, u, params.get('reserve_factor', 0.0))
+    available = params['total_supply'] * (1.0 - u)
+
+    ax.fill_between(u * 100, available, color='#9fd3a8', alpha=0.6, label='Withdrawable liquidity')
+    ax.set_xlabel('Utilization (%)')
+    ax.set_ylabel('Available liquidity ($)')
+
+    rate_ax = ax.twinx()
+    rate_ax.plot(u * 100, supply * 100, color='#2e7dd7', linewidth=2.5, label='Supply APR')
+    rate_ax.set_ylabel('Supply APR (%)')
+
+    for marker in params.get('markers', []):
+        marker_rate = float(supply_rate(
+            kinked_borrow_rate(marker, params['base_rate'], params['slope1'], params['slope2'],
+                               params['optimal_utilization']),
+            marker, params.get('reserve_factor', 0.0)))
+        rate_ax.scatter([marker * 100], [marker_rate * 100], color='#2e7dd7', zorder=5)
+        rate_ax.annotate(f"{marker:.0%}: {marker_rate:.1%}", xy=(marker * 100, marker_rate * 100),
+                         xytext=(-6, 6), textcoords='offset points', ha='right', fontsize=9)
+
+    handles, labels = ax.get_legend_handles_labels()
+    rate_handles, rate_labels = rate_ax.get_legend_handles_labels()
+    ax.legend(handles + rate_handles, labels + rate_labels, loc='upper center')
+
+
+def _render_health_factor(ax, params: Dict):
+    import numpy as np
+    from interest_rate_models import health_factor
+
+    drop = np.linspace(0.0, 0.9, 451)
+    hf = health_factor(params['collateral_value'] * (1.0 - drop), params['liquidation_threshold'], params['debt'])
+    ax.plot(drop * 100, hf, color='#333333', linewidth=2.5, label='Health factor')
+
+    bands = params.get('bands', {'danger': 1.0})
+    colors = {'danger': '#d9534f', 'warning': '#f0ad4e', 'safe': '#5cb85c'}
+    for name, level in sorted(bands.items(), key=lambda item: item[1]):
+        ax.axhline(level, color=colors.get(name, '#777777'), linestyle='--', linewidth=1.2,
+                   label=f"{name.title()} ({level:.2f})")
+
+    # Price drop at which the position becomes liquidatable (HF = 1)
+    liquidation_drop = 1.0 - params['debt'] / (params['collateral_value'] * params['liquidation_threshold'])
+    if 0.0 < liquidation_drop < 0.9:
+        ax.axvline(liquidation_drop * 100, color='#d9534f', linewidth=1)
+        ax.annotate(f"Liquidation at -{liquidation_drop:.1%}", xy=(liquidation_drop * 100, 1.0),
+                    xytext=(6, 12), textcoords='offset points', color='#d9534f')
+
+    ax.set_ylim(0, max(3.0, float(hf[0]) * 1.1))
+    ax.set_xlabel('Collateral price drop (%)')
+    ax.set_ylabel('Health factor')
+    ax.legend(loc='upper right')
+
+
+def _render_adaptive_irm(ax, params: Dict):
+    import numpy as np
+    from adaptive_irm import INITIAL_RATE_AT_TARGET, TARGET_UTILIZATION, phase_path, simulate
+
+    interval = params.get('interval_hours', 1) * 3600
+    target = params.get('target_utilization', TARGET_UTILIZATION)
+    u = phase_path([(days * 86400, level) for days, level in params['phases']], interval)
+    result = simulate(u[:, None], interval, params.get('initial_rate_at_target', INITIAL_RATE_AT_TARGET),
+                      target_utilization=target, curve_steepness=params.get('curve_steepness', 4.0))
+    days = result['times'] / 86400
+
+    ax.plot(days[1:], result['borrow_rate'][:, 0] * 100, color='#d9534f', linewidth=2.5, label='Borrow APR')
+    ax.plot(days, result['rate_at_target'][:, 0] * 100, color='#333333', linestyle='--', linewidth=2,
+            label='Rate at target')
+    ax.set_xlabel('Days')
+    ax.set_ylabel('Annual rate (%)')
+
+    util_ax = ax.twinx()
+    util_ax.step(days[1:], u * 100, where='pre', color='#2e7dd7', alpha=0.6, linewidth=1.5, label='Utilization')
+    util_ax.axhline(target * 100, color='#2e7dd7', linestyle=':', linewidth=1)
+    util_ax.set_ylim(0, 105)
+    util_ax.set_ylabel('Utilization (%)')
+
+    handles, labels = ax.get_legend_handles_labels()
+    util_handles, util_labels = util_ax.get_legend_handles_labels()
+    ax.legend(handles + util_handles, labels + util_labels, loc='upper left')
+
+
+def _render_leverage_loop_map(ax, params: Dict):
+    import numpy as np
+    from leverage_loop import loop_grid
+
+    ltv = np.linspace(*params.get('ltv_range', [0.3, 0.9]), 121)
+    borrow = np.linspace(*params.get('borrow_range', [0.01, 0.10]), 91)
+    results = loop_grid(ltv, [params.get('loops', float('inf'))], [params['supply_rate']], borrow,
+                        [params.get('shock', 0.0)], params['liquidation_threshold'], params.get('swap_fee', 0.0))
+    apy = results['net_apy'][:, 0, 0, :, 0].T * 100
+    health = results['health_factor'][:, 0, 0, :, 0].T
+
+    limit = np.nanmax(np.abs(apy))
+    image = ax.pcolormesh(ltv * 100, borrow * 100, apy, cmap='RdYlGn', vmin=-limit, vmax=limit, shading='auto')
+    ax.figure.colorbar(image, ax=ax, label='Net APY on equity (%)')
+    breakeven = ax.contour(ltv * 100, borrow * 100, apy, levels=[0.0], colors='#333333', linewidths=2)
+    ax.clabel(breakeven, fmt='Break-even', fontsize=9)
+    for level in params.get('health_levels', [2.0, 1.5]):
+        ax.axvline(float(ltv[np.argmin(np.abs(health[0] - level))]) * 100, color='#d9534f', linestyle='--',
+                   linewidth=1.2, label=f"HF {level:g}")
+    ax.set_xlabel('LTV per loop (%)')
+    ax.set_ylabel('Borrow APR (%)')
+    ax.legend(loc='upper left')
+
+
+RENDERERS = {
+    'kinked_rate': _render_kinked_rate,
+    'utilization_impact': _render_utilization_impact,
+    'health_factor': _render_health_factor,
+    'adaptive_irm': _render_adaptive_irm,
+    'leverage_loop_map': _render_leverage_loop_map,
+}
+
+
+def render_chart(chart: Dict, output_path: str) -> str:
+    """Render one chart to a PNG file (worker process entry point)"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    renderer = RENDERERS[chart['kind']]
+    fig, ax = plt.subplots(figsize=(12, 6.75), dpi=100)
+    try:
+        ax.grid(True, alpha=0.3)
+        ax.set_title(chart.get('title', ''), fontsize=16, fontweight='bold')
+        renderer(ax, chart.get('params', {}))
+        fig.tight_layout()
+
+        output = Path(output_path)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temp file first so an interrupted run never leaves a truncated PNG
+        tmp_path = output.with_suffix('.png.tmp')
+        fig.savefig(tmp_path, format='png')
+        os.replace(tmp_path, output)
+    finally:
+        plt.close(fig)
+    return output_path
+
+
+class ChartRenderer:
+    """Renders chart specs into the infographics output tree with a hash cache"""
+
+    def __init__(self, specs_path: Optional[Path] = None, output_dir: Optional[Path] = None):
+        self.specs_path = Path(specs_path) if specs_path else SPECS_PATH
+        self.output_dir = Path(output_dir) if output_dir else OUTPUT_DIR
+        self.cache_path = self.output_dir / CACHE_FILENAME
+
+        if self.specs_path.exists():
+            with open(self.specs_path, 'r') as f:
+                self.specs = json.load(f)
+        else:
+            print(f"⚠️  Chart spec not found at {self.specs_path}, using built-in defaults")
+            self.specs = DEFAULT_CHART_SPECS
+
+        self.cache = self._load_cache()
+
+    def _load_cache(self) -> Dict[str, str]:
+        if self.cache_path.exists():
+            try:
+                with open(self.cache_path, 'r') as f:
+                    return json.load(f)
+            except (OSError, json.JSONDecodeError):
+                return {}
+        return {}
+
+    def _save_cache(self):
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.cache_path, 'w') as f:
+            json.dump(self.cache, f, indent=2, sort_keys=True)
+
+    def collect_jobs(self, only: Optional[str] = None) -> List[Dict]:
+        """List every chart in the spec, optionally limited to one lesson/exercise id"""
+        jobs = []
+        for section in ('lessons', 'exercises'):
+            for group_id, group in sorted(self.specs.get(section, {}).items()):
+                if only and group_id != only:
+                    continue
+                for chart in group.get('charts', []):
+                    if chart.get('kind') not in RENDERERS:
+                        print(f"  ⚠️  Unknown chart kind '{chart.get('kind')}' for {chart.get('asset_id')}")
+                        continue
+                    output_path = chart_output_path(self.output_dir, section, group_id, chart)
+                    jobs.append({
+                        'chart': chart,
+                        'output_path': output_path,
+                        'cache_key': output_path.relative_to(self.output_dir).as_posix(),
+                        'hash': chart_hash(chart),
+                    })
+        return jobs
+
+    def is_fresh(self, job: Dict) -> bool:
+        """A chart is fresh if its file exists and was rendered from the same hash"""
+        return job['output_path'].exists() and self.cache.get(job['cache_key']) == job['hash']
+
+    def render_all(self, only: Optional[str] = None, force: bool = False,
+                   workers: Optional[int] = None, dry_run: bool = False) -> Dict:
+        """Render every stale chart in parallel and update the cache"""
+        jobs = self.collect_jobs(only)
+        stale = [job for job in jobs if force or not self.is_fresh(job)]
+        results = {'rendered': [], 'skipped': len(jobs) - len(stale), 'failed': []}
+
+        if dry_run or not stale:
+            results['would_render'] = [job['cache_key'] for job in stale] if dry_run else []
+            return results
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(render_chart, job['chart'], str(job['output_path'])): job
+                for job in stale
+            }
+            for future in as_completed(futures):
+                job = futures[future]
+                try:
+                    future.result()
+                    self.cache[job['cache_key']] = job['hash']
+                    results['rendered'].append(job['cache_key'])
+                except Exception as e:
+                    results['failed'].append((job['cache_key'], str(e)))
+
+        self._save_cache()
+        return results
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Render data-driven money markets charts from a parameter spec')
+    parser.add_argument('--specs', help=f'Chart spec JSON (default: {SPECS_PATH})')
+    parser.add_argument('--output', help=f'Output root (default: {OUTPUT_DIR})')
+    parser.add_argument('--only', help='Render a single lesson or exercise (e.g., lesson_02)')
+    parser.add_argument('--force', action='store_true', help='Re-render charts even if cached')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: CPU count)')
+    parser.add_argument('--dry-run', action='store_true', help='Show which charts would be rendered')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("Rendering Money Markets Charts")
+    print("=" * 60)
+    print()
+
+    renderer = ChartRenderer(specs_path=args.specs, output_dir=args.output)
+    results = renderer.render_all(only=args.only, force=args.force, workers=args.workers, dry_run=args.dry_run)
+
+    if args.dry_run:
+        for key in results['would_render']:
+            print(f"  Would render: {key}")
+    for key in sorted(results['rendered']):
+        print(f"  ✅ Rendered: {key}")
+    for key, error in results['failed']:
+        print(f"  ❌ Failed: {key}: {error}")
+
+    print()
+    print("=" * 60)
+    print("Summary")
+    print("=" * 60)
+    print(f"✅ Rendered: {len(results['rendered'])}")
+    print(f"⏭️  Up to date: {results['skipped']}")
+    print(f"❌ Failed: {len(results['failed'])}")
+    print()
+
+    return 1 if results['failed'] else 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Bring object metadata (Content-Type, Cache-Control, custom metadata) in a bucket
+in line with the rules upload_asset.py applies to new uploads.
+Desired metadata is computed per object from its name; only objects that differ
+are patched, and patches are sent as JSON-API batch requests of up to 100
+operations per HTTP call instead of one round-trip per object.
+"""
+
+import sys
+from typing import Dict, List, Optional
+
+from upload_asset import (
+    BUCKET_NAME,
+    cache_control_for,
+    folder_for_mime_type,
+    get_storage_client,
+    guess_mime_type,
+)
+
+# GCS accepts at most 100 calls in one batch request
+MAX_BATCH_SIZE = 100
+
+
+def desired_metadata(object_key: str, extra_metadata: Optional[Dict[str, str]] = None,
+                     cache_control_override: Optional[str] = None) -> Dict:
+    """Metadata an object should carry, derived from its name like upload_file does"""
+    mime_type = guess_mime_type(object_key)
+    folder = folder_for_mime_type(mime_type)
+    return {
+        'content_type': mime_type,
+        'cache_control': cache_control_override or cache_control_for(object_key, folder),
+        'metadata': dict(extra_metadata or {}),
+    }
+
+
+def pending_changes(blob, desired: Dict) -> Dict:
+    """Fields of desired that differ from what the blob already has"""
+    changes = {}
+    if blob.content_type != desired['content_type']:
+        changes['content_type'] = desired['content_type']
+    if blob.cache_control != desired['cache_control']:
+        changes['cache_control'] = desired['cache_control']
+    current_metadata = blob.metadata or {}
+    missing = {key: value for key, value in desired['metadata'].items() if current_metadata.get(key) != value}
+    if missing:
+        changes['metadata'] = missing
+    return changes
+
+
+def apply_batches(client, updates: List[tuple]) -> Dict[str, List[str]]:
+    """
+    Patch blobs in batches of MAX_BATCH_SIZE.
+
+    updates is a list of (blob, changes). Each blob only sends the fields that
+    were set on it, so the PATCH bodies stay minimal. Failed calls do not abort
+    the batch; each blob's own response decides whether it counts as updated.
+    """
+    results = {'updated': [], 'failed': []}
+    for start in range(0, len(updates), MAX_BATCH_SIZE):
+        chunk = updates[start:start + MAX_BATCH_SIZE]
+        try:
+            with client.batch(raise_exception=False) as batch:
+                for blob, changes in chunk:
+                    if 'content_type' in changes:
+                        blob.content_type = changes['content_type']
+                    if 'cache_control' in changes:
+                        blob.cache_control = changes['cache_control']
+                    if 'metadata' in changes:
+                        # Setting metadata merges keys server-side; existing keys are kept
+                        blob.metadata = changes['metadata']
+                    blob.patch()
+        except Exception as e:
+            print(f"  ✗ Batch {start // MAX_BATCH_SIZE + 1} failed: {e}")
+            results['failed'].extend(blob.name for blob, _ in chunk)
+            continue
+
+        # Finishing the batch fills every deferred blob with its own response:
+        # the patched object resource on success, an error body otherwise
+        for blob, _ in chunk:
+            if blob.generation is not None:
+                results['updated'].append(blob.name)
+            else:
+                results['failed'].append(blob.name)
+                print(f"  ✗ {blob.name}: patch rejected")
+        print(f"  ✓ Batch {start // MAX_BATCH_SIZE + 1}: {len(chunk)} object(s) in one request")
+    return results
+
+
+def sync_metadata(bucket_name: str, prefix: Optional[str] = None, extra_metadata: Optional[Dict[str, str]] = None,
+                  cache_control_override: Optional[str] = None, dry_run: bool = False,
+                  storage_client=None) -> Optional[Dict]:
+    client = storage_client or get_storage_client()
+    if client is None:
+        return None
+
+    updates = []
+    checked = 0
+    for blob in client.list_blobs(bucket_name, prefix=prefix):
+        checked += 1
+        changes = pending_changes(blob, desired_metadata(blob.name, extra_metadata, cache_control_override))
+        if changes:
+            updates.append((blob, changes))
+
+    print(f"Checked {checked} object(s); {len(updates)} need updates")
+    if dry_run:
+        for blob, changes in updates:
+            print(f"  Would update {blob.name}: {changes}")
+        return {'checked': checked, 'updated': [], 'failed': [], 'pending': len(updates)}
+
+    results = apply_batches(client, updates)
+    results['checked'] = checked
+    return results
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Batch-sync Content-Type, Cache-Control and custom metadata')
+    parser.add_argument('--bucket', default=BUCKET_NAME, help=f'Bucket to sync (default: {BUCKET_NAME})')
+    parser.add_argument('--prefix', help='Only sync objects under this prefix (e.g., lesson-02/)')
+    parser.add_argument('--cache-control', help='Override Cache-Control for every object')
+    parser.add_argument('--set-metadata', action='append', default=[], metavar='KEY=VALUE',
+                        help='Custom metadata to ensure on every object (repeatable)')
+    parser.add_argument('--dry-run', action='store_true', help='Show pending changes without patching')
+    args = parser.parse_args()
+
+    extra_metadata = {}
+    for item in args.set_metadata:
+        if '=' not in item:
+            parser.error(f"--set-metadata expects KEY=VALUE, got: {item}")
+        key, value = item.split('=', 1)
+        extra_metadata[key] = value
+
+    print("=" * 60)
+    print(f"Syncing Object Metadata: gs://{args.bucket}/{args.prefix or ''}")
+    print("=" * 60)
+
+    results = sync_metadata(args.bucket, args.prefix, extra_metadata, args.cache_control, args.dry_run)
+    if results is None:
+        return 1
+
+    print()
+    print(f"✅ Updated: {len(results['updated'])}")
+    print(f"⏭️  Already correct: {results['checked'] - len(results['updated']) - len(results['failed']) - results.get('pending', 0)}")
+    print(f"❌ Failed: {len(results['failed'])}")
+    return 1 if results['failed'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,7 +7,9 @@ import os
 import sys
 import re
 from pathlib import Path
-from upload_asset import upload_file, extract_lesson_number
+from bandwidth import pop_bandwidth_arguments
+from upload_asset import extract_lesson_number, get_storage_client, upload_file
+from profiling import pop_profile_argument, profiled, span
 
 # Paths
 SCRIPT_DIR = Path(__file__).parent
@@ -19,8 +21,13 @@ def format_lesson_slug(lesson_num):
     """Format lesson number as slug (e.g., 1 -> "lesson-01")"""
     return f"lesson-{lesson_num:02d}"
 
-def upload_all_media():
-    """Upload all audio and video files"""
+def upload_all_media(audio_dir=AUDIO_DIR, video_dir=VIDEO_DIR, bucket_name=None, storage_client=None,
+                     limiter=None):
+    """Upload all audio and video files (limiter: optional shared bandwidth cap)"""
+    # One client (and connection pool) for every file instead of one per upload
+    if storage_client is None:
+        storage_client = get_storage_client()
+    
     print("=" * 60)
     print("Uploading All Media Files to Google Cloud Storage")
     print("=" * 60)
@@ -33,13 +40,14 @@ def upload_all_media():
     # Upload audio files
     print("📢 Uploading Audio Files...")
     print("-" * 60)
-    audio_files = sorted(AUDIO_DIR.glob("*.m4a"))
+    with span('inventory scan'):
+        audio_files = sorted(audio_dir.glob("*.m4a"))
     for audio_file in audio_files:
         lesson_num = extract_lesson_number(audio_file.name)
         if lesson_num:
             lesson_slug = format_lesson_slug(lesson_num)
             print(f"Uploading: {audio_file.name} → {lesson_slug}")
-            result = upload_file(str(audio_file), lesson_slug)
+            result = upload_file(str(audio_file), lesson_slug, bucket_name, storage_client, limiter)
             if result:
                 uploaded.append((audio_file.name, lesson_slug, "audio"))
                 print(f"  ✅ Success: {result}")
@@ -54,13 +62,14 @@ def upload_all_media():
     # Upload video files
     print("🎬 Uploading Video Files...")
     print("-" * 60)
-    video_files = sorted(VIDEO_DIR.glob("*.mp4"))
+    with span('inventory scan'):
+        video_files = sorted(video_dir.glob("*.mp4"))
     for video_file in video_files:
         lesson_num = extract_lesson_number(video_file.name)
         if lesson_num:
             lesson_slug = format_lesson_slug(lesson_num)
             print(f"Uploading: {video_file.name} → {lesson_slug}")
-            result = upload_file(str(video_file), lesson_slug)
+            result = upload_file(str(video_file), lesson_slug, bucket_name, storage_client, limiter)
             if result:
                 uploaded.append((video_file.name, lesson_slug, "video"))
                 print(f"  ✅ Success: {result}")
@@ -95,6 +104,13 @@ def upload_all_media():
     return len(uploaded), len(failed)
 
 if __name__ == "__main__":
+    profile_prefix = pop_profile_argument(sys.argv)
+    try:
+        limiter = pop_bandwidth_arguments(sys.argv)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    
     # Set service account path
     # From tools/: go up to gitbook dir, then up to ebook dir, then up to ebooks, then up to root, then into Keys
     service_account = os.getenv(
@@ -111,7 +127,12 @@ if __name__ == "__main__":
     print(f"Using service account: {service_account}")
     print()
     
-    success, failed = upload_all_media()
+    with profiled(profile_prefix, 'upload_all_media'):
+        if limiter is None:
+            success, failed = upload_all_media()
+        else:
+            with limiter:
+                success, failed = upload_all_media(limiter=limiter)
     
     if failed > 0:
         sys.exit(1)
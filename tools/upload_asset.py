@@ -11,6 +11,10 @@ import mimetypes
 import os
 import re
 from pathlib import Path
+from bandwidth import THROTTLED_CHUNK_SIZE, pop_bandwidth_arguments
+from compression import compress_for_upload, pop_compression_argument
+from mp4_faststart import prepare_for_upload
+from profiling import pop_profile_argument, profiled, span
 
 # Configuration
 # Service account JSON file path (relative to project root)
@@ -26,6 +30,23 @@ SERVICE_ACCOUNT_PATH = os.getenv(
 BUCKET_NAME = os.getenv('GCS_BUCKET_NAME', 'money-markets-media')
 PROJECT_ID = 'defi-university'
 
+# HLS types (.ts would otherwise be guessed as a Qt translation file)
+mimetypes.add_type('video/mp2t', '.ts')
+mimetypes.add_type('application/vnd.apple.mpegurl', '.m3u8')
+
+# Cache-Control per folder. upload_images and upload_all_media overwrite the same
+# lesson-XX/<folder>/<name> keys when content is regenerated, so these stay short
+CACHE_CONTROL_BY_FOLDER = {
+    'video': 'public, max-age=3600',
+    'audio': 'public, max-age=3600',
+    'images': 'public, max-age=3600',
+    'files': 'public, max-age=3600',
+}
+# HLS packages are content-addressed (lesson-XX/hls/<key>/...): a new encode gets
+# a new key, so nothing under a key is ever overwritten
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+_CONTENT_ADDRESSED_KEY = re.compile(r'(^|/)hls/[0-9a-f]{16}-[0-9a-f]+/')
+
 def extract_lesson_number(filename):
     """Extract lesson number from filename"""
     match = re.search(r'lesson(\d+)', filename, re.IGNORECASE)
@@ -33,13 +54,33 @@ def extract_lesson_number(filename):
         return int(match.group(1))
     return None
 
-def upload_file(file_path, lesson_slug=None):
+def guess_mime_type(file_path):
+    """MIME type for a file name, falling back to application/octet-stream"""
+    mime_type, _ = mimetypes.guess_type(str(file_path))
+    return mime_type or 'application/octet-stream'
+
+def folder_for_mime_type(mime_type):
+    """Object folder (video/audio/images/files) for a MIME type"""
+    if "video" in mime_type:
+        return "video"
+    elif "audio" in mime_type:
+        return "audio"
+    elif "image" in mime_type:
+        return "images"
+    return "files"
+
+def cache_control_for(object_key, folder):
+    """Cache-Control for an object: immutable only under content-addressed keys"""
+    if _CONTENT_ADDRESSED_KEY.search(object_key):
+        return IMMUTABLE_CACHE_CONTROL
+    return CACHE_CONTROL_BY_FOLDER[folder]
+
+def get_storage_client():
     """
-    Upload a file to Google Cloud Storage and return the GitBook embed syntax.
+    Create an authenticated Google Cloud Storage client.
     
-    Args:
-        file_path: Path to the file to upload
-        lesson_slug: Optional lesson number (e.g., "lesson-01") for organization
+    Returns None (after printing the reason) if credentials are missing or the
+    client cannot be created.
     """
     # Verify service account file exists
     if not os.path.exists(SERVICE_ACCOUNT_PATH):
@@ -51,37 +92,47 @@ def upload_file(file_path, lesson_slug=None):
     # Set environment variable for Google Cloud authentication
     os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = os.path.abspath(SERVICE_ACCOUNT_PATH)
     
-    # 1. Setup Google Cloud Storage client
     try:
-        storage_client = storage.Client(project=PROJECT_ID)
-        bucket = storage_client.bucket(BUCKET_NAME)
+        return storage.Client(project=PROJECT_ID)
     except Exception as e:
         print(f"ERROR: Failed to connect to Google Cloud Storage: {e}")
         print(f"Project: {PROJECT_ID}")
-        print(f"Bucket: {BUCKET_NAME}")
         print(f"Service Account: {SERVICE_ACCOUNT_PATH}")
         return None
+
+def upload_file(file_path, lesson_slug=None, bucket_name=None, storage_client=None, limiter=None,
+                encoding='gzip', object_key=None, show_embed=True):
+    """
+    Upload a file to Google Cloud Storage and return the GitBook embed syntax.
+    
+    Args:
+        file_path: Path to the file to upload
+        lesson_slug: Optional lesson number (e.g., "lesson-01") for organization
+        bucket_name: Bucket to upload to (default: BUCKET_NAME)
+        storage_client: Existing client to reuse (a new one is created if omitted)
+        limiter: Optional bandwidth.BandwidthLimiter shared by all concurrent uploads
+        encoding: 'gzip' or 'br' to pre-compress text assets (SVG, JSON, captions); None to disable
+        object_key: Explicit object path (e.g. HLS segments); overrides the lesson/folder layout
+        show_embed: Print the markdown to copy (off for bulk uploads such as HLS packages)
+    """
+    # 1. Setup Google Cloud Storage client
+    if storage_client is None:
+        storage_client = get_storage_client()
+    if storage_client is None:
+        return None
+    bucket_name = bucket_name or BUCKET_NAME
+    bucket = storage_client.bucket(bucket_name)
     
     # 2. Prepare file metadata
     file_path_obj = Path(file_path)
     filename = file_path_obj.name
-    mime_type, _ = mimetypes.guess_type(file_path)
-    
-    if mime_type is None:
-        mime_type = 'application/octet-stream'
+    mime_type = guess_mime_type(file_path)
     
     # 3. Determine file type and folder organization
-    if "video" in mime_type:
-        folder = "video"
-    elif "audio" in mime_type:
-        folder = "audio"
-    elif "image" in mime_type:
-        folder = "images"
-    else:
-        folder = "files"
+    folder = folder_for_mime_type(mime_type)
     
     # 4. Auto-detect lesson number from filename if not provided
-    if lesson_slug is None:
+    if lesson_slug is None and object_key is None:
         lesson_num = extract_lesson_number(filename)
         if lesson_num:
             lesson_slug = f"lesson-{lesson_num:02d}"
@@ -89,14 +140,33 @@ def upload_file(file_path, lesson_slug=None):
             lesson_slug = "general"
     
     # 5. Generate object key (path in GCS)
-    object_key = f"{lesson_slug}/{folder}/{filename}"
+    if object_key is None:
+        object_key = f"{lesson_slug}/{folder}/{filename}"
     
     # 6. Upload with critical headers
     print(f"Uploading {filename} to {object_key}...")
+    # MP4/M4A with a trailing moov atom are rewritten so playback can start immediately
+    upload_path, temp_path = prepare_for_upload(file_path, mime_type)
+    # Text assets are stored compressed and decoded by the browser via Content-Encoding
+    content_encoding = None
+    if encoding:
+        upload_path, compressed_path, content_encoding = compress_for_upload(upload_path, mime_type, encoding)
+        if compressed_path:
+            temp_path = compressed_path
     try:
         blob = bucket.blob(object_key)
         blob.content_type = mime_type  # CRITICAL for playback
-        blob.upload_from_filename(file_path)
+        blob.content_encoding = content_encoding
+        blob.cache_control = cache_control_for(object_key, folder)
+        with span('upload'):
+            if limiter is None:
+                blob.upload_from_filename(upload_path)
+            else:
+                # Chunked resumable upload so the limiter paces each chunk as it is read
+                blob.chunk_size = THROTTLED_CHUNK_SIZE
+                with open(upload_path, 'rb') as f:
+                    blob.upload_from_file(limiter.wrap(f), size=os.path.getsize(upload_path),
+                                          content_type=mime_type)
         
         # Note: Public access is configured at bucket level (uniform bucket-level access)
         # No need to call make_public() - files are automatically public due to bucket IAM policy
@@ -105,10 +175,15 @@ def upload_file(file_path, lesson_slug=None):
     except Exception as e:
         print(f"✗ Upload failed: {e}")
         return None
+    finally:
+        if temp_path:
+            os.remove(temp_path)
     
     # 7. Generate GitBook syntax based on type
     # GCS public URL format: https://storage.googleapis.com/BUCKET_NAME/path/to/file
-    full_url = f"https://storage.googleapis.com/{BUCKET_NAME}/{object_key}"
+    full_url = f"https://storage.googleapis.com/{bucket_name}/{object_key}"
+    if not show_embed:
+        return full_url
     
     print("\n" + "="*60)
     print("COPY TO MARKDOWN:")
@@ -130,11 +205,22 @@ def upload_file(file_path, lesson_slug=None):
     return full_url
 
 if __name__ == "__main__":
+    profile_prefix = pop_profile_argument(sys.argv)
+    try:
+        limiter = pop_bandwidth_arguments(sys.argv)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    encoding = pop_compression_argument(sys.argv)
     if len(sys.argv) < 2:
         print("Usage: python upload_asset.py <file_path> [lesson_slug]")
         print("\nExample:")
         print("  python upload_asset.py ../content/audio/lesson1-audio.m4a")
         print("  python upload_asset.py ../content/videos/lesson1-video.mp4 lesson-01")
+        print("  python upload_asset.py ../content/videos/lesson1-video.mp4 --profile")
+        print("  python upload_asset.py ../content/videos/lesson1-video.mp4 --bandwidth 2MB/s")
+        print("  python upload_asset.py ../content/diagrams/lesson3-flow.svg --brotli")
+        print("\nText assets (SVG, JSON, captions, CSV) are gzip-compressed unless --no-compress is given.")
         print("\nEnvironment Variables:")
         print("  GOOGLE_APPLICATION_CREDENTIALS: Path to service account JSON (optional)")
         print("  GCS_BUCKET_NAME: Bucket name (default: money-markets-media)")
@@ -147,5 +233,10 @@ if __name__ == "__main__":
         print(f"ERROR: File not found: {file_path}")
         sys.exit(1)
     
-    upload_file(file_path, lesson_slug)
+    with profiled(profile_prefix, 'upload_asset'):
+        if limiter is None:
+            upload_file(file_path, lesson_slug, encoding=encoding)
+        else:
+            with limiter:
+                upload_file(file_path, lesson_slug, limiter=limiter, encoding=encoding)
 
@@ -7,8 +7,13 @@ Mirrors the folder structure: lessons/lesson_XX/ and exercises/exercise_XX/
 from google.cloud import storage
 import os
 import mimetypes
+import sys
 from pathlib import Path
 
+from bandwidth import THROTTLED_CHUNK_SIZE, pop_bandwidth_arguments
+from perceptual_hash import PerceptualCache, pop_skip_unchanged_argument
+from profiling import pop_profile_argument, profiled, span
+
 # Configuration
 SCRIPT_DIR = Path(__file__).parent
 BASE_DIR = SCRIPT_DIR.parent.parent.parent.parent  # Go up from tools/ to "Testimonials Insert"
@@ -18,10 +23,8 @@ SERVICE_ACCOUNT_PATH = os.getenv('GOOGLE_APPLICATION_CREDENTIALS', str(DEFAULT_S
 BUCKET_NAME = os.getenv('GCS_BUCKET_NAME', 'money-markets-gitbook-images')
 PROJECT_ID = 'defi-university'
 
-def upload_images():
-    """Upload all images from assets/infographics/output/money-markets/ to GCS"""
-    
-    # Verify service account file exists
+def create_storage_client():
+    """Locate the service account and create a storage client (None on failure)"""
     service_account_abs = os.path.abspath(SERVICE_ACCOUNT_PATH)
     if not os.path.exists(service_account_abs):
         # Try alternative paths
@@ -41,50 +44,80 @@ def upload_images():
             print(f"ERROR: Service account file not found: {SERVICE_ACCOUNT_PATH}")
             print("Tried alternative paths:", alt_paths)
             print("Please set GOOGLE_APPLICATION_CREDENTIALS environment variable")
-            return False
+            return None
     
     # Set environment variable for Google Cloud authentication
     os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = service_account_abs
     
-    # Setup Google Cloud Storage client
     try:
-        storage_client = storage.Client(project=PROJECT_ID)
-        # Check if bucket exists
-        bucket = storage_client.bucket(BUCKET_NAME)
+        return storage.Client(project=PROJECT_ID)
+    except Exception as e:
+        print(f"ERROR: Failed to connect to Google Cloud Storage: {e}")
+        return None
+
+def upload_images(images_dir=None, bucket_name=None, storage_client=None, limiter=None, skip_unchanged=False,
+                  phash_cache=None):
+    """
+    Upload all images from assets/infographics/output/money-markets/ to GCS.
+
+    With skip_unchanged, images identical to what was last uploaded under the
+    same key (same bytes, or same perceptual hashes and pixels within
+    perceptual_hash.PIXEL_TOLERANCE) are not uploaded again (hashes kept in
+    phash_cache, default .cache/phash.json).
+    """
+    bucket_name = bucket_name or BUCKET_NAME
+    if storage_client is None:
+        storage_client = create_storage_client()
+        if storage_client is None:
+            return False
+    
+    # Check if bucket exists
+    try:
+        bucket = storage_client.bucket(bucket_name)
         if not bucket.exists():
-            print(f"Bucket '{BUCKET_NAME}' does not exist.")
+            print(f"Bucket '{bucket_name}' does not exist.")
             print(f"Please create it manually using:")
-            print(f"  gcloud storage buckets create gs://{BUCKET_NAME} --project={PROJECT_ID} --location=US")
+            print(f"  gcloud storage buckets create gs://{bucket_name} --project={PROJECT_ID} --location=US")
             print(f"Or ensure the service account has storage.buckets.create permission.")
             return False
-        print(f"✓ Using existing bucket: {BUCKET_NAME}")
+        print(f"✓ Using existing bucket: {bucket_name}")
     except Exception as e:
         print(f"ERROR: Failed to connect to Google Cloud Storage: {e}")
         return False
     
     # Find all images
-    script_dir = Path(__file__).parent
-    gitbook_dir = script_dir.parent
-    # Navigate to assets/infographics/output/money-markets
-    images_dir = gitbook_dir.parent.parent.parent / "assets" / "infographics" / "output" / "money-markets"
+    if images_dir is None:
+        script_dir = Path(__file__).parent
+        gitbook_dir = script_dir.parent
+        # Navigate to assets/infographics/output/money-markets
+        images_dir = gitbook_dir.parent.parent.parent / "assets" / "infographics" / "output" / "money-markets"
+    images_dir = Path(images_dir)
     
     if not images_dir.exists():
         print(f"ERROR: Images directory not found: {images_dir}")
         return False
     
     # Find all PNG files
-    image_files = list(images_dir.rglob("*.png"))
+    with span('inventory scan'):
+        image_files = list(images_dir.rglob("*.png"))
     
     if not image_files:
         print(f"No PNG files found in {images_dir}")
         return False
     
     print(f"Found {len(image_files)} images to upload")
-    print(f"Uploading to: gs://{BUCKET_NAME}/")
+    print(f"Uploading to: gs://{bucket_name}/")
     print("=" * 60)
     
     uploaded = []
     failed = []
+    unchanged = []
+    
+    perceptual = None
+    if skip_unchanged:
+        perceptual = PerceptualCache(images_dir=images_dir, cache_path=phash_cache)
+        with span('perceptual hash'):
+            records = perceptual.scan(image_files)
     
     for image_file in sorted(image_files):
         # Get relative path from money-markets directory
@@ -99,28 +132,47 @@ def upload_images():
         if mime_type is None:
             mime_type = 'image/png'
         
+        if perceptual is not None and perceptual.unchanged(bucket_name, object_key, records[object_key]):
+            print(f"⏭️  Unchanged: {relative_path}")
+            unchanged.append(str(relative_path))
+            continue
+        
         try:
             print(f"Uploading: {relative_path} → {object_key}")
             
             blob = bucket.blob(object_key)
             blob.content_type = mime_type
-            blob.upload_from_filename(str(image_file))
+            with span('upload'):
+                if limiter is None:
+                    blob.upload_from_filename(str(image_file))
+                else:
+                    blob.chunk_size = THROTTLED_CHUNK_SIZE
+                    with open(image_file, 'rb') as f:
+                        blob.upload_from_file(limiter.wrap(f), size=image_file.stat().st_size,
+                                              content_type=mime_type)
             
             # Note: With uniform bucket-level access, objects are automatically public
             # if the bucket IAM policy grants allUsers access (already configured)
             # No need to call make_public() - it would fail with uniform access
             
-            url = f"https://storage.googleapis.com/{BUCKET_NAME}/{object_key}"
+            url = f"https://storage.googleapis.com/{bucket_name}/{object_key}"
             uploaded.append((str(relative_path), url))
+            if perceptual is not None:
+                perceptual.mark_uploaded(bucket_name, object_key, records[object_key])
             print(f"  ✓ Success: {url}")
             
         except Exception as e:
             print(f"  ✗ Failed: {e}")
             failed.append(str(relative_path))
     
+    if perceptual is not None:
+        perceptual.save()
+    
     print("=" * 60)
     print(f"\nUpload Summary:")
     print(f"  ✅ Successfully uploaded: {len(uploaded)} images")
+    if perceptual is not None:
+        print(f"  ⏭️  Unchanged (not re-uploaded): {len(unchanged)} images")
     print(f"  ❌ Failed: {len(failed)} images")
     
     if failed:
@@ -128,11 +180,23 @@ def upload_images():
         for file in failed:
             print(f"  - {file}")
     else:
-        print(f"\nAll images uploaded successfully! GCS Base URL: https://storage.googleapis.com/{BUCKET_NAME}/")
+        print(f"\nAll images uploaded successfully! GCS Base URL: https://storage.googleapis.com/{bucket_name}/")
     
     return len(failed) == 0
 
 if __name__ == "__main__":
-    success = upload_images()
+    profile_prefix = pop_profile_argument(sys.argv)
+    try:
+        limiter = pop_bandwidth_arguments(sys.argv)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    skip_unchanged = pop_skip_unchanged_argument(sys.argv)
+    with profiled(profile_prefix, 'upload_images_to_gcs'):
+        if limiter is None:
+            success = upload_images(skip_unchanged=skip_unchanged)
+        else:
+            with limiter:
+                success = upload_images(limiter=limiter, skip_unchanged=skip_unchanged)
     exit(0 if success else 1)
 
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Load-test the upload path against the local GCS stand-in (no network needed).
+
+Builds a synthetic media tree (lesson audio/video as minimal MP4 containers
+with random payloads, infographic PNG stand-ins), starts local_gcs.LocalGCS
+with the requested latency, bandwidth cap and fault rates, then runs the real
+upload_all_media() and upload_images() against it with a client bound to the
+stand-in. Each run records files uploaded/failed, bytes, requests and faults
+by kind, and a throughput curve (server-side bytes/s per interval), and
+checks that every file landed intact under its own object key (size and MD5
+of the bytes the tool should have sent, i.e. the faststart output for MP4/M4A).
+
+Results are written to .cache/load_test/<timestamp>.json (--output to
+override); --plot also draws the throughput curves.
+
+Usage:
+    python upload_load_test.py
+    python upload_load_test.py --latency 0.05 --jitter 0.05 --fault-503 0.02 --fault-reset 0.01
+    python upload_load_test.py --bandwidth 40MB/s --client-bandwidth 20MB/s --plot curves.png
+"""
+
+import base64
+import contextlib
+import hashlib
+import io
+import json
+import os
+import struct
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict
+
+import numpy as np
+
+from bandwidth import limiter_from_options, parse_rate
+from local_gcs import LocalGCS
+from mp4_faststart import prepare_for_upload
+from upload_all_media import format_lesson_slug, upload_all_media
+from upload_asset import extract_lesson_number, folder_for_mime_type, guess_mime_type
+
+# Configuration
+SCRIPT_DIR = Path(__file__).parent
+GITBOOK_DIR = SCRIPT_DIR.parent
+RESULTS_DIR = GITBOOK_DIR / ".cache" / "load_test"
+
+MEDIA_BUCKET = 'load-test-media'
+IMAGES_BUCKET = 'load-test-images'
+
+
+def _box(box_type: bytes, payload: bytes) -> bytes:
+    return struct.pack('>I4s', 8 + len(payload), box_type) + payload
+
+
+def synthetic_mp4(path: Path, size: int, rng, duration_seconds: int = 60):
+    """ftyp + moov (mvhd only) + mdat of random bytes: already faststart, so uploaded as-is"""
+    ftyp = _box(b'ftyp', b'isom' + struct.pack('>I', 512) + b'isomiso2mp41')
+    # mvhd version 0: flags, created, modified, timescale, duration, rate, volume, reserved, matrix, pre-defined, next track
+    mvhd = _box(b'mvhd', struct.pack('>I4I', 0, 0, 0, 1000, duration_seconds * 1000) + struct.pack('>IH10x', 0x00010000, 0x0100)
+                + struct.pack('>9I', 0x00010000, 0, 0, 0, 0x00010000, 0, 0, 0, 0x40000000) + bytes(24)
+                + struct.pack('>I', 2))
+    moov = _box(b'moov', mvhd)
+    header = ftyp + moov
+    with open(path, 'wb') as f:
+        f.write(header)
+        f.write(struct.pack('>I4s', 8 + max(0, size - len(header) - 8), b'mdat'))
+        f.write(rng.bytes(max(0, size - len(header) - 8)))
+
+
+def build_tree(root: Path, rng, audio: int, audio_bytes: int, videos: int, video_bytes: int, images: int,
+               image_bytes: int) -> Dict[str, Path]:
+    """Synthetic audio/, videos/ and images/ folders laid out like the real book"""
+    audio_dir, video_dir, images_dir = root / 'audio', root / 'videos', root / 'images'
+    for folder in (audio_dir, video_dir, images_dir):
+        folder.mkdir(parents=True)
+    for index in range(audio):
+        synthetic_mp4(audio_dir / f"lesson{index % 12 + 1} Part {index // 12 + 1}.m4a", audio_bytes, rng)
+    for index in range(videos):
+        synthetic_mp4(video_dir / f"lesson{index % 12 + 1} video {index // 12 + 1}.mp4", video_bytes, rng)
+    for index in range(images):
+        lesson = index % 12 + 1
+        folder = images_dir / 'lessons' / f"lesson_{lesson:02d}"
+        folder.mkdir(parents=True, exist_ok=True)
+        # Random bytes behind a PNG signature: the uploader never decodes them
+        (folder / f"mm{lesson:02d}_{index // 12 + 1:02d}_load_test.png").write_bytes(
+            b'\x89PNG\r\n\x1a\n' + rng.bytes(max(0, image_bytes - 8)))
+    return {'audio': audio_dir, 'videos': video_dir, 'images': images_dir}
+
+
+def expected_object(path: Path) -> Dict:
+    """Size and base64 MD5 (as GCS reports it) of what uploading path should store"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        upload_path, temp_path = prepare_for_upload(path, guess_mime_type(path))
+    try:
+        data = Path(upload_path).read_bytes()
+    finally:
+        if temp_path:
+            os.remove(temp_path)
+    return {'bytes': len(data), 'md5': base64.b64encode(hashlib.md5(data).digest()).decode('ascii')}
+
+
+def expected_media(paths) -> Dict[str, Dict]:
+    """Object key -> expected object for upload_all_media (lesson-XX/<folder>/<name>)"""
+    return {f"{format_lesson_slug(extract_lesson_number(path.name))}/"
+            f"{folder_for_mime_type(guess_mime_type(path))}/{path.name}": expected_object(path)
+            for path in paths}
+
+
+def expected_images(images_dir: Path) -> Dict[str, Dict]:
+    """Object key -> expected object for upload_images (the path under images_dir)"""
+    return {path.relative_to(images_dir).as_posix(): expected_object(path) for path in images_dir.rglob('*.png')}
+
+
+def run_tool(server: LocalGCS, name: str, call: Callable, expected: Dict[str, Dict], bucket: str,
+             interval: float, verbose: bool) -> Dict:
+    """Run one upload tool with fresh server stats; returns its measurements"""
+    server.stats.reset()
+    started = time.perf_counter()
+    output = io.StringIO()
+    with contextlib.redirect_stdout(sys.stdout if verbose else output):
+        call()
+    elapsed = time.perf_counter() - started
+    stats = server.stats.snapshot()
+
+    # Each expected object must exist under its own key with the expected size and MD5
+    stored = server.store.objects.get(bucket, {})
+    intact = sum(1 for key, want in expected.items()
+                 if key in stored and len(stored[key].data) == want['bytes'] and stored[key].md5 == want['md5'])
+    curve = server.stats.throughput_curve(interval)
+    rates = np.array([rate for _, rate in curve]) if curve else np.zeros(1)
+    return {
+        'tool': name,
+        'files': len(expected),
+        'stored': len(stored),
+        'intact': intact,
+        'seconds': elapsed,
+        'bytes_expected': sum(want['bytes'] for want in expected.values()),
+        'bytes_received': stats['bytes_received'],
+        'mean_mb_s': sum(want['bytes'] for want in expected.values()) / elapsed / 1e6,
+        'peak_mb_s': float(rates.max()) / 1e6,
+        'requests': stats['requests'],
+        'faults': stats['faults'],
+        'curve': curve,
+    }
+
+
+def plot_curves(results, path: str, interval: float):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(12, 6.75), dpi=100)
+    try:
+        for result in results:
+            times = [moment for moment, _ in result['curve']]
+            rates = [rate / 1e6 for _, rate in result['curve']]
+            ax.step(times, rates, where='post', linewidth=2, label=f"{result['tool']} ({result['mean_mb_s']:.1f} MB/s mean)")
+        ax.set_xlabel(f"Seconds ({interval:g}s buckets)")
+        ax.set_ylabel('Received (MB/s)')
+        ax.set_title('Upload Throughput Against Local GCS', fontsize=16, fontweight='bold')
+        ax.grid(True, alpha=0.3)
+        ax.legend(loc='upper right')
+        fig.tight_layout()
+        fig.savefig(path, format='png')
+    finally:
+        plt.close(fig)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Load-test upload_all_media and upload_images_to_gcs against a local GCS')
+    parser.add_argument('--audio', type=int, default=12, help='Audio files (default: 12)')
+    parser.add_argument('--audio-mb', type=float, default=2.0, help='Size of each audio file (default: 2 MB)')
+    parser.add_argument('--videos', type=int, default=4, help='Video files (default: 4)')
+    parser.add_argument('--video-mb', type=float, default=20.0, help='Size of each video (default: 20 MB, resumable)')
+    parser.add_argument('--images', type=int, default=70, help='Images (default: 70)')
+    parser.add_argument('--image-kb', type=float, default=150.0, help='Size of each image (default: 150 KB)')
+    parser.add_argument('--latency', type=float, default=0.0, help='Server latency per request in seconds')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Extra random latency, up to this many seconds')
+    parser.add_argument('--bandwidth', help='Server-side cap on request bodies, e.g. 40MB/s')
+    parser.add_argument('--client-bandwidth', help='Client-side limiter (--bandwidth of the tools), e.g. 20MB/s')
+    parser.add_argument('--fault-429', type=float, default=0.0, help='Share of requests answered 429')
+    parser.add_argument('--fault-503', type=float, default=0.0, help='Share of requests answered 503')
+    parser.add_argument('--fault-reset', type=float, default=0.0, help='Share of connections reset')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the tree and the fault draws')
+    parser.add_argument('--interval', type=float, default=0.5, help='Throughput curve bucket in seconds (default: 0.5)')
+    parser.add_argument('--output', help=f'Results JSON (default: {RESULTS_DIR}/<timestamp>.json)')
+    parser.add_argument('--plot', help='Also plot the throughput curves to this PNG')
+    parser.add_argument('--verbose', action='store_true', help="Show the tools' own output")
+    args = parser.parse_args()
+
+    from upload_images_to_gcs import upload_images
+
+    try:
+        bandwidth = parse_rate(args.bandwidth) if args.bandwidth else None
+        limiter = limiter_from_options(args.client_bandwidth) if args.client_bandwidth else None
+    except ValueError as e:
+        parser.error(str(e))
+
+    rng = np.random.default_rng(args.seed)
+    config = {key: value for key, value in vars(args).items() if key not in ('output', 'plot', 'verbose')}
+
+    print("=" * 60)
+    print("Upload Load Test (local GCS)")
+    print("=" * 60)
+    print(f"Latency {args.latency * 1000:.0f} ms (+{args.jitter * 1000:.0f}), server cap {args.bandwidth or 'none'}, "
+          f"client cap {args.client_bandwidth or 'none'}")
+    print(f"Faults: 429 {args.fault_429:.1%}, 503 {args.fault_503:.1%}, reset {args.fault_reset:.1%}")
+    print()
+
+    with tempfile.TemporaryDirectory(prefix='upload_load_test_') as temp_dir:
+        tree = build_tree(Path(temp_dir), rng, args.audio, int(args.audio_mb * 1e6), args.videos,
+                          int(args.video_mb * 1e6), args.images, int(args.image_kb * 1e3))
+        media_expected = expected_media(list(tree['audio'].glob('*.m4a')) + list(tree['videos'].glob('*.mp4')))
+        image_expected = expected_images(tree['images'])
+
+        with LocalGCS(latency=args.latency, jitter=args.jitter, bandwidth=bandwidth, fault_429=args.fault_429,
+                      fault_503=args.fault_503, fault_reset=args.fault_reset, seed=args.seed) as server:
+            server.store.create_bucket(MEDIA_BUCKET)
+            server.store.create_bucket(IMAGES_BUCKET)
+            client = server.client()
+            results = []
+            context = limiter if limiter is not None else contextlib.nullcontext()
+            with context:
+                results.append(run_tool(
+                    server, 'upload_all_media',
+                    lambda: upload_all_media(tree['audio'], tree['videos'], MEDIA_BUCKET, client, limiter),
+                    media_expected, MEDIA_BUCKET, args.interval, args.verbose))
+                results.append(run_tool(
+                    server, 'upload_images_to_gcs',
+                    lambda: upload_images(tree['images'], IMAGES_BUCKET, client, limiter),
+                    image_expected, IMAGES_BUCKET, args.interval, args.verbose))
+
+    status = 0
+    for result in results:
+        missing = result['files'] - result['intact']
+        status = status or (1 if missing else 0)
+        requests = sum(result['requests'].values())
+        print(f"{'✅' if not missing else '❌'} {result['tool']}: {result['intact']}/{result['files']} files intact, "
+              f"{result['bytes_expected'] / 1e6:.1f} MB in {result['seconds']:.1f}s "
+              f"({result['mean_mb_s']:.1f} MB/s mean, {result['peak_mb_s']:.1f} MB/s peak)")
+        print(f"   Requests: {requests} ({', '.join(f'{kind} {count}' for kind, count in sorted(result['requests'].items()))})")
+        if result['faults']:
+            print(f"   Injected faults: {', '.join(f'{kind} {count}' for kind, count in sorted(result['faults'].items()))}")
+        overhead = result['bytes_received'] / result['bytes_expected'] - 1 if result['bytes_expected'] else 0.0
+        print(f"   Bytes received: {result['bytes_received'] / 1e6:.1f} MB ({overhead:+.1%} vs. payload)")
+        print()
+
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({'config': config, 'results': results}, f, indent=2)
+    print(f"Results: {output}")
+    if args.plot:
+        plot_curves(results, args.plot, args.interval)
+        print(f"Plot: {args.plot}")
+    print()
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,526 @@
+#!/usr/bin/env python3
+"""
+Exact fixed-point interest accrual, as Aave v3 does it on-chain (lessons 2 and 5).
+
+Scalar part: Python integers replicating WadRayMath, PercentageMath and
+MathUtils (linear supply interest, the three-term Taylor approximation of
+compounded borrow interest), ReserveLogic's index and treasury updates, the
+default interest rate strategy and scaled (a/debt token) balances. Every
+function rounds exactly like the Solidity library it mirrors, so results are
+bit-identical to the contracts.
+
+Batch part: the same formulas on numpy arrays of base-10^9 limbs (a ray is
+exactly three limbs, so dividing by RAY is dropping limbs). Interest factors
+for every (step, market) pair are independent and computed in one vectorized
+pass; only the index multiplication itself is sequential, and it runs for all
+markets at once. normalized_batch evaluates the view functions
+(getNormalizedIncome / getNormalizedDebt) at any number of timestamps with no
+sequential dependency at all.
+
+Modelled on Aave v3.0 (variable debt only; no stable rate, no unbacked
+supply beyond the usage ratio term).
+"""
+
+import sys
+import time
+from typing import Dict, Sequence
+
+import numpy as np
+
+WAD = 10 ** 18
+HALF_WAD = WAD // 2
+RAY = 10 ** 27
+HALF_RAY = RAY // 2
+WAD_RAY_RATIO = 10 ** 9
+HALF_WAD_RAY_RATIO = WAD_RAY_RATIO // 2
+PERCENTAGE_FACTOR = 10 ** 4
+HALF_PERCENTAGE_FACTOR = PERCENTAGE_FACTOR // 2
+SECONDS_PER_YEAR = 365 * 86400
+UINT256_MAX = 2 ** 256 - 1
+
+
+# WadRayMath / PercentageMath (uint256: inputs must be non-negative, overflow reverts)
+
+def wad_mul(a: int, b: int) -> int:
+    if b and a > (UINT256_MAX - HALF_WAD) // b:
+        raise OverflowError("wad_mul overflow")
+    return (a * b + HALF_WAD) // WAD
+
+
+def wad_div(a: int, b: int) -> int:
+    if b == 0 or a > (UINT256_MAX - b // 2) // WAD:
+        raise OverflowError("wad_div overflow or division by zero")
+    return (a * WAD + b // 2) // b
+
+
+def ray_mul(a: int, b: int) -> int:
+    if b and a > (UINT256_MAX - HALF_RAY) // b:
+        raise OverflowError("ray_mul overflow")
+    return (a * b + HALF_RAY) // RAY
+
+
+def ray_div(a: int, b: int) -> int:
+    if b == 0 or a > (UINT256_MAX - b // 2) // RAY:
+        raise OverflowError("ray_div overflow or division by zero")
+    return (a * RAY + b // 2) // b
+
+
+def ray_to_wad(a: int) -> int:
+    quotient, remainder = divmod(a, WAD_RAY_RATIO)
+    return quotient + (1 if remainder >= HALF_WAD_RAY_RATIO else 0)
+
+
+def wad_to_ray(a: int) -> int:
+    return a * WAD_RAY_RATIO
+
+
+def percent_mul(value: int, percentage: int) -> int:
+    if percentage and value > (UINT256_MAX - HALF_PERCENTAGE_FACTOR) // percentage:
+        raise OverflowError("percent_mul overflow")
+    return (value * percentage + HALF_PERCENTAGE_FACTOR) // PERCENTAGE_FACTOR
+
+
+def percent_div(value: int, percentage: int) -> int:
+    if percentage == 0 or value > (UINT256_MAX - percentage // 2) // PERCENTAGE_FACTOR:
+        raise OverflowError("percent_div overflow or division by zero")
+    return (value * PERCENTAGE_FACTOR + percentage // 2) // percentage
+
+
+# MathUtils
+
+def calculate_linear_interest(rate: int, last_update: int, now: int) -> int:
+    """RAY + rate x elapsed / year (supply side)"""
+    return RAY + rate * (now - last_update) // SECONDS_PER_YEAR
+
+
+def calculate_compounded_interest(rate: int, last_update: int, now: int) -> int:
+    """(1 + rate / year)^elapsed via the binomial expansion truncated after the cubic term (borrow side)"""
+    exp = now - last_update
+    if exp == 0:
+        return RAY
+    exp_minus_one = exp - 1
+    exp_minus_two = exp - 2 if exp > 2 else 0
+    base_power_two = ray_mul(rate, rate) // (SECONDS_PER_YEAR * SECONDS_PER_YEAR)
+    base_power_three = ray_mul(base_power_two, rate) // SECONDS_PER_YEAR
+    second_term = exp * exp_minus_one * base_power_two // 2
+    third_term = exp * exp_minus_one * exp_minus_two * base_power_three // 6
+    return RAY + rate * exp // SECONDS_PER_YEAR + second_term + third_term
+
+
+def overall_borrow_rate(total_stable_debt: int, total_variable_debt: int, variable_rate: int,
+                        average_stable_rate: int = 0) -> int:
+    """_getOverallBorrowRate: debt-weighted borrow rate, round-tripped through ray like the contract"""
+    total_debt = total_stable_debt + total_variable_debt
+    if total_debt == 0:
+        return 0
+    weighted_variable_rate = ray_mul(wad_to_ray(total_variable_debt), variable_rate)
+    weighted_stable_rate = ray_mul(wad_to_ray(total_stable_debt), average_stable_rate)
+    return ray_div(weighted_variable_rate + weighted_stable_rate, wad_to_ray(total_debt))
+
+
+class InterestRateStrategy:
+    """DefaultReserveInterestRateStrategy (variable rate only); all parameters in ray"""
+
+    def __init__(self, optimal_usage_ratio: int, base_variable_borrow_rate: int, variable_rate_slope1: int,
+                 variable_rate_slope2: int):
+        self.optimal_usage_ratio = optimal_usage_ratio
+        self.max_excess_usage_ratio = RAY - optimal_usage_ratio
+        self.base_variable_borrow_rate = base_variable_borrow_rate
+        self.variable_rate_slope1 = variable_rate_slope1
+        self.variable_rate_slope2 = variable_rate_slope2
+
+    @classmethod
+    def from_percentages(cls, optimal: float, base: float, slope1: float, slope2: float) -> 'InterestRateStrategy':
+        """Parameters given as fractions, e.g. (0.9, 0.0, 0.04, 0.6)"""
+        return cls(*(int(round(value * 10 ** 9)) * WAD_RAY_RATIO * 10 ** 9 for value in (optimal, base, slope1, slope2)))
+
+    def calculate_rates(self, available_liquidity: int, total_debt: int, reserve_factor: int, unbacked: int = 0):
+        """(liquidity rate, variable borrow rate) in ray; reserve_factor in basis points"""
+        borrow_usage_ratio = supply_usage_ratio = 0
+        if total_debt:
+            liquidity_plus_debt = available_liquidity + total_debt
+            borrow_usage_ratio = ray_div(total_debt, liquidity_plus_debt)
+            supply_usage_ratio = ray_div(total_debt, liquidity_plus_debt + unbacked)
+
+        borrow_rate = self.base_variable_borrow_rate
+        if borrow_usage_ratio > self.optimal_usage_ratio:
+            excess = ray_div(borrow_usage_ratio - self.optimal_usage_ratio, self.max_excess_usage_ratio)
+            borrow_rate += self.variable_rate_slope1 + ray_mul(self.variable_rate_slope2, excess)
+        else:
+            borrow_rate += ray_div(ray_mul(self.variable_rate_slope1, borrow_usage_ratio), self.optimal_usage_ratio)
+
+        # Even with no stable debt the overall rate is rounded through rayMul/rayDiv, which shifts it by a few wei
+        liquidity_rate = percent_mul(ray_mul(overall_borrow_rate(0, total_debt, borrow_rate), supply_usage_ratio),
+                                     PERCENTAGE_FACTOR - reserve_factor)
+        return liquidity_rate, borrow_rate
+
+
+class Reserve:
+    """
+    One reserve's indexes, rates and scaled totals, updated like ReserveLogic.
+
+    Amounts are in the asset's smallest unit; user balances are scaled by
+    the index at the time of each action, as the aToken and variable debt
+    token store them.
+    """
+
+    def __init__(self, strategy: InterestRateStrategy, reserve_factor: int = 1000, timestamp: int = 0):
+        self.strategy = strategy
+        self.reserve_factor = reserve_factor
+        self.liquidity_index = RAY
+        self.variable_borrow_index = RAY
+        self.current_liquidity_rate = 0
+        self.current_variable_borrow_rate = 0
+        self.last_update_timestamp = timestamp
+        self.available_liquidity = 0
+        self.scaled_a_token_supply = 0
+        self.scaled_variable_debt = 0
+        self.accrued_to_treasury = 0
+        self.supplied: Dict[str, int] = {}
+        self.borrowed: Dict[str, int] = {}
+
+    def normalized_income(self, now: int) -> int:
+        if now == self.last_update_timestamp:
+            return self.liquidity_index
+        return ray_mul(calculate_linear_interest(self.current_liquidity_rate, self.last_update_timestamp, now),
+                       self.liquidity_index)
+
+    def normalized_debt(self, now: int) -> int:
+        if now == self.last_update_timestamp:
+            return self.variable_borrow_index
+        return ray_mul(calculate_compounded_interest(self.current_variable_borrow_rate, self.last_update_timestamp, now),
+                       self.variable_borrow_index)
+
+    def update_state(self, now: int):
+        """ReserveLogic.updateState: indexes, then the reserve factor's share of new debt to the treasury"""
+        if now == self.last_update_timestamp:
+            return
+        previous_borrow_index = self.variable_borrow_index
+        if self.current_liquidity_rate:
+            self.liquidity_index = ray_mul(
+                calculate_linear_interest(self.current_liquidity_rate, self.last_update_timestamp, now),
+                self.liquidity_index)
+        if self.scaled_variable_debt:
+            self.variable_borrow_index = ray_mul(
+                calculate_compounded_interest(self.current_variable_borrow_rate, self.last_update_timestamp, now),
+                self.variable_borrow_index)
+
+        debt_accrued = (ray_mul(self.scaled_variable_debt, self.variable_borrow_index)
+                        - ray_mul(self.scaled_variable_debt, previous_borrow_index))
+        to_mint = percent_mul(debt_accrued, self.reserve_factor)
+        if to_mint:
+            self.accrued_to_treasury += ray_div(to_mint, self.liquidity_index)
+        self.last_update_timestamp = now
+
+    def update_rates(self, liquidity_added: int = 0, liquidity_taken: int = 0):
+        self.available_liquidity += liquidity_added - liquidity_taken
+        total_debt = ray_mul(self.scaled_variable_debt, self.variable_borrow_index)
+        self.current_liquidity_rate, self.current_variable_borrow_rate = self.strategy.calculate_rates(
+            self.available_liquidity, total_debt, self.reserve_factor)
+
+    def supply(self, user: str, amount: int, now: int):
+        self.update_state(now)
+        scaled = ray_div(amount, self.liquidity_index)
+        if scaled == 0:
+            raise ValueError("Invalid mint amount")
+        self.supplied[user] = self.supplied.get(user, 0) + scaled
+        self.scaled_a_token_supply += scaled
+        self.update_rates(liquidity_added=amount)
+
+    def withdraw(self, user: str, amount: int, now: int):
+        self.update_state(now)
+        scaled = ray_div(amount, self.liquidity_index)
+        if scaled == 0 or scaled > self.supplied.get(user, 0):
+            raise ValueError("Invalid burn amount")
+        self.supplied[user] -= scaled
+        self.scaled_a_token_supply -= scaled
+        self.update_rates(liquidity_taken=amount)
+
+    def borrow(self, user: str, amount: int, now: int):
+        self.update_state(now)
+        scaled = ray_div(amount, self.variable_borrow_index)
+        if scaled == 0:
+            raise ValueError("Invalid mint amount")
+        self.borrowed[user] = self.borrowed.get(user, 0) + scaled
+        self.scaled_variable_debt += scaled
+        self.update_rates(liquidity_taken=amount)
+
+    def repay(self, user: str, amount: int, now: int):
+        self.update_state(now)
+        scaled = ray_div(amount, self.variable_borrow_index)
+        if scaled == 0 or scaled > self.borrowed.get(user, 0):
+            raise ValueError("Invalid burn amount")
+        self.borrowed[user] -= scaled
+        self.scaled_variable_debt -= scaled
+        self.update_rates(liquidity_added=amount)
+
+    def supply_balance(self, user: str, now: int) -> int:
+        return ray_mul(self.supplied.get(user, 0), self.normalized_income(now))
+
+    def debt_balance(self, user: str, now: int) -> int:
+        return ray_mul(self.borrowed.get(user, 0), self.normalized_debt(now))
+
+
+# Batch arithmetic: non-negative integers as int64 arrays of base-10^9 limbs,
+# least significant first, shape (limbs, *batch)
+
+LIMB = 10 ** 9
+LIMBS = 4  # values below 10^36 (an index of 10^9 x RAY)
+_HALF_RAY_LIMB = 2  # HALF_RAY = 5 x 10^8 in limb 2
+_RAY_LIMB = 3  # RAY = 1 in limb 3
+
+
+def to_limbs(values, limbs: int = LIMBS) -> np.ndarray:
+    """Python ints (any iterable or nested sequence) to an int64 limb array"""
+    values = np.asarray(values, dtype=object)
+    out = np.zeros((limbs,) + values.shape, dtype=np.int64)
+    remaining = values.copy()
+    for i in range(limbs):
+        out[i] = (remaining % LIMB).astype(np.int64)
+        remaining = remaining // LIMB
+    if np.any(remaining != 0):
+        raise OverflowError(f"value does not fit in {limbs} limbs")
+    return out
+
+
+def from_limbs(limbs: np.ndarray):
+    """Limb array back to Python ints (an object array with the batch shape)"""
+    total = np.zeros(limbs.shape[1:], dtype=object)
+    for i in range(limbs.shape[0] - 1, -1, -1):
+        total = total * LIMB + limbs[i].astype(object)
+    return total
+
+
+def limbs_to_float(limbs: np.ndarray, scale: int = RAY) -> np.ndarray:
+    """Approximate float value / scale, for charts and summaries"""
+    powers = float(LIMB) ** np.arange(limbs.shape[0]) / scale
+    return np.tensordot(powers, limbs.astype(float), axes=1)
+
+
+def _normalize(a: np.ndarray) -> np.ndarray:
+    """Propagate carries in place until every limb is below LIMB"""
+    while True:
+        carry = a[:-1] // LIMB
+        if not carry.any():
+            if a[-1].max(initial=0) >= LIMB:
+                raise OverflowError("limb array overflow")
+            return a
+        a[:-1] -= carry * LIMB
+        a[1:] += carry
+
+
+def _mul(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Exact product; column sums stay below 9.2e18 for up to 9 limbs per factor"""
+    out = np.zeros((a.shape[0] + b.shape[0],) + np.broadcast(a[0], b[0]).shape, dtype=np.int64)
+    for i in range(a.shape[0]):
+        out[i:i + b.shape[0]] += a[i] * b
+    return _normalize(out)
+
+
+def _mul_small(a: np.ndarray, factor) -> np.ndarray:
+    """a x factor for 0 <= factor < LIMB (broadcast over the batch)"""
+    out = np.zeros((a.shape[0] + 1,) + np.broadcast(a[0], factor).shape, dtype=np.int64)
+    out[:-1] = a * factor
+    return _normalize(out)
+
+
+def _div_small(a: np.ndarray, divisor: int) -> np.ndarray:
+    """floor(a / divisor) for divisor < 9.2e9 (long division from the top limb)"""
+    out = np.empty_like(a)
+    remainder = np.zeros(a.shape[1:], dtype=np.int64)
+    for i in range(a.shape[0] - 1, -1, -1):
+        current = remainder * LIMB + a[i]
+        out[i] = current // divisor
+        remainder = current - out[i] * divisor
+    return out
+
+
+def _add(*terms: np.ndarray) -> np.ndarray:
+    size = max(term.shape[0] for term in terms)
+    shape = np.broadcast(*(term[0] for term in terms)).shape
+    out = np.zeros((size + 1,) + shape, dtype=np.int64)
+    for term in terms:
+        out[:term.shape[0]] += term
+    return _normalize(out)
+
+
+def _fit(a: np.ndarray, limbs: int = LIMBS) -> np.ndarray:
+    """Drop leading limbs, which must be zero"""
+    if a.shape[0] > limbs and a[limbs:].any():
+        raise OverflowError(f"value does not fit in {limbs} limbs")
+    return a[:limbs]
+
+
+def ray_mul_batch(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Vectorized ray_mul: (a x b + HALF_RAY) / RAY"""
+    product = _mul(a, b)
+    product[_HALF_RAY_LIMB] += HALF_RAY // LIMB ** _HALF_RAY_LIMB
+    return _fit(_normalize(product)[_RAY_LIMB:])
+
+
+def linear_interest_batch(rate: np.ndarray, exp) -> np.ndarray:
+    """Vectorized calculate_linear_interest for elapsed seconds exp (< 10^9)"""
+    growth = _div_small(_mul_small(rate, exp), SECONDS_PER_YEAR)
+    growth[_RAY_LIMB] += 1
+    return _fit(_normalize(growth))
+
+
+def compounded_interest_batch(rate: np.ndarray, exp) -> np.ndarray:
+    """Vectorized calculate_compounded_interest for elapsed seconds exp (< 10^9); exp = 0 gives RAY"""
+    exp = np.asarray(exp, dtype=np.int64)
+    if exp.size and (exp.min() < 0 or exp.max() >= LIMB):
+        raise ValueError("elapsed seconds must be in [0, 10^9)")
+    exp_minus_one = np.maximum(exp - 1, 0)
+    exp_minus_two = np.maximum(exp - 2, 0)
+    # floor(floor(x / y) / y) == floor(x / y^2), so year^2 can be divided out in two steps
+    base_power_two = _div_small(_div_small(ray_mul_batch(rate, rate), SECONDS_PER_YEAR), SECONDS_PER_YEAR)
+    base_power_three = _div_small(ray_mul_batch(base_power_two, rate), SECONDS_PER_YEAR)
+    first = _div_small(_mul_small(rate, exp), SECONDS_PER_YEAR)
+    second = _div_small(_mul_small(_mul_small(base_power_two, exp), exp_minus_one), 2)
+    third = _div_small(_mul_small(_mul_small(_mul_small(base_power_three, exp), exp_minus_one), exp_minus_two), 6)
+    total = _add(first, second, third)
+    total[_RAY_LIMB] += 1
+    return _fit(_normalize(total))
+
+
+def ray_limbs_from_fractions(values, decimals: int = 9) -> np.ndarray:
+    """Rates given as fractions (0.05 = 5%) rounded to `decimals` places, as ray limbs, without Python ints"""
+    if decimals > 18:
+        raise ValueError("at most 18 decimals")
+    units = np.round(np.asarray(values, dtype=float) * 10.0 ** decimals).astype(np.int64)
+    # value = units x 10^(27 - decimals) = units x 10^shift x 10^(9 x whole)
+    whole, shift = divmod(27 - decimals, 9)
+    scaled = units * 10 ** shift
+    out = np.zeros((LIMBS,) + units.shape, dtype=np.int64)
+    out[whole] = scaled % LIMB
+    out[whole + 1] = scaled // LIMB
+    return _fit(_normalize(out))
+
+
+def accrue_batch(liquidity_index: np.ndarray, borrow_index: np.ndarray, liquidity_rates: np.ndarray,
+                 borrow_rates: np.ndarray, timestamps: Sequence[int], record_every: int = 0,
+                 block_steps: int = 2048) -> Dict[str, np.ndarray]:
+    """
+    Sequential updateState at every timestamp, for many markets at once (all values as limbs).
+
+    liquidity_index / borrow_index: (LIMBS, markets) starting indexes.
+    liquidity_rates / borrow_rates: (LIMBS, steps, markets), the rates in
+    force between timestamps[k] and timestamps[k + 1]. A market with no
+    variable debt should carry a zero borrow rate (its index then stays put,
+    as on-chain). Long horizons can be run in chunks by feeding the returned
+    indexes back in. record_every > 0 also returns the indexes every that
+    many steps, shape (LIMBS, records, markets).
+    """
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    steps = len(timestamps) - 1
+    markets = liquidity_index.shape[1]
+    # Both indexes advance together: columns [0, markets) supply, [markets, 2 markets) borrow
+    index = np.concatenate([liquidity_index, borrow_index], axis=1)
+    recorded = []
+
+    for block_start in range(0, steps, block_steps):
+        block_end = min(steps, block_start + block_steps)
+        elapsed = np.diff(timestamps[block_start:block_end + 1])[:, None]
+        # Interest factors do not depend on the indexes: one vectorized pass per block
+        factors = np.concatenate([
+            linear_interest_batch(liquidity_rates[:, block_start:block_end], elapsed),
+            compounded_interest_batch(borrow_rates[:, block_start:block_end], elapsed),
+        ], axis=2)
+        for k in range(block_end - block_start):
+            index = ray_mul_batch(factors[:, k], index)
+            if record_every and (block_start + k + 1) % record_every == 0:
+                recorded.append(index)
+
+    result = {'liquidity_index': index[:, :markets], 'variable_borrow_index': index[:, markets:]}
+    if record_every:
+        path = np.stack(recorded, axis=1) if recorded else np.zeros((LIMBS, 0, 2 * markets), dtype=np.int64)
+        result['liquidity_path'] = path[:, :, :markets]
+        result['borrow_path'] = path[:, :, markets:]
+    return result
+
+
+def normalized_batch(index: np.ndarray, rate: np.ndarray, last_update, timestamps,
+                     compounded: bool = True) -> np.ndarray:
+    """
+    getNormalizedDebt (compounded) or getNormalizedIncome at every timestamp for every market.
+
+    index, rate: (LIMBS, markets) limbs; last_update: (markets,) seconds.
+    Returns limbs of shape (LIMBS, len(timestamps), markets); use from_limbs
+    for exact ints or limbs_to_float for plotting.
+    """
+    elapsed = np.asarray(timestamps, dtype=np.int64)[:, None] - np.asarray(last_update, dtype=np.int64)[None, :]
+    if elapsed.min(initial=0) < 0:
+        raise ValueError("timestamps must not precede last_update")
+    interest = (compounded_interest_batch if compounded else linear_interest_batch)(rate[:, None, :], elapsed)
+    return ray_mul_batch(interest, index[:, None, :])
+
+
+def random_rates(markets: int, steps: int, rng) -> np.ndarray:
+    """Borrow and supply rate fractions for a benchmark, shape (2, steps, markets)"""
+    borrow = rng.uniform(0.01, 0.4, (1, markets)) * rng.uniform(0.9, 1.1, (steps, markets))
+    supply = borrow * rng.uniform(0.3, 0.9, (1, markets))
+    return np.stack([supply, borrow])
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Exact Aave v3 index accrual (ray math): batch run checked against the scalar engine')
+    parser.add_argument('--markets', type=int, default=300, help='Markets accrued together (default: 300)')
+    parser.add_argument('--days', type=float, default=30, help='Simulated period (default: 30)')
+    parser.add_argument('--interval', type=int, default=12, help='Seconds between index updates (default: 12, one block)')
+    parser.add_argument('--verify', type=int, default=2, help='Markets re-run with the scalar engine (default: 2)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed for the rate paths')
+    args = parser.parse_args()
+
+    steps = int(args.days * 86400 // args.interval)
+    chunk = max(1, min(steps, 100_000))
+    rng = np.random.default_rng(args.seed)
+    verify = min(args.verify, args.markets)
+
+    print("=" * 60)
+    print(f"Ray Math Accrual: {args.markets:,} markets x {steps:,} updates ({args.days:g} days every {args.interval}s)")
+    print("=" * 60)
+
+    ones = to_limbs([RAY] * args.markets)
+    liquidity, borrow = ones, ones.copy()
+    scalar = [[RAY, RAY] for _ in range(verify)]
+    batch_elapsed = scalar_elapsed = 0.0
+    for offset in range(0, steps, chunk):
+        count = min(chunk, steps - offset)
+        timestamps = (offset + np.arange(count + 1, dtype=np.int64)) * args.interval
+        fractions = random_rates(args.markets, count, rng)
+        started = time.perf_counter()
+        rates = ray_limbs_from_fractions(fractions)
+        result = accrue_batch(liquidity, borrow, rates[:, 0], rates[:, 1], timestamps)
+        liquidity, borrow = result['liquidity_index'], result['variable_borrow_index']
+        batch_elapsed += time.perf_counter() - started
+
+        started = time.perf_counter()
+        units = np.round(fractions[:, :, :verify] * 1e9).astype(np.int64).tolist()
+        for market in range(verify):
+            supply_index, borrow_index = scalar[market]
+            for k in range(count):
+                t0, t1 = int(timestamps[k]), int(timestamps[k + 1])
+                supply_index = ray_mul(calculate_linear_interest(units[0][k][market] * 10 ** 18, t0, t1), supply_index)
+                borrow_index = ray_mul(calculate_compounded_interest(units[1][k][market] * 10 ** 18, t0, t1), borrow_index)
+            scalar[market] = [supply_index, borrow_index]
+        scalar_elapsed += time.perf_counter() - started
+
+    print(f"Batch: {batch_elapsed:.2f}s ({args.markets * steps * 2 / batch_elapsed / 1e6:.2f}M index updates/s)")
+    liquidity_ints, borrow_ints = from_limbs(liquidity), from_limbs(borrow)
+    mismatches = sum(1 for market in range(verify)
+                     if scalar[market] != [liquidity_ints[market], borrow_ints[market]])
+    if verify:
+        print(f"Scalar: {verify} market(s) in {scalar_elapsed:.2f}s "
+              f"(~{scalar_elapsed / verify * args.markets:.0f}s for all {args.markets:,})")
+        print(f"{'❌' if mismatches else '✅'} {mismatches} of {verify} checked market(s) differ from the scalar engine")
+    print()
+    for market in range(min(3, args.markets)):
+        print(f"  Market {market}: liquidity index {liquidity_ints[market]}, borrow index {borrow_ints[market]}")
+    print()
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
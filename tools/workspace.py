@@ -0,0 +1,509 @@
+#!/usr/bin/env python3
+"""
+Run the publishing tools across several GitBook books in one invocation.
+
+A workspace file lists the books, each with its own content root, spec files,
+image output tree and buckets:
+
+    {"cache_dir": ".cache",
+     "books": [
+       {"name": "money-markets", "root": "money-markets/gitbook",
+        "asset_specs": "assets/infographics/scripts/money_markets_asset_specs.json",
+        "chart_specs": "assets/infographics/scripts/money_markets_chart_specs.json",
+        "images": "assets/infographics/output/money-markets",
+        "media_bucket": "money-markets-media", "images_bucket": "money-markets-gitbook-images"},
+       {"name": "perps", "root": "perps/gitbook", "media_bucket": "perps-media", ...}]}
+
+Paths are relative to the workspace file. Books run in parallel threads that
+share one storage client (and its connection pool), one directory inventory
+and the URL-keyed caches; per-book caches live under the workspace cache dir.
+Each book's output is buffered and printed as a block when the book finishes.
+
+Without a workspace file, the single book this script lives in is used, with
+the same paths and buckets the tools default to.
+"""
+
+import contextvars
+import fnmatch
+import io
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from bandwidth import add_bandwidth_arguments, limiter_from_options
+
+# Configuration
+SCRIPT_DIR = Path(__file__).parent
+GITBOOK_DIR = SCRIPT_DIR.parent
+INFOGRAPHICS_DIR = GITBOOK_DIR.parent.parent.parent / "assets" / "infographics"
+
+
+class Inventory:
+    """
+    Directory listings shared across tools and books.
+
+    Each directory is listed once; later lookups match patterns against the
+    cached names instead of globbing the filesystem again.
+    """
+
+    def __init__(self):
+        self._listings: Dict[Path, List[str]] = {}
+        self._lock = threading.Lock()
+
+    def files(self, directory: Path, pattern: str = '*') -> List[Path]:
+        directory = Path(directory)
+        with self._lock:
+            names = self._listings.get(directory)
+            if names is None:
+                names = sorted(entry.name for entry in os.scandir(directory) if entry.is_file()) \
+                    if directory.is_dir() else []
+                self._listings[directory] = names
+        return [directory / name for name in fnmatch.filter(names, pattern)]
+
+    def invalidate(self, directory: Optional[Path] = None):
+        with self._lock:
+            if directory is None:
+                self._listings.clear()
+            else:
+                self._listings.pop(Path(directory), None)
+
+
+class Book:
+    """Paths and buckets of one GitBook book"""
+
+    def __init__(self, name: str, root: Path, content_dir: Optional[Path] = None,
+                 asset_specs: Optional[Path] = None, chart_specs: Optional[Path] = None,
+                 images_source: Optional[Path] = None, media_bucket: Optional[str] = None,
+                 images_bucket: Optional[str] = None):
+        self.name = name
+        self.root = Path(root)
+        self.content_dir = Path(content_dir) if content_dir else self.root / "content"
+        self.lessons_dir = self.content_dir / "lessons"
+        self.exercises_dir = self.content_dir / "exercises"
+        self.quizzes_dir = self.content_dir / "quizzes"
+        self.audio_dir = self.content_dir / "audio"
+        self.video_dir = self.content_dir / "videos"
+        self.asset_specs = Path(asset_specs) if asset_specs else None
+        self.chart_specs = Path(chart_specs) if chart_specs else None
+        self.images_source = Path(images_source) if images_source else None
+        self.media_bucket = media_bucket
+        self.images_bucket = images_bucket
+
+    def __repr__(self):
+        return f"Book({self.name!r}, {self.root})"
+
+
+def default_book() -> Book:
+    """The book this tools/ folder belongs to, with the tools' built-in defaults"""
+    return Book(
+        name=GITBOOK_DIR.name,
+        root=GITBOOK_DIR,
+        asset_specs=INFOGRAPHICS_DIR / "scripts" / "money_markets_asset_specs.json",
+        chart_specs=INFOGRAPHICS_DIR / "scripts" / "money_markets_chart_specs.json",
+        images_source=INFOGRAPHICS_DIR / "output" / "money-markets",
+        media_bucket="money-markets-media",
+        images_bucket="money-markets-gitbook-images",
+    )
+
+
+class Workspace:
+    """Books plus the resources every tool run shares"""
+
+    def __init__(self, books: List[Book], cache_dir: Optional[Path] = None):
+        self.books = books
+        self.cache_dir = Path(cache_dir) if cache_dir else GITBOOK_DIR / ".cache"
+        self.inventory = Inventory()
+        self._client = None
+        self._client_lock = threading.Lock()
+        self._shared_caches: Dict[str, Dict] = {}
+        self._cache_lock = threading.Lock()
+        # Optional bandwidth.BandwidthLimiter; one cap across every book's uploads
+        self.limiter = None
+
+    def storage_client(self):
+        """One authenticated storage client for all books (created on first use)"""
+        with self._client_lock:
+            if self._client is None:
+                from upload_asset import get_storage_client
+                self._client = get_storage_client()
+            return self._client
+
+    def cache_path(self, tool: str, book: Book) -> Path:
+        """Per-book cache file of a tool inside the workspace cache dir"""
+        return self.cache_dir / tool / f"{book.name}.json"
+
+    def shared_cache(self, name: str) -> Dict:
+        """URL- or path-keyed cache shared by every book; saved by save_shared_caches()"""
+        with self._cache_lock:
+            if name not in self._shared_caches:
+                path = self.cache_dir / f"{name}.json"
+                try:
+                    with open(path, 'r') as f:
+                        self._shared_caches[name] = json.load(f)
+                except (OSError, json.JSONDecodeError):
+                    self._shared_caches[name] = {}
+            return self._shared_caches[name]
+
+    def save_shared_caches(self):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        for name, cache in self._shared_caches.items():
+            with open(self.cache_dir / f"{name}.json", 'w') as f:
+                json.dump(cache, f, indent=2, sort_keys=True)
+
+    def run(self, task: Callable[[Book], int], books: Optional[List[Book]] = None,
+            workers: Optional[int] = None) -> Dict[str, int]:
+        """Run task(book) for every book in parallel; returns exit status per book"""
+        books = books if books is not None else self.books
+        results: Dict[str, int] = {}
+        output = _BookOutput.install()
+        print_lock = threading.Lock()
+
+        def run_book(book: Book):
+            output.start_capture()
+            try:
+                status = task(book)
+            except Exception as e:
+                print(f"❌ {book.name}: {e}")
+                status = 1
+            text = output.stop_capture()
+            with print_lock:
+                output.write_direct(f"\n{'#' * 60}\n# {book.name}\n{'#' * 60}\n{text}")
+            results[book.name] = status or 0
+
+        try:
+            with ThreadPoolExecutor(max_workers=workers or len(books) or 1) as executor:
+                list(executor.map(run_book, books))
+        finally:
+            output.uninstall()
+        self.save_shared_caches()
+        return results
+
+
+class _BookOutput(io.TextIOBase):
+    """
+    stdout replacement that buffers each book's prints separately.
+
+    The buffer lives in a context variable, so tools that run their own worker
+    threads in a copy of the caller's context (contextvars.copy_context) keep
+    writing to the book's buffer instead of the terminal.
+    """
+
+    def __init__(self, original):
+        self.original = original
+        self.buffer = contextvars.ContextVar('book_output', default=None)
+
+    @classmethod
+    def install(cls) -> '_BookOutput':
+        output = cls(sys.stdout)
+        sys.stdout = output
+        return output
+
+    def uninstall(self):
+        sys.stdout = self.original
+
+    def start_capture(self):
+        self.buffer.set(io.StringIO())
+
+    def stop_capture(self) -> str:
+        text = self.buffer.get().getvalue()
+        self.buffer.set(None)
+        return text
+
+    def write(self, text):
+        buffer = self.buffer.get()
+        return (buffer or self.original).write(text)
+
+    def write_direct(self, text):
+        self.original.write(text)
+        self.original.flush()
+
+    def flush(self):
+        self.original.flush()
+
+
+def load_workspace(path: Path) -> Workspace:
+    """Read a workspace file; relative paths resolve against its folder"""
+    path = Path(path)
+    with open(path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    base = path.resolve().parent
+
+    def resolve(value, relative_to=base):
+        return (relative_to / value).resolve() if value else None
+
+    books = []
+    for entry in config.get('books', []):
+        root = resolve(entry['root'])
+        books.append(Book(
+            name=entry.get('name', root.name),
+            root=root,
+            content_dir=resolve(entry.get('content', 'content'), root),
+            asset_specs=resolve(entry.get('asset_specs')),
+            chart_specs=resolve(entry.get('chart_specs')),
+            images_source=resolve(entry.get('images')),
+            media_bucket=entry.get('media_bucket'),
+            images_bucket=entry.get('images_bucket'),
+        ))
+    names = [book.name for book in books]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate book name(s) in {path.name}: {', '.join(duplicates)}")
+    return Workspace(books, resolve(config.get('cache_dir', '.cache')))
+
+
+# ---------------------------------------------------------------------------
+# Tool adapters: (workspace, book, args) -> exit status
+# ---------------------------------------------------------------------------
+
+def _skip(book: Book, reason: str) -> int:
+    print(f"⏭️  {book.name}: {reason}")
+    return 0
+
+
+def _check_links(workspace: Workspace, book: Book, args) -> int:
+    from check_links import LinkChecker
+
+    checker = LinkChecker(content_dir=book.content_dir, cache_path=workspace.cache_path('link_check', book))
+    checker.build_table()
+    problems = checker.check()
+    for problem in problems:
+        print(f"  ❌ {problem['file']}:{problem['line']} → {problem['target']}: {problem['problem']}")
+    print(f"{'❌' if problems else '✅'} {len(checker.table)} files, {len(problems)} broken link(s)")
+    return 1 if problems else 0
+
+
+def _preview(workspace: Workspace, book: Book, args) -> int:
+    from preview_book import BookPreview
+
+    preview = BookPreview(gitbook_dir=book.root, output_dir=book.root / "_preview",
+                          cache_path=workspace.cache_path('preview', book))
+    results = preview.build(force=args.force)
+    print(f"✅ Rendered: {len(results['rendered'])}  ⏭️  Unchanged: {len(results['skipped'])}")
+    return 0
+
+
+def _page_weight(workspace: Workspace, book: Book, args) -> int:
+    from hls_package import load_index
+    from page_weight import PageWeightAnalyzer, print_table
+
+    layout = {'media_bucket': book.media_bucket, 'images_bucket': book.images_bucket,
+              'audio_dir': book.audio_dir, 'video_dir': book.video_dir, 'images_source': book.images_source}
+    analyzer = PageWeightAnalyzer(content_dir=book.content_dir, offline=args.offline, layout=layout,
+                                  size_cache=workspace.shared_cache('remote_sizes'),
+                                  hls_index=load_index(workspace.cache_path('hls', book)),
+                                  hls_packages_dir=workspace.cache_dir / 'hls' / 'packages')
+    pages = analyzer.analyze()
+    pages.sort(key=lambda page: page['total'], reverse=True)
+    print_table(pages)
+    return 1 if any(page['violations'] for page in pages) else 0
+
+
+def _render_charts(workspace: Workspace, book: Book, args) -> int:
+    from render_charts import ChartRenderer
+
+    if not book.chart_specs or not book.images_source:
+        return _skip(book, "no chart_specs/images configured")
+    renderer = ChartRenderer(specs_path=book.chart_specs, output_dir=book.images_source)
+    results = renderer.render_all(force=args.force, dry_run=args.dry_run)
+    print(f"✅ Rendered: {len(results['rendered'])}  ⏭️  Up to date: {results['skipped']}  "
+          f"❌ Failed: {len(results['failed'])}")
+    return 1 if results['failed'] else 0
+
+
+def _integrate_images(workspace: Workspace, book: Book, args) -> int:
+    from integrate_gitbook_images import MoneyMarketsImageIntegrator
+
+    if not book.asset_specs or not book.images_source or not book.images_bucket:
+        return _skip(book, "no asset_specs/images/images_bucket configured")
+    perceptual = None
+    if args.skip_unchanged:
+        from perceptual_hash import PerceptualCache
+
+        perceptual = PerceptualCache(book.images_source, workspace.cache_path('phash', book))
+    integrator = MoneyMarketsImageIntegrator(base_dir=book.root, bucket_name=book.images_bucket,
+                                             specs_path=book.asset_specs, images_source=book.images_source,
+                                             inventory=workspace.inventory, perceptual=perceptual,
+                                             content_dir=book.content_dir)
+    results = integrator.integrate_all(dry_run=args.dry_run)
+    if perceptual is not None:
+        perceptual.save()
+    print(f"✅ Lessons: {len(results['lessons'])}  Exercises: {len(results['exercises'])}")
+    return 0
+
+
+def _add_embeds(workspace: Workspace, book: Book, args) -> int:
+    import add_media_embeds
+
+    if not book.media_bucket:
+        return _skip(book, "no media_bucket configured")
+    from hls_package import load_index
+
+    return add_media_embeds.main(book.lessons_dir, book.audio_dir, book.video_dir, book.media_bucket,
+                                 workspace.inventory, load_index(workspace.cache_path('hls', book)))
+
+
+def _fix_url_encoding(workspace: Workspace, book: Book, args) -> int:
+    import fix_url_encoding
+
+    if not book.media_bucket:
+        return _skip(book, "no media_bucket configured")
+    return fix_url_encoding.main(book.lessons_dir, book.media_bucket)
+
+
+def _fix_embed_formatting(workspace: Workspace, book: Book, args) -> int:
+    import fix_embed_formatting
+
+    return fix_embed_formatting.main(book.lessons_dir)
+
+
+def _upload_media(workspace: Workspace, book: Book, args) -> int:
+    from upload_all_media import upload_all_media
+
+    if not book.media_bucket:
+        return _skip(book, "no media_bucket configured")
+    _, failed = upload_all_media(book.audio_dir, book.video_dir, book.media_bucket, workspace.storage_client(),
+                                 workspace.limiter)
+    return 1 if failed else 0
+
+
+def _package_hls(workspace: Workspace, book: Book, args) -> int:
+    from hls_package import package_videos
+
+    # Packages are content-addressed, so books that share a video share its encode;
+    # --dry-run packages locally without uploading
+    bucket_name = None if args.dry_run else book.media_bucket
+    return package_videos(book.video_dir, bucket_name, workspace.storage_client() if bucket_name else None,
+                          workspace.limiter, cache_dir=workspace.cache_dir / 'hls',
+                          index_path=workspace.cache_path('hls', book), force=args.force)
+
+
+def _upload_images(workspace: Workspace, book: Book, args) -> int:
+    from upload_images_to_gcs import upload_images
+
+    if not book.images_source or not book.images_bucket:
+        return _skip(book, "no images/images_bucket configured")
+    uploaded = upload_images(book.images_source, book.images_bucket, workspace.storage_client(), workspace.limiter,
+                             skip_unchanged=args.skip_unchanged, phash_cache=workspace.cache_path('phash', book))
+    return 0 if uploaded else 1
+
+
+def _media_manifest(workspace: Workspace, book: Book, args) -> int:
+    from hls_package import load_index
+    from media_manifest import generate_manifests
+
+    # Run after upload-media/package-hls/add-embeds so the manifests list what the pages embed;
+    # --dry-run builds them locally without uploading
+    layout = {'media_bucket': book.media_bucket, 'images_bucket': book.images_bucket,
+              'audio_dir': book.audio_dir, 'video_dir': book.video_dir, 'images_source': book.images_source}
+    bucket_name = None if args.dry_run else book.media_bucket
+    return generate_manifests(book.lessons_dir, layout, bucket_name,
+                              workspace.storage_client() if bucket_name else None, workspace.limiter,
+                              cache_path=workspace.cache_path('manifest', book),
+                              output_dir=workspace.cache_dir / 'manifest' / book.name,
+                              hls_index=load_index(workspace.cache_path('hls', book)), force=args.force)
+
+
+def _sync_metadata(workspace: Workspace, book: Book, args) -> int:
+    from sync_metadata import sync_metadata
+
+    status = 0
+    for bucket_name in filter(None, (book.media_bucket, book.images_bucket)):
+        print(f"gs://{bucket_name}")
+        results = sync_metadata(bucket_name, dry_run=args.dry_run, storage_client=workspace.storage_client())
+        if results is None or results['failed']:
+            status = 1
+    return status
+
+
+def _compile_quizzes(workspace: Workspace, book: Book, args) -> int:
+    from quiz_grader import compile_answer_keys
+
+    keys = compile_answer_keys(sorted(book.quizzes_dir.glob('*.md')))
+    output = workspace.cache_path('answer_keys', book)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(keys, f, separators=(',', ':'))
+    print(f"✅ {len(keys['quizzes'])} quiz(zes) written to {output}")
+    return 0
+
+
+TOOLS = {
+    'check-links': _check_links,
+    'preview': _preview,
+    'page-weight': _page_weight,
+    'render-charts': _render_charts,
+    'integrate-images': _integrate_images,
+    'add-embeds': _add_embeds,
+    'fix-url-encoding': _fix_url_encoding,
+    'fix-embed-formatting': _fix_embed_formatting,
+    'upload-media': _upload_media,
+    'package-hls': _package_hls,
+    'upload-images': _upload_images,
+    'media-manifest': _media_manifest,
+    'sync-metadata': _sync_metadata,
+    'compile-quizzes': _compile_quizzes,
+}
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Run a publishing tool across every book in a workspace')
+    parser.add_argument('tool', choices=sorted(TOOLS), help='Tool to run')
+    parser.add_argument('--workspace', default=os.getenv('GITBOOK_WORKSPACE'),
+                        help='Workspace JSON (default: $GITBOOK_WORKSPACE, else this book only)')
+    parser.add_argument('--books', help='Comma-separated book names to limit the run to')
+    parser.add_argument('--workers', type=int, help='Books processed in parallel (default: all)')
+    parser.add_argument('--dry-run', action='store_true', help='Pass --dry-run to tools that support it')
+    parser.add_argument('--force', action='store_true', help='Ignore caches in tools that support it')
+    parser.add_argument('--offline', action='store_true', help='No HEAD requests in page-weight')
+    parser.add_argument('--skip-unchanged', action='store_true',
+                        help='Treat images with no visible change as unchanged in upload-images and integrate-images')
+    add_bandwidth_arguments(parser)
+    args = parser.parse_args()
+
+    try:
+        workspace = load_workspace(Path(args.workspace)) if args.workspace else Workspace([default_book()])
+    except (OSError, ValueError, KeyError) as e:
+        print(f"❌ Could not load workspace: {e}")
+        return 1
+
+    books = workspace.books
+    if args.books:
+        wanted = args.books.split(',')
+        unknown = [name for name in wanted if name not in {book.name for book in books}]
+        if unknown:
+            parser.error(f"Unknown book(s): {', '.join(unknown)}")
+        books = [book for book in books if book.name in wanted]
+
+    print("=" * 60)
+    print(f"Workspace: {args.tool} across {len(books)} book(s)")
+    print("=" * 60)
+
+    try:
+        workspace.limiter = limiter_from_options(args.bandwidth, args.bandwidth_schedule)
+    except ValueError as e:
+        parser.error(str(e))
+
+    tool = TOOLS[args.tool]
+    if workspace.limiter is None:
+        results = workspace.run(lambda book: tool(workspace, book, args), books, args.workers)
+    else:
+        with workspace.limiter:
+            results = workspace.run(lambda book: tool(workspace, book, args), books, args.workers)
+
+    print()
+    print("=" * 60)
+    print("Summary")
+    print("=" * 60)
+    for name, status in sorted(results.items()):
+        print(f"{'✅' if status == 0 else '❌'} {name}")
+    return 1 if any(results.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())